@@ -0,0 +1,83 @@
+-- Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+-- SPDX-License-Identifier: GPL-3.0-or-later
+
+-- Triggers notifying wazo-confgend of the modified tables, to be installed
+-- by the database migrations. Each modifying statement sends the name of its
+-- table on the wazo_confgend_invalidate channel. Every table is covered
+-- except the call logs and statistics, which are written on each call and
+-- never read by the generators; wazo-confgend invalidates every file on a
+-- table it does not know.
+--
+-- The rows of the tables with a tenant_uuid column send <table>:<tenant_uuid>
+-- instead, so only the files of their tenant are invalidated. Identical
+-- notifications of a transaction are delivered once.
+
+CREATE OR REPLACE FUNCTION wazo_confgend_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('wazo_confgend_invalidate', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION wazo_confgend_notify_tenant() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify(
+            'wazo_confgend_invalidate',
+            TG_TABLE_NAME || ':' || coalesce(OLD.tenant_uuid::text, '')
+        );
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify(
+            'wazo_confgend_invalidate',
+            TG_TABLE_NAME || ':' || coalesce(NEW.tenant_uuid::text, '')
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    notified_table text;
+BEGIN
+    FOR notified_table IN
+        SELECT tablename FROM pg_tables
+        WHERE schemaname = current_schema()
+        AND tablename NOT IN ('cel', 'queue_log', 'agent_login_status')
+        AND tablename NOT LIKE 'call\_log%'
+        AND tablename NOT LIKE 'stat\_%'
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS wazo_confgend_notify ON %I', notified_table);
+        EXECUTE format(
+            'DROP TRIGGER IF EXISTS wazo_confgend_notify_tenant ON %I', notified_table
+        );
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema()
+            AND table_name = notified_table
+            AND column_name = 'tenant_uuid'
+        ) THEN
+            EXECUTE format(
+                'CREATE TRIGGER wazo_confgend_notify_tenant '
+                'AFTER INSERT OR UPDATE OR DELETE ON %I '
+                'FOR EACH ROW EXECUTE PROCEDURE wazo_confgend_notify_tenant()',
+                notified_table
+            );
+            EXECUTE format(
+                'CREATE TRIGGER wazo_confgend_notify '
+                'AFTER TRUNCATE ON %I '
+                'FOR EACH STATEMENT EXECUTE PROCEDURE wazo_confgend_notify()',
+                notified_table
+            );
+        ELSE
+            EXECUTE format(
+                'CREATE TRIGGER wazo_confgend_notify '
+                'AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+                'FOR EACH STATEMENT EXECUTE PROCEDURE wazo_confgend_notify()',
+                notified_table
+            );
+        END IF;
+    END LOOP;
+END
+$$;
@@ -1,17 +1,50 @@
-# Copyright 2016-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import json
 import pathlib
 import subprocess
 from collections.abc import Iterable
 
-from wazo_test_helpers import asset_launching_test_case
+import psycopg2
+import yaml
+from wazo_test_helpers import asset_launching_test_case, until
 
 INTERNAL_CONFGEND_PORT = 8669
+INTERNAL_POSTGRES_PORT = 5432
 DEFAULT_CONFGEND_CLIENT_TIMEOUT = 10
 DEFAULT_TIMEOUT = 10
+TRIGGERS_SQL = 'confgend-notify-triggers.sql'
+DB_URI = 'postgresql://asterisk:proformatique@{host}:{port}/asterisk'
+
+# the members of each queue loaded by the per-queue dao and by the single query
+# of wazo-confgend, printed as JSON from the confgend container
+COMPARE_QUEUE_MEMBERS = '''
+import json
+import sys
+
+import xivo_dao
+from xivo_dao import asterisk_conf_dao
+from xivo_dao.helpers.db_utils import session_scope
+
+from wazo_confgend import dao
+
+xivo_dao.init_db(sys.argv[1])
+with session_scope(read_only=True) as session:
+    query = 'SELECT DISTINCT queue_name FROM queuemember'
+    per_queue = {}
+    for (name,) in session.execute(query):
+        members = asterisk_conf_dao.find_queue_members_settings(name)
+        if members:
+            per_queue[name] = [list(values) for values in members]
+    single_query = {
+        name: [list(values) for values in members]
+        for name, members in dao.find_queue_members_settings_by_queue().items()
+    }
+print(json.dumps({'per_queue': per_queue, 'single_query': single_query}))
+'''
 
 
 def normalize_lines(line_stream: Iterable[str]):
@@ -129,3 +162,54 @@ class TestConfgenDefaults(BaseTestCase):
     def test_sccp_conf(self):
         completed = self.confgen(["asterisk/sccp.conf"])
         assert completed.returncode == 0
+
+
+class TestQueueMembers(BaseTestCase):
+    def test_members_match_the_per_queue_dao(self):
+        port = self.service_port(INTERNAL_POSTGRES_PORT, 'postgres')
+        with psycopg2.connect(DB_URI.format(host='127.0.0.1', port=port)) as connection:
+            with connection.cursor() as cursor:
+                # members of each category, with and without a user
+                cursor.execute(
+                    'INSERT INTO queuemember '
+                    '(queue_name, interface, penalty, commented, usertype, userid, '
+                    'channel, category, position) VALUES '
+                    "('q-members', 'PJSIP/abc', 1, 0, 'user', 0, 'PJSIP', 'queue', 2), "
+                    "('q-members', 'Local/none', 0, 0, 'user', 0, 'Local', 'group', 1), "
+                    "('q-members', 'PJSIP/off', 0, 1, 'user', 0, 'PJSIP', 'queue', 3), "
+                    "('q-members', 'Agent/1', 0, 0, 'agent', 1, 'Agent', 'queue', 4) "
+                    'ON CONFLICT DO NOTHING'
+                )
+
+        db_uri = DB_URI.format(host='postgres', port=INTERNAL_POSTGRES_PORT)
+        output = self.docker_exec(['python3', '-c', COMPARE_QUEUE_MEMBERS, db_uri])
+
+        members = json.loads(output)
+        assert 'q-members' in members['single_query']
+        assert members['single_query'] == members['per_queue']
+
+
+class TestCacheInvalidation(BaseTestCase):
+    def test_table_modification_invalidates_the_cache(self):
+        port = self.service_port(INTERNAL_POSTGRES_PORT, 'postgres')
+        with psycopg2.connect(DB_URI.format(host='127.0.0.1', port=port)) as connection:
+            with connection.cursor() as cursor:
+                # the triggers of the migrations, if the test database predates them
+                cursor.execute((self.assets_root / 'sql' / TRIGGERS_SQL).read_text())
+
+        self.confgen(["asterisk/queues.conf"])
+        invalidations = self._count_invalidations()
+
+        with psycopg2.connect(DB_URI.format(host='127.0.0.1', port=port)) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute('UPDATE queuemember SET position = position')
+
+        def invalidated():
+            assert self._count_invalidations() > invalidations
+
+        until.assert_(invalidated, timeout=DEFAULT_TIMEOUT)
+
+    def _count_invalidations(self):
+        completed = self.confgen(["confgend/stats.yml"])
+        stats = yaml.safe_load(completed.stdout)
+        return stats['counters'].get('cache_invalidations', 0)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benchmark of the extensions dialplan rendering, comparing the compiled objtpl
+# templates to the previous chained str.replace calls on every line
+
+import sys
+import timeit
+from io import StringIO
+
+from wazo_confgend.generators.extensionsconf import DialplanTemplate
+from wazo_confgend.generators.util import AsteriskFileWriter
+
+TEMPLATE = [
+    '%%EXTEN%%,%%PRIORITY%%,Set(XIVO_BASE_CONTEXT=${CONTEXT})',
+    'n,Set(__WAZO_TENANT_UUID=%%TENANT_UUID%%)',
+    'n,Set(XIVO_BASE_EXTEN=${EXTEN})',
+    'n,GoSub(contextlib,entry-exten-context,1)',
+    'n,%%ACTION%%',
+]
+
+
+def replace_render(template, exten, ast_writer):
+    for line in template:
+        prefix, padding = (
+            ('exten', '') if line.startswith('%%EXTEN%%') else ('same ', '    ')
+        )
+        line = line.replace('%%CONTEXT%%', str(exten.get('context', '')))
+        line = line.replace('%%EXTEN%%', str(exten.get('exten', '')))
+        line = line.replace('%%PRIORITY%%', str(exten.get('priority', '')))
+        line = line.replace('%%ACTION%%', str(exten.get('action', '')))
+        line = line.replace('%%TENANT_UUID%%', str(exten.get('tenant_uuid', '')))
+        ast_writer.write_option(prefix, f'{padding}{line}')
+    ast_writer.write_newline()
+
+
+def compiled_render(template, exten, ast_writer):
+    ast_writer.write_raw(template.render(exten))
+
+
+def run(render, template, extens):
+    output = StringIO()
+    ast_writer = AsteriskFileWriter(output)
+    for exten in extens:
+        render(template, exten, ast_writer)
+    return output.getvalue()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) >= 2 else 50000
+    extens = [
+        {
+            'tenant_uuid': '2b853b5b-6c19-4123-90da-3ce05fe9aa74',
+            'context': 'default',
+            'exten': str(1000 + i),
+            'priority': '1',
+            'action': f'GoSub(user,s,1({i},,{i}))',
+        }
+        for i in range(count)
+    ]
+    compiled = DialplanTemplate(TEMPLATE)
+    assert run(replace_render, TEMPLATE, extens) == run(
+        compiled_render, compiled, extens
+    )
+
+    for name, render, template in (
+        ('str.replace', replace_render, TEMPLATE),
+        ('compiled', compiled_render, compiled),
+    ):
+        duration = min(
+            timeit.repeat(lambda: run(render, template, extens), number=1, repeat=5)
+        )
+        print(f'{name}: {count} extensions in {duration:.3f}s')
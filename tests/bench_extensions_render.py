@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benchmark of the rendering of the extensions.conf contexts, serially and
+# across a growing number of processes
+#
+# usage: bench_extensions_render.py [extensions] [contexts]
+
+import os
+import sys
+import time
+
+from wazo_confgend.generators.extensionsconf import (
+    ContextRenderPool,
+    ContextsTemplate,
+    render_contexts,
+)
+
+CONTEXTSCONF = os.path.join(
+    os.path.dirname(__file__),
+    '..',
+    'etc',
+    'wazo-confgend',
+    'templates',
+    'contexts.conf',
+)
+
+
+def build_contexts(extension_count, context_count):
+    contexts_template = ContextsTemplate.from_file(CONTEXTSCONF)
+    section = contexts_template.get_context_section('ctx', 'internal')
+    contexts = []
+    for i in range(context_count):
+        exten_rows = [
+            {
+                'id': j,
+                'type': 'user',
+                'typeval': str(j),
+                'context': f'ctx-{i}',
+                'exten': str(10000 + j),
+                'tenant_uuid': '2b853b5b-6c19-4123-90da-3ce05fe9aa74',
+            }
+            for j in range(i, extension_count, context_count)
+        ]
+        contexts.append(
+            (f'ctx-{i}', section, [{'include': 'xivo-features'}], exten_rows)
+        )
+    return contexts
+
+
+def timed(render, contexts):
+    start = time.perf_counter()
+    fragments = render(contexts)
+    return time.perf_counter() - start, fragments
+
+
+if __name__ == "__main__":
+    extension_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    context_count = int(sys.argv[2]) if len(sys.argv) >= 3 else 100
+    contexts = build_contexts(extension_count, context_count)
+
+    duration, expected = timed(render_contexts, contexts)
+    print(f'serial: {extension_count} extensions in {duration:.3f}s')
+
+    processes = 1
+    while processes <= os.cpu_count():
+        pool = ContextRenderPool(processes)
+        pool.render(contexts[:1])  # start the processes
+        duration, fragments = timed(pool.render, contexts)
+        assert fragments == expected
+        print(f'{processes} processes: {extension_count} extensions in {duration:.3f}s')
+        processes *= 2
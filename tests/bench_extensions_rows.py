@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# allocations of the rendering of the extension rows, comparing the tuples
+# formatted by type to the previous dict rows turned into a dict of values
+# for each extension
+#
+# usage: bench_extensions_rows.py [extensions]
+
+import os
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+from wazo_confgend import dao
+from wazo_confgend.generators.extensionsconf import (
+    DEFAULT_EXTEN_ACTION,
+    EXTEN_ACTIONS,
+    ContextsTemplate,
+)
+
+CONTEXTSCONF = os.path.join(
+    os.path.dirname(__file__),
+    '..',
+    'etc',
+    'wazo-confgend',
+    'templates',
+    'contexts.conf',
+)
+TYPES = ('user', 'user', 'user', 'incall', 'group', 'queue', 'meetme')
+
+
+def build_rows(extension_count):
+    # stand-ins of the rows of the database
+    return [
+        [
+            i,
+            'ctx',
+            str(10000 + i),
+            TYPES[i % len(TYPES)],
+            str(i),
+            '2b853b5b-6c19-4123-90da-3ce05fe9aa74',
+        ]
+        for i in range(extension_count)
+    ]
+
+
+def render_dicts(template, rows):
+    # as before: one dict per row loaded from the database, then one dict of
+    # values per extension
+    exten_rows = [dict(zip(dao.EXTEN_SETTINGS_COLUMNS, row)) for row in rows]
+    output = StringIO()
+    for exten_row in exten_rows:
+        action = EXTEN_ACTIONS.get(exten_row['type'], DEFAULT_EXTEN_ACTION)
+        exten = {
+            'tenant_uuid': exten_row['tenant_uuid'],
+            'context': exten_row['context'],
+            'exten': exten_row['exten'],
+            'priority': '1',
+            'action': action.format_map(exten_row),
+        }
+        output.write(template.render(exten))
+    return output.getvalue()
+
+
+def render_rows(template, rows):
+    exten_rows = [tuple(row) for row in rows]
+    output = StringIO()
+    output.writelines(map(template.render_row, exten_rows))
+    return output.getvalue()
+
+
+def measure(render, template, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = render(template, rows)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+if __name__ == "__main__":
+    extension_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    contexts_template = ContextsTemplate.from_file(CONTEXTSCONF)
+    template = contexts_template.get_context_section('ctx', 'internal').template
+    rows = build_rows(extension_count)
+    template.render_row(tuple(rows[0]))
+
+    expected, duration, peak = measure(render_dicts, template, rows)
+    print(f'dicts: {duration:.3f}s, peak {peak / 2**20:.1f} MiB')
+    result, duration, peak = measure(render_rows, template, rows)
+    print(f'rows: {duration:.3f}s, peak {peak / 2**20:.1f} MiB')
+    assert result == expected
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benchmark of queues.conf against the number of queues, comparing the members
+# loaded for every queue at once to the previous query per queue. Each query
+# waits for a simulated database round trip.
+#
+# usage: bench_queues.py [round trip ms] [max queues]
+
+import sys
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from wazo_confgend.generators.queues import QueuesConf
+
+MEMBERS_PER_QUEUE = 10
+
+
+def build(queue_count):
+    queues = [
+        {'name': f'queue-{i}', 'label': f'queue {i}', 'wrapuptime': 0, 'joinempty': ''}
+        for i in range(queue_count)
+    ]
+    members = {
+        queue['name']: [
+            (f'PJSIP/line-{i}-{j}', str(j), '', '') for j in range(MEMBERS_PER_QUEUE)
+        ]
+        for i, queue in enumerate(queues)
+    }
+    return queues, members
+
+
+def query(round_trip, result):
+    def run(*args):
+        time.sleep(round_trip)
+        return result
+
+    return run
+
+
+def generate_per_queue(queues, members, round_trip):
+    # the previous generation, querying the members of each queue
+    output = StringIO()
+    with patch(
+        'xivo_dao.asterisk_conf_dao.find_queue_general_settings',
+        query(round_trip, []),
+    ), patch(
+        'xivo_dao.asterisk_conf_dao.find_queue_settings', query(round_trip, queues)
+    ):
+        find_members = query(round_trip, None)
+        output.write('[general]\n')
+        for q in queues:
+            find_members(q['name'])
+            output.write(f"; {q['label']}\n[{q['name']}]\n")
+            for values in members[q['name']]:
+                output.write(f"member = {','.join(values)}\n")
+    return output.getvalue()
+
+
+def generate(queues, members, round_trip):
+    output = StringIO()
+    with patch(
+        'xivo_dao.asterisk_conf_dao.find_queue_general_settings',
+        query(round_trip, []),
+    ), patch(
+        'xivo_dao.asterisk_conf_dao.find_queue_settings', query(round_trip, queues)
+    ), patch(
+        'wazo_confgend.dao.find_queue_members_settings_by_queue',
+        query(round_trip, members),
+    ):
+        QueuesConf().generate(output)
+    return output.getvalue()
+
+
+def timed(generate, *args):
+    start = time.perf_counter()
+    generate(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    round_trip = (float(sys.argv[1]) if len(sys.argv) >= 2 else 0.5) / 1000
+    max_queues = int(sys.argv[2]) if len(sys.argv) >= 3 else 1600
+    queue_count = 100
+    while queue_count <= max_queues:
+        queues, members = build(queue_count)
+        per_queue = timed(generate_per_queue, queues, members, round_trip)
+        single = timed(generate, queues, members, round_trip)
+        print(
+            f'{queue_count} queues: query per queue {per_queue:.3f}s, '
+            f'single query {single:.3f}s'
+        )
+        queue_count *= 2
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# benchmark of the speeddials of the sccp.conf devices, comparing the index
+# of the speeddials by device to the previous scan of every speeddial for
+# each device, for a growing number of devices with 10 speeddials each
+#
+# usage: bench_sccp_speeddials.py [max devices]
+
+import sys
+import time
+from io import StringIO
+from operator import itemgetter
+
+from wazo_confgend.generators.sccp import _SccpDeviceConf
+from wazo_confgend.generators.util import AsteriskFileWriter
+
+SPEEDDIALS_PER_DEVICE = 10
+
+
+class ScanSccpDeviceConf(_SccpDeviceConf):
+    def __init__(self, sccpspeeddialdevices):
+        self._sccpspeeddialdevices = sorted(
+            sccpspeeddialdevices,
+            key=itemgetter('fknum'),
+        )
+
+    def _generate_speeddials(self, device, ast_writer):
+        for item in self._sccpspeeddialdevices:
+            if item['device'] == device:
+                ast_writer.write_option(
+                    'speeddial', f"{item['user_id']:d}-{item['fknum']:d}"
+                )
+
+
+def build(device_count):
+    devices = [
+        {
+            'name': f'SEP{i:012d}',
+            'device': f'SEP{i:012d}',
+            'line': str(i),
+            'voicemail': '',
+        }
+        for i in range(device_count)
+    ]
+    speeddials = [
+        {'fknum': fknum, 'user_id': i, 'device': f'SEP{i:012d}'}
+        for fknum in range(SPEEDDIALS_PER_DEVICE, 0, -1)
+        for i in range(device_count)
+    ]
+    return devices, speeddials
+
+
+def timed(device_conf_class, devices, speeddials):
+    output = StringIO()
+    start = time.perf_counter()
+    device_conf = device_conf_class(speeddials)
+    device_conf._generate_devices(devices, AsteriskFileWriter(output))
+    return time.perf_counter() - start, output.getvalue()
+
+
+if __name__ == "__main__":
+    max_devices = int(sys.argv[1]) if len(sys.argv) >= 2 else 4000
+    device_count = 250
+    while device_count <= max_devices:
+        devices, speeddials = build(device_count)
+        scan_duration, expected = timed(ScanSccpDeviceConf, devices, speeddials)
+        index_duration, result = timed(_SccpDeviceConf, devices, speeddials)
+        assert result == expected
+        print(
+            f'{device_count} devices, {len(speeddials)} speeddials: '
+            f'scan {scan_duration:.3f}s, index {index_duration:.3f}s'
+        )
+        device_count *= 2
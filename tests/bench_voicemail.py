@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+# time and peak memory of the voicemail entries of voicemail.conf, comparing
+# the mailboxes streamed to the output to the previous list of mailboxes
+# concatenated in a string
+#
+# usage: bench_voicemail.py [max mailboxes]
+
+import sys
+import time
+import tracemalloc
+
+from xivo_dao.alchemy.voicemail import Voicemail
+
+from wazo_confgend.generators.voicemail import VoicemailGenerator
+
+CONTEXTS = 20
+
+
+def iter_voicemails(count):
+    # stand-in of the mailboxes fetched by batches, ordered by context
+    per_context = count // CONTEXTS
+    for i in range(count):
+        yield Voicemail(
+            name=f'voicemail {i}',
+            number=str(1000 + i % per_context),
+            context=f'ctx-{i // per_context}',
+            password='1234',
+            email=f'user{i}@example.com',
+            language='en_US',
+            options=[['saycid', 'yes'], ['emailbody', 'hello\nworld|!']],
+        )
+
+
+class PreviousVoicemailGenerator(VoicemailGenerator):
+    def generate(self):
+        output = ''
+        for context, voicemails in self.group_voicemails():
+            output += self.format_context(context)
+            output += '\n'
+            output += '\n'.join(self.format_voicemail(v) for v in voicemails)
+            output += '\n\n'
+        return output
+
+    def escape_string(self, value):
+        return (
+            value.replace('\n', '\\n')
+            .replace('\r', '\\r')
+            .replace('\t', '\\t')
+            .replace('|', '')
+        )
+
+
+class DiscardingWriter:
+    def write(self, data):
+        pass
+
+    def writelines(self, lines):
+        for _ in lines:
+            pass
+
+
+def measure(generate):
+    start = time.perf_counter()
+    generate()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    generate()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**10
+
+
+if __name__ == "__main__":
+    max_count = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    count = 12500
+    while count <= max_count:
+        previous = measure(
+            lambda: PreviousVoicemailGenerator(list(iter_voicemails(count))).generate()
+        )
+        streamed = measure(
+            lambda: VoicemailGenerator(iter_voicemails(count)).generate(
+                DiscardingWriter()
+            )
+        )
+        print(
+            f'{count} mailboxes: previous {previous[0]:.2f}s {previous[1]:.0f} KiB, '
+            f'streamed {streamed[0]:.2f}s {streamed[1]:.0f} KiB'
+        )
+        count *= 2
@@ -1,12 +1,20 @@
-# Copyright 2010-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2010-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-
-from io import StringIO
+import functools
+import os
+import re
+import threading
 
 from xivo_dao import asterisk_conf_dao
 
-from wazo_confgend.generators.extensionsconf import ExtensionsConf
+from wazo_confgend import dao
+from wazo_confgend.generators.extensionsconf import (
+    ContextFragmentCache,
+    ContextRenderPool,
+    ContextsTemplate,
+    ExtensionsConf,
+)
 from wazo_confgend.generators.iax import IaxConf
 from wazo_confgend.generators.queues import QueuesConf
 from wazo_confgend.generators.res_parking import ResParkingConf
@@ -14,49 +22,118 @@ from wazo_confgend.generators.sccp import SccpConf
 from wazo_confgend.generators.util import AsteriskFileWriter
 from wazo_confgend.generators.voicemail import VoicemailConf, VoicemailGenerator
 from wazo_confgend.hints.generator import HintGenerator
+from wazo_confgend.prefetch import Prefetcher
+from wazo_confgend.streaming import streamable
+
+# handler name of the asterisk/extensions-tenant-<uuid>.conf files
+TENANT_EXTENSIONS_HANDLER = re.compile(r'extensions-tenant-([0-9a-fA-F-]+)_conf')
 
 
 class AsteriskFrontend:
     def __init__(self, config, tpl_helper):
         self.contextsconf = config['templates']['contextsconf']
+        self._compact_dialplan = config.get('extensions_compact_dialplan', False)
+        self._split_by_tenant = config.get('extensions_split_by_tenant', False)
+        # the tenant files are only generated again once invalidated
+        self._cached_tenant_extensions = config.get('cache_invalidation', {}).get(
+            'enabled', False
+        )
         self._tpl_helper = tpl_helper
-
-    def res_parking_conf(self):
-        config_generator = ResParkingConf()
-        return self._generate_conf_from_generator(config_generator)
-
-    def sccp_conf(self):
-        config_generator = SccpConf()
-        return self._generate_conf_from_generator(config_generator)
-
-    def voicemail_conf(self):
-        voicemail_generator = VoicemailGenerator.build()
-        config_generator = VoicemailConf(voicemail_generator)
-        return self._generate_conf_from_generator(config_generator)
-
-    def extensions_conf(self):
-        hint_generator = HintGenerator.build()
-        config_generator = ExtensionsConf(
-            self.contextsconf, hint_generator, self._tpl_helper
+        self._contexts_template = None
+        self._contexts_template_key = None
+        self._contexts_template_lock = threading.Lock()
+        self._context_fragments = ContextFragmentCache()
+        self._context_render_pool = None
+        self._prefetcher = Prefetcher(config.get('prefetch_threads', 0))
+        if config.get('extensions_render_processes'):
+            self._context_render_pool = ContextRenderPool(
+                config['extensions_render_processes']
+            )
+
+    def shutdown(self):
+        if self._context_render_pool:
+            self._context_render_pool.shutdown()
+
+    @streamable
+    def res_parking_conf(self, output):
+        ResParkingConf().generate(output)
+
+    @streamable
+    def sccp_conf(self, output):
+        SccpConf(self._prefetcher.fetch(SccpConf.datasets)).generate(output)
+
+    @streamable
+    def voicemail_conf(self, output):
+        datasets = self._prefetcher.fetch(VoicemailConf.datasets)
+        # the voicemails are streamed from the session while they are written
+        VoicemailConf(VoicemailGenerator.build(), datasets).generate(output)
+
+    def __getattr__(self, name):
+        match = TENANT_EXTENSIONS_HANDLER.fullmatch(name)
+        if not match or not self._split_by_tenant:
+            raise AttributeError(name)
+        return streamable(
+            functools.partial(self._tenant_extensions_conf, match.group(1))
         )
-        return self._generate_conf_from_generator(config_generator)
 
-    def queues_conf(self):
-        config_generator = QueuesConf()
-        return self._generate_conf_from_generator(config_generator)
-
-    def _generate_conf_from_generator(self, config_generator):
-        output = StringIO()
-        config_generator.generate(output)
-        return output.getvalue()
-
-    def iax_conf(self):
-        config_generator = IaxConf()
-        return self._generate_conf_from_generator(config_generator)
+    @streamable
+    def extensions_conf(self, output):
+        # a split file indexes the hints of its own contexts only
+        hints = functools.partial(HintGenerator.build, index=not self._split_by_tenant)
+        config_generator = self._new_extensions_conf(hints, ExtensionsConf.datasets)
+        if self._split_by_tenant:
+            config_generator.generate_root(output, self._cached_tenant_extensions)
+        else:
+            config_generator.generate(output)
+
+    def _tenant_extensions_conf(self, tenant_uuid, output):
+        contexts = dao.find_context_settings_by_tenant(tenant_uuid)
+        # the hints of the other tenants are dropped as soon as they are loaded
+        hints = functools.partial(
+            HintGenerator.build,
+            index=False,
+            context_names=[ctx['name'] for ctx in contexts],
+        )
+        datasets = {'contexts': lambda: contexts}
+        self._new_extensions_conf(hints, datasets).generate_tenant(tenant_uuid, output)
+
+    def _new_extensions_conf(self, hints, datasets):
+        datasets = self._prefetcher.fetch({'hints': hints, **datasets})
+        return ExtensionsConf(
+            self._get_contexts_template(),
+            datasets.pop('hints'),
+            self._tpl_helper,
+            self._context_fragments,
+            self._context_render_pool,
+            datasets,
+        )
 
-    def queueskills_conf(self):
+    def _get_contexts_template(self):
+        # parsed again only when the file is replaced or modified
+        key = None
+        if self.contextsconf is not None:
+            stat = os.stat(self.contextsconf)
+            key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+        with self._contexts_template_lock:
+            if self._contexts_template is None or key != self._contexts_template_key:
+                self._contexts_template = ContextsTemplate.from_file(
+                    self.contextsconf, self._compact_dialplan
+                )
+                self._contexts_template_key = key
+            return self._contexts_template
+
+    @streamable
+    def queues_conf(self, output):
+        QueuesConf().generate(output)
+
+    @streamable
+    def iax_conf(self, output):
+        IaxConf(self._prefetcher.fetch(IaxConf.datasets)).generate(output)
+
+    @streamable
+    def queueskills_conf(self, output):
         """Generate queueskills.conf asterisk configuration file"""
-        output = StringIO()
         ast_writer = AsteriskFileWriter(output)
 
         agent_id = None
@@ -66,11 +143,9 @@ class AsteriskFrontend:
                 agent_id = sk['id']
             ast_writer.write_option(sk['name'], sk['weight'])
 
-        return output.getvalue()
-
-    def queueskillrules_conf(self):
+    @streamable
+    def queueskillrules_conf(self, output):
         """Generate queueskillrules.conf asterisk configuration file"""
-        output = StringIO()
         ast_writer = AsteriskFileWriter(output)
 
         for r in asterisk_conf_dao.find_queue_skillrule_settings():
@@ -78,5 +153,3 @@ class AsteriskFrontend:
             if 'rule' in r and r['rule'] is not None:
                 for rule in r['rule'].split(';'):
                     ast_writer.write_option('rule', rule)
-
-        return output.getvalue()
@@ -1,4 +1,4 @@
-# Copyright 2016-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
@@ -11,6 +11,7 @@ from xivo import xivo_logging
 
 from wazo_confgend.confgen import ConfgendFactory
 from wazo_confgend.config import load as load_config
+from wazo_confgend.prefetch import check_pool_size
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,7 @@ def main():
     )
 
     xivo_dao.init_db(config['db_uri'])
+    check_pool_size(config)
     f = ConfgendFactory(config['cache'], config)
 
     logger.info(
@@ -43,6 +45,7 @@ def twisted_application():
     )
 
     xivo_dao.init_db(config['db_uri'])
+    check_pool_size(config)
     f = ConfgendFactory(config['cache'], config)
 
     application = service.Application('confgend')
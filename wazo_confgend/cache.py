@@ -1,20 +1,65 @@
-# Copyright 2010-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2010-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
+import collections
+import fnmatch
+import functools
+import glob
+import hashlib
 import os.path
+import tempfile
+import threading
+import time
+from typing import NamedTuple
+
+# extended attribute keeping the digest of a cached file next to its content
+DIGEST_XATTR = 'user.wazo-confgend.digest'
+
+
+def new_content_hash():
+    return hashlib.blake2b(digest_size=16)
+
+
+def content_digest(content):
+    content_hash = new_content_hash()
+    content_hash.update(content)
+    return content_hash.hexdigest()
+
+
+class CacheEntry(NamedTuple):
+    content: bytes
+    digest: str
 
 
 class Cache:
     def get(self, key):
         raise NotImplementedError()
 
+    def get_entry(self, key):
+        content = self.get(key)
+        if content is None:
+            return None
+        return CacheEntry(content, content_digest(content))
+
+    def get_age(self, key):
+        raise NotImplementedError()
+
     def invalidate(self, key):
         raise NotImplementedError()
 
+    def invalidate_matching(self, pattern):
+        raise NotImplementedError()
+
     def put(self, key, value):
         raise NotImplementedError()
 
+    def prepare_put(self, key, value, digest=None):
+        raise NotImplementedError()
+
+    def open_writer(self, key):
+        raise NotImplementedError()
+
 
 class FileCache(Cache):
     def __init__(self, basedir):
@@ -25,10 +70,29 @@ class FileCache(Cache):
         path = self._get_path_from_key(key)
         if not os.path.exists(path):
             return None
-        with open(path) as f:
+        with open(path, 'rb') as f:
             content = f.read()
         return content
 
+    def get_entry(self, key):
+        path = self._get_path_from_key(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            content = f.read()
+            # read from the same file as the content, which may be replaced
+            digest = _get_digest_xattr(f.fileno())
+        return CacheEntry(content, digest or content_digest(content))
+
+    def get_age(self, key):
+        path = self._get_path_from_key(key)
+        try:
+            return time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
     def invalidate(self, key):
         path = self._get_path_from_key(key)
         try:
@@ -36,17 +100,237 @@ class FileCache(Cache):
         except OSError:
             return
 
-    def put(self, key, value):
+    def invalidate_matching(self, pattern):
+        for path in glob.glob(os.path.join(glob.escape(self.basedir), pattern)):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+
+    def put(self, key, value, digest=None):
+        writer = self.prepare_put(key, value, digest)
+        if writer is None:
+            return False
+        writer.commit()
+        return True
+
+    def prepare_put(self, key, value, digest=None):
+        # written aside and renamed on commit, so a concurrent reader never
+        # sees a partially written file
+        path = self._get_path_from_key(key)
+        if not self._makedirs(path):
+            return None
+        writer = _FileCacheWriter(path, digest)
+        try:
+            writer.write(value)
+        except Exception:
+            writer.abort()
+            raise
+        return writer
+
+    def open_writer(self, key):
         path = self._get_path_from_key(key)
+        if not self._makedirs(path):
+            return _NullCacheWriter()
+        return _FileCacheWriter(path)
+
+    def _makedirs(self, path):
         dir = os.path.dirname(path)
         if not os.path.exists(dir):
             try:
                 os.makedirs(dir)
             except Exception:
                 return False
-        with open(path, 'w') as f:
-            f.write(value)
         return True
 
     def _get_path_from_key(self, key):
         return os.path.join(self.basedir, key)
+
+
+class MemoryCache(Cache):
+    """LRU of encoded contents and their digest bounded in bytes, in front of
+    another cache"""
+
+    def __init__(self, backend, max_bytes, counters):
+        super().__init__()
+        self._backend = backend
+        self._max_bytes = max_bytes
+        self._counters = counters
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        # incremented on each change, so that a miss does not fill the LRU
+        # with content changed while it was read from the backend
+        self._generation = 0
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        return entry.content
+
+    def get_entry(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            self._counters.increment('memory_cache_hits')
+            return entry
+
+        self._counters.increment('memory_cache_misses')
+        generation = self._generation
+        entry = self._backend.get_entry(key)
+        if entry is None:
+            return None
+        self._store(key, entry, generation)
+        return entry
+
+    def get_age(self, key):
+        # every entry is written through to the backend
+        return self._backend.get_age(key)
+
+    def invalidate(self, key):
+        # the backend is changed first, a miss that read it before being
+        # dropped by the change of generation
+        self._backend.invalidate(key)
+        self._discard(key)
+
+    def invalidate_matching(self, pattern):
+        self._backend.invalidate_matching(pattern)
+        with self._lock:
+            self._generation += 1
+            for key in fnmatch.filter(list(self._entries), pattern):
+                self._remove(key)
+
+    def put(self, key, value, digest=None):
+        digest = digest or content_digest(value)
+        stored = self._backend.put(key, value, digest)
+        self._store(key, CacheEntry(value, digest))
+        return stored
+
+    def prepare_put(self, key, value, digest=None):
+        digest = digest or content_digest(value)
+        writer = self._backend.prepare_put(key, value, digest)
+        if writer is None:
+            return None
+        entry = CacheEntry(value, digest)
+        return _MemoryCacheWriter(writer, functools.partial(self._store, key, entry))
+
+    def open_writer(self, key):
+        writer = self._backend.open_writer(key)
+        return _MemoryCacheWriter(writer, functools.partial(self._discard, key))
+
+    def _store(self, key, entry, generation=None):
+        evicted = 0
+        with self._lock:
+            if generation is None:
+                self._generation += 1
+            elif generation != self._generation:
+                return
+            self._remove(key)
+            if len(entry.content) > self._max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += len(entry.content)
+            while self._size > self._max_bytes:
+                _, evicted_entry = self._entries.popitem(last=False)
+                self._size -= len(evicted_entry.content)
+                evicted += 1
+        if evicted:
+            self._counters.increment('memory_cache_evictions', evicted)
+
+    def _discard(self, key):
+        with self._lock:
+            self._generation += 1
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.content)
+
+
+class _MemoryCacheWriter:
+    def __init__(self, writer, on_commit):
+        self._writer = writer
+        self._on_commit = on_commit
+
+    def write(self, chunk):
+        self._writer.write(chunk)
+
+    def commit(self):
+        self._writer.commit()
+        self._on_commit()
+
+    def abort(self):
+        self._writer.abort()
+
+
+class _FileCacheWriter:
+    # written to a temporary file of its own, replacing the cached one only
+    # once complete, so concurrent writers of a key do not mix their content
+    def __init__(self, path, digest=None):
+        self._path = path
+        self._file, self._tmp_path = _open_temporary_file(path)
+        self._digest = digest
+        self._hash = None if digest else new_content_hash()
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        if self._hash:
+            self._hash.update(chunk)
+
+    def commit(self):
+        # the digest is renamed with the content it belongs to
+        digest = self._digest or self._hash.hexdigest()
+        _set_digest_xattr(self._file.fileno(), digest)
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self):
+        self._file.close()
+        _unlink(self._tmp_path)
+
+
+def _open_temporary_file(path):
+    # hidden, so that the patterns of invalidate_matching do not match it
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=f'.{os.path.basename(path)}.', suffix='.tmp'
+    )
+    # mkstemp creates the file readable by its owner only
+    os.fchmod(fd, 0o644)
+    return os.fdopen(fd, 'wb'), tmp_path
+
+
+def _get_digest_xattr(fd):
+    try:
+        return os.getxattr(fd, DIGEST_XATTR).decode('ascii')
+    except (AttributeError, OSError):
+        # not supported by the platform or the file system, or not set
+        return None
+
+
+def _set_digest_xattr(fd, digest):
+    try:
+        os.setxattr(fd, DIGEST_XATTR, digest.encode('ascii'))
+    except (AttributeError, OSError):
+        pass
+
+
+def _unlink(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class _NullCacheWriter:
+    def write(self, chunk):
+        pass
+
+    def commit(self):
+        pass
+
+    def abort(self):
+        pass
@@ -1,13 +1,19 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from __future__ import annotations
 
+import contextlib
 import logging
+import threading
 import time
+from typing import NamedTuple
 
 import twisted.python.failure
+from twisted.internet import defer, reactor, threads
 from twisted.internet.protocol import Protocol, ServerFactory
+from twisted.protocols.basic import Int32StringReceiver
+from twisted.python.threadpool import ThreadPool
 from xivo_dao.helpers.db_utils import session_scope
 
 from wazo_confgend import cache
@@ -16,87 +22,415 @@ from wazo_confgend.handler import (
     CachedHandlerFactoryDecorator,
     FrontendHandlerFactory,
     MultiHandlerFactory,
-    NullHandlerFactory,
+    NoSuchHandler,
     PluginHandlerFactory,
 )
+from wazo_confgend.inflight import InFlightTable, InvalidationLog
+from wazo_confgend.invalidation import TABLE_FILES, CacheInvalidator, PostgresNotifier
 from wazo_confgend.phoned import PhonedFrontend
+from wazo_confgend.stats import Counters, StatsFrontend
+from wazo_confgend.streaming import (
+    CHUNK_SIZE,
+    ChunkedWriter,
+    ContentSpool,
+    TransportStream,
+)
 from wazo_confgend.template import new_template_helper
+from wazo_confgend.warmup import WarmUpScheduler
 from wazo_confgend.wazo import WazoFrontend
 
 logger = logging.getLogger(__name__)
 
+PROTOCOL_V2_GREETING = b'PROTOCOL 2\n'
+BATCH_COMMAND = 'batch'
+STREAM_ARG = 'stream'
+DIGEST_ARG = 'digest'
+IF_NONE_MATCH_ARG = 'if-none-match='
+UNCHANGED_TOKEN = b'unchanged\n'
+
+
+class Status:
+    OK = 200
+    CACHED = 203
+    NOT_MODIFIED = 304
+    BAD_REQUEST = 400
+    NOT_FOUND = 404
+    ERROR = 500
+
+
+class Response(NamedTuple):
+    status: int
+    content: bytes | None = None
+    digest: str | None = None
+
+
+def format_multipart(parts: list[tuple[str, Response]]) -> bytes:
+    # each part is "<status> <resource>/<filename> <length in bytes>\n<content>"
+    chunks = []
+    for cache_key, response in parts:
+        content = response.content or b''
+        header = f'{response.status} {cache_key} {len(content)}\n'
+        chunks.extend([header.encode('utf-8'), content])
+    return b''.join(chunks)
+
+
+def get_if_none_match(args: list[str]) -> str | None:
+    for arg in args:
+        if arg.startswith(IF_NONE_MATCH_ARG):
+            return arg[len(IF_NONE_MATCH_ARG) :]
+    return None
+
+
+@contextlib.contextmanager
+def snapshot_scope():
+    # the queries of a generation, prefetched datasets included, all see the
+    # database as it was at its first query
+    with session_scope(read_only=True) as session:
+        session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        yield session
+
+
+def parse_command(line: str) -> tuple[str, list[str]]:
+    if ' ' in line:
+        cmd, trailing = line.split(' ', 1)
+        args = [arg for arg in trailing.split(' ') if arg]
+    else:
+        cmd, args = line, []
+    return cmd, args
+
 
 class Confgen(Protocol):
+    """Legacy one-shot protocol
+
+    The whole command is expected in a single segment, the content is written
+    as is and the connection is closed. A client opening with
+    PROTOCOL_V2_GREETING switches the connection to FramedConfgen instead.
+    """
+
+    _framed_protocol = None
+
     def connectionMade(self):
         logger.info("connection established")
 
     def connectionLost(self, reason: twisted.python.failure.Failure):
         logger.info("connection lost: %s", reason.getErrorMessage())
+        if self._framed_protocol is not None:
+            self._framed_protocol.connectionLost(reason)
         super().connectionLost(reason=reason)
 
     def commandReceived(self, cmd: str, args: list[str]):
         logger.debug(
             "command received cmd_length=%d, args_count=%d", len(cmd), len(args)
         )
+        if cmd == BATCH_COMMAND:
+            d = self.factory.generate_batch_deferred(*args)
+            d.addCallback(self._write_content)
+            return d
+
         try:
             resource, filename = cmd.split('/')
         except ValueError:
             logger.error("cannot split %s", cmd)
             return
 
-        content = self.factory.generate(resource, filename, *args)
-        if content:
-            self.transport.write(content.encode("utf-8"))
+        if STREAM_ARG in args:
+            stream = TransportStream(self.transport, reactor)
+            self.transport.registerProducer(stream, True)
+            d = self.factory.generate_stream_deferred(resource, filename, stream, *args)
+            d.addBoth(self._unregister_producer)
+            return d
+
+        d = self.factory.generate_deferred(resource, filename, *args)
+        d.addCallback(self._write_content, DIGEST_ARG in args)
+        return d
+
+    def _unregister_producer(self, result):
+        self.transport.unregisterProducer()
+        return result
+
+    def _write_content(self, response: Response, with_digest: bool = False):
+        if with_digest:
+            self.transport.write(f'{response.digest or ""}\n'.encode('utf-8'))
+        if response.status == Status.NOT_MODIFIED:
+            self.transport.write(UNCHANGED_TOKEN)
+        elif response.content:
+            self.transport.write(response.content)
 
     def dataReceived(self, data: bytes):
         logger.debug("data received bytes_count=%d", len(data))
 
+        if self._framed_protocol is not None:
+            self._framed_protocol.dataReceived(data)
+            return
+
+        if data.startswith(PROTOCOL_V2_GREETING):
+            self._framed_protocol = FramedConfgen(self.factory)
+            self._framed_protocol.makeConnection(self.transport)
+            self._framed_protocol.dataReceived(data[len(PROTOCOL_V2_GREETING) :])
+            return
+
         data = data.decode("utf-8")
-        try:
-            t1 = time.time()
-            line = data.replace('\n', '')
+        t1 = time.time()
+        line = data.replace('\n', '')
+        cmd, args = parse_command(line)
+
+        d = defer.maybeDeferred(self.commandReceived, cmd, args)
+        d.addCallbacks(self._log_served, self._log_failure, callbackArgs=(line, t1))
+        d.addBoth(lambda _: self.transport.loseConnection())
+
+    def _log_served(self, _, line: str, t1: float):
+        t2 = time.time()
+        logger.info("serving %s in %.3f seconds", line, t2 - t1)
+
+    def _log_failure(self, failure: twisted.python.failure.Failure):
+        logger.error(
+            "unexpected error while serving command: %s", failure.getTraceback()
+        )
+
+
+class FramedConfgen(Int32StringReceiver):
+    """Persistent protocol with length-prefixed frames
+
+    Each request is a frame holding a command line, e.g.
+    "asterisk/pjsip.conf cached". Requests may be pipelined: they are
+    generated concurrently and each gets a response frame, in request order,
+    made of the status code, the digest of the content if any, a newline and
+    the content. The connection stays open until the client closes it.
+    """
+
+    MAX_LENGTH = 64 * 1024
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._last_response = defer.succeed(None)
 
-            if ' ' in line:
-                cmd, trailing = line.split(' ', 1)
-                args = [arg for arg in trailing.split(' ') if arg]
+    def stringReceived(self, string: bytes):
+        t1 = time.time()
+        response = self._respond(string)
+        response.addCallback(self._log_served, string, t1)
+        self._last_response.addCallback(lambda _: response)
+        self._last_response.addCallback(self._send_response)
+
+    def _respond(self, string: bytes):
+        try:
+            cmd, args = parse_command(string.decode('utf-8'))
+            if cmd == BATCH_COMMAND:
+                d = self.factory.generate_batch_deferred(*args)
             else:
-                cmd, args = line, []
+                resource, filename = cmd.split('/')
+                d = self.factory.generate_deferred(resource, filename, *args)
+        except ValueError:
+            logger.error("invalid command %r", string)
+            return defer.succeed(Response(Status.BAD_REQUEST))
 
-            self.commandReceived(cmd, args)
+        d.addErrback(self._on_error)
+        return d
 
-            t2 = time.time()
+    def _on_error(self, failure: twisted.python.failure.Failure):
+        logger.error(
+            "unexpected error while serving command: %s", failure.getTraceback()
+        )
+        return Response(Status.ERROR)
 
-            logger.info("serving %s in %.3f seconds", line, t2 - t1)
-        finally:
-            self.transport.loseConnection()
+    def _log_served(self, response: Response, string: bytes, t1: float):
+        t2 = time.time()
+        logger.info(
+            "serving %r with status %d in %.3f seconds",
+            string,
+            response.status,
+            t2 - t1,
+        )
+        return response
+
+    def _send_response(self, response: Response):
+        if response.digest:
+            header = f'{response.status} {response.digest}\n'.encode('utf-8')
+        else:
+            header = f'{response.status}\n'.encode('utf-8')
+        self.sendString(header + (response.content or b''))
 
 
 class ConfgendFactory(ServerFactory):
     protocol = Confgen
 
     def __init__(self, cachedir, config):
+        self._counters = Counters()
         tpl_helper = new_template_helper()
         dependencies = {
             'config': config,
             'tpl_helper': tpl_helper,
         }
+        self._asterisk_frontend = AsteriskFrontend(config, tpl_helper)
         frontends = {
-            'asterisk': AsteriskFrontend(config, tpl_helper),
+            'asterisk': self._asterisk_frontend,
+            'confgend': StatsFrontend(self._counters),
             'phoned': PhonedFrontend(),
             'wazo': WazoFrontend(),
         }
-        self._cache = cache.FileCache(cachedir)
+        self._cache = cache.MemoryCache(
+            cache.FileCache(cachedir), config['memory_cache_size'], self._counters
+        )
+        # a generation started before the data changed does not overwrite the
+        # cache, nor is it joined
+        self._invalidations = InvalidationLog()
+        self._in_flight = InFlightTable(self._counters, self._invalidations)
+        self._max_stale = config['max_stale']
+        self._max_fresh = config['max_fresh']
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        self._warm_up = WarmUpScheduler(
+            self.generate_deferred,
+            config['warm_up']['files'],
+            config['warm_up']['max_concurrency'],
+            self._counters,
+        )
+        self._notifier = None
+        if config['cache_invalidation']['enabled']:
+            invalidator = CacheInvalidator(self.invalidate, TABLE_FILES)
+            self._notifier = PostgresNotifier(reactor, config['db_uri'], invalidator)
+        # generators block on the database, so they run outside the reactor thread
+        self._threadpool = ThreadPool(
+            minthreads=1, maxthreads=config['max_threads'], name='confgend-worker'
+        )
         self._handler_factory = MultiHandlerFactory(
             [
                 CachedHandlerFactoryDecorator(
                     PluginHandlerFactory(config, dependencies)
                 ),
                 FrontendHandlerFactory(frontends),
-                NullHandlerFactory(),
             ]
         )
 
+    def startFactory(self):
+        self._threadpool.start()
+        if self._notifier:
+            self._notifier.start()
+        reactor.callWhenRunning(self._warm_up.start)
+
+    def stopFactory(self):
+        if self._notifier:
+            self._notifier.stop()
+        self._threadpool.stop()
+        self._asterisk_frontend.shutdown()
+
+    def invalidate(self, cache_key):
+        logger.debug('invalidating %s', cache_key)
+        self._counters.increment('cache_invalidations')
+        # logged before the cache is changed, so that a generation started
+        # before cannot store its content after
+        self._invalidations.invalidate(cache_key)
+        if '*' in cache_key:
+            self._cache.invalidate_matching(cache_key)
+        else:
+            self._cache.invalidate(cache_key)
+        # invalidations can come from the worker threads
+        reactor.callFromThread(self._warm_up.schedule, cache_key)
+
+    def generate_deferred(self, resource, filename, *args):
+        logger.info(
+            "Generating conf for resource=%s and filename=%s with args=%s",
+            resource,
+            filename,
+            args,
+        )
+        cache_key = f'{resource}/{filename}'
+        d = self._defer_to_pool(
+            self._get_cached_response, cache_key, resource, filename, args
+        )
+        d.addCallback(self._generate_if_not_cached, cache_key, resource, filename)
+        d.addCallback(self._check_if_none_match, get_if_none_match(args))
+        return d
+
+    def _generate_if_not_cached(self, response, cache_key, resource, filename):
+        if response is not None:
+            return response
+        d = self._generate_coalesced(cache_key, resource, filename)
+        d.addCallback(
+            lambda response: self._defer_to_pool(
+                self._or_cached_response, response, cache_key
+            )
+        )
+        return d
+
+    def _generate_coalesced(self, cache_key, resource, filename):
+        # concurrent requests for the same file share a single generation,
+        # waited for in the reactor rather than in a worker thread
+        return self._in_flight.run(
+            cache_key, self._generate_in_pool, cache_key, resource, filename
+        )
+
+    def _generate_in_pool(self, start, cache_key, resource, filename):
+        return self._defer_to_pool(
+            self._do_generate_and_cache, cache_key, resource, filename, start
+        )
+
+    def _defer_to_pool(self, function, *args):
+        return threads.deferToThreadPool(reactor, self._threadpool, function, *args)
+
+    def generate_batch_deferred(self, *cache_keys):
+        return self._defer_to_pool(self.generate_batch_response, *cache_keys)
+
+    def generate_stream_deferred(self, resource, filename, stream, *args):
+        logger.info(
+            "Streaming conf for resource=%s and filename=%s with args=%s",
+            resource,
+            filename,
+            args,
+        )
+        cache_key = f'{resource}/{filename}'
+        d = self._defer_to_pool(
+            self._get_cached_response, cache_key, resource, filename, args
+        )
+        d.addCallback(
+            self._stream_if_not_cached, cache_key, resource, filename, stream, args
+        )
+        return d
+
+    def _stream_if_not_cached(
+        self, response, cache_key, resource, filename, stream, args
+    ):
+        if_none_match = get_if_none_match(args)
+        with_digest = DIGEST_ARG in args
+        if response is not None:
+            return self._defer_to_pool(
+                self._stream_response, response, stream, if_none_match, with_digest
+            )
+
+        d = self._in_flight.join(cache_key)
+        if d is None:
+            # streamed while it is generated, the requests joining it get
+            # the cached content
+            return self._in_flight.lead(
+                cache_key,
+                self._stream_in_pool,
+                cache_key,
+                resource,
+                filename,
+                stream,
+                args,
+            )
+
+        d.addCallback(
+            lambda response: self._defer_to_pool(
+                self._stream_response,
+                self._or_cached_response(response, cache_key),
+                stream,
+                if_none_match,
+                with_digest,
+            )
+        )
+        return d
+
+    def _stream_in_pool(self, start, cache_key, resource, filename, stream, args):
+        return self._defer_to_pool(
+            self._stream_and_cache, cache_key, resource, filename, stream, args, start
+        )
+
     def generate(self, resource, filename, *args):
+        return self.generate_response(resource, filename, *args).content
+
+    def generate_response(self, resource, filename, *args):
+        # generated in the calling thread, without coalescing
         logger.info(
             "Generating conf for resource=%s and filename=%s with args=%s",
             resource,
@@ -104,36 +438,261 @@ class ConfgendFactory(ServerFactory):
             args,
         )
         cache_key = f'{resource}/{filename}'
+        response = self._get_cached_response(cache_key, resource, filename, args)
+        if response is None:
+            with self._invalidations.generation() as start:
+                response = self._do_generate_and_cache(
+                    cache_key, resource, filename, start
+                )
+            response = self._or_cached_response(response, cache_key)
+        return self._check_if_none_match(response, get_if_none_match(args))
+
+    def _check_if_none_match(self, response, if_none_match):
+        if if_none_match is not None and response.digest == if_none_match:
+            return Response(Status.NOT_MODIFIED, digest=response.digest)
+        return response
+
+    def _get_cached_response(self, cache_key, resource, filename, args):
+        # the response not needing a generation, if any
         if 'invalidate' in args:
-            self._cache.invalidate(cache_key)
-        elif 'cached' in args:
-            return self._get_cached_content(cache_key) or self._generate_and_cache(
-                cache_key, resource, filename
+            self.invalidate(cache_key)
+            return Response(Status.OK)
+
+        if 'cached' in args:
+            entry = self._get_cached_content(cache_key)
+            if entry:
+                return Response(Status.CACHED, *entry)
+
+        entry = self._get_stale_content(cache_key, resource, filename)
+        if entry:
+            return Response(Status.CACHED, *entry)
+        return None
+
+    def _or_cached_response(self, response, cache_key):
+        if not response.content:
+            entry = self._get_cached_content(cache_key)
+            if entry:
+                return Response(Status.CACHED, *entry)
+        return response
+
+    def generate_stream(self, resource, filename, stream, *args):
+        # generated in the calling thread, without coalescing
+        logger.info(
+            "Streaming conf for resource=%s and filename=%s with args=%s",
+            resource,
+            filename,
+            args,
+        )
+        cache_key = f'{resource}/{filename}'
+        response = self._get_cached_response(cache_key, resource, filename, args)
+        if response is not None:
+            return self._stream_response(
+                response, stream, get_if_none_match(args), DIGEST_ARG in args
+            )
+        with self._invalidations.generation() as start:
+            return self._stream_and_cache(
+                cache_key, resource, filename, stream, args, start
             )
-        else:
-            return self._generate_and_cache(
-                cache_key, resource, filename
-            ) or self._get_cached_content(cache_key)
 
-    def _generate_and_cache(self, cache_key, resource, filename):
-        handler = self._handler_factory.get(resource, filename)
-        with session_scope(read_only=True):
+    def _stream_and_cache(self, cache_key, resource, filename, stream, args, start):
+        """Write the content to the stream and the cache while it is generated
+
+        The content is never held in memory as a whole. Content already
+        streamed cannot be replaced by the cached one on error. With the
+        if-none-match or digest arguments, the digest is only known once the
+        content is complete, so the content is spooled before being sent.
+        """
+        if_none_match = get_if_none_match(args)
+        with_digest = DIGEST_ARG in args
+        try:
+            handler = self._handler_factory.get(resource, filename)
+        except NoSuchHandler:
+            logger.error('No handler found for %s/%s', resource, filename)
+            return self._stream_cached_content(
+                cache_key, stream, Status.NOT_FOUND, if_none_match, with_digest
+            )
+
+        spooled = if_none_match is not None or with_digest
+        with ContentSpool() if spooled else contextlib.nullcontext() as spool:
+            status, bytes_written = self._stream_handler(
+                cache_key, handler, spool or stream, start
+            )
+            if status == Status.ERROR and bytes_written and not spool:
+                return Response(Status.ERROR)
+            if status == Status.ERROR or not bytes_written:
+                return self._stream_cached_content(
+                    cache_key, stream, status, if_none_match, with_digest
+                )
+            if not spool:
+                return Response(Status.OK)
+            return self._send_stream_content(
+                stream,
+                Status.OK,
+                spool.digest,
+                spool.read_chunks(),
+                if_none_match,
+                with_digest,
+            )
+
+    def _stream_handler(self, cache_key, handler, sink, start):
+        cache_writer = self._cache.open_writer(cache_key)
+        writer = ChunkedWriter([sink, cache_writer])
+        with snapshot_scope():
             try:
-                content = handler()
-                return self._encode_and_cache(cache_key, content)
+                if getattr(handler, 'streamable', False):
+                    handler(output=writer)
+                else:
+                    writer.write(handler() or '')
+                writer.flush()
             except Exception:
                 logger.error('unexpected error raised by handler', exc_info=True)
+                cache_writer.abort()
+                return Status.ERROR, writer.bytes_written
+
+        if not writer.bytes_written:
+            cache_writer.abort()
+        elif not self._invalidations.store_if_current(
+            cache_key, start, cache_writer.commit
+        ):
+            cache_writer.abort()
+        return Status.OK, writer.bytes_written
+
+    def _stream_cached_content(
+        self, cache_key, stream, status, if_none_match=None, with_digest=False
+    ):
+        response = self._or_cached_response(Response(status), cache_key)
+        return self._stream_response(response, stream, if_none_match, with_digest)
+
+    def _stream_response(self, response, stream, if_none_match, with_digest):
+        content = response.content or b''
+        chunks = (
+            content[i : i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)
+        )
+        return self._send_stream_content(
+            stream, response.status, response.digest, chunks, if_none_match, with_digest
+        )
+
+    def _send_stream_content(
+        self, stream, status, digest, chunks, if_none_match, with_digest
+    ):
+        if with_digest:
+            stream.write(f'{digest or ""}\n'.encode('utf-8'))
+        if digest is not None and digest == if_none_match:
+            stream.write(UNCHANGED_TOKEN)
+            return Response(Status.NOT_MODIFIED, digest=digest)
+        for chunk in chunks:
+            stream.write(chunk)
+        return Response(status, digest=digest)
+
+    def generate_batch_response(self, *cache_keys):
+        logger.info("Generating conf for batch %s", cache_keys)
+        parts = []
+        # every file of the batch is generated from the same snapshot
+        with snapshot_scope() as session:
+            for cache_key in cache_keys:
+                parts.append((cache_key, self._generate_batch_part(session, cache_key)))
+        return Response(Status.OK, format_multipart(parts))
+
+    def _generate_batch_part(self, session, cache_key):
+        try:
+            resource, filename = cache_key.split('/')
+        except ValueError:
+            logger.error("cannot split %s", cache_key)
+            return Response(Status.BAD_REQUEST)
+
+        # a failing generator must not abort the transaction of the whole batch
+        savepoint = session.begin_nested()
+        with self._invalidations.generation() as start:
+            response = self._run_handler(cache_key, resource, filename, start)
+        if response.status == Status.ERROR:
+            savepoint.rollback()
+        else:
+            savepoint.commit()
+        return self._or_cached_response(response, cache_key)
+
+    def _do_generate_and_cache(self, cache_key, resource, filename, start):
+        with snapshot_scope():
+            return self._run_handler(cache_key, resource, filename, start)
+
+    def _run_handler(self, cache_key, resource, filename, start):
+        try:
+            handler = self._handler_factory.get(resource, filename)
+        except NoSuchHandler:
+            logger.error('No handler found for %s/%s', resource, filename)
+            return Response(Status.NOT_FOUND)
+
+        try:
+            content = handler()
+        except Exception:
+            logger.error('unexpected error raised by handler', exc_info=True)
+            return Response(Status.ERROR)
+
+        entry = self._encode_and_cache(cache_key, content, start)
+        if not entry:
+            return Response(Status.OK)
+        return Response(Status.OK, *entry)
+
+    def _get_stale_content(self, cache_key, resource, filename):
+        # stale-while-revalidate: a cached copy younger than the max-stale
+        # delay of the file is returned, and refreshed in the background once
+        # older than its max-fresh delay
+        name = f'{resource}.{filename}'
+        max_stale = self._max_stale.get(name)
+        if max_stale is None:
+            return None
+
+        age = self._cache.get_age(cache_key)
+        if age is None or age > max_stale:
+            return None
+
+        entry = self._get_cached_content(cache_key)
+        if not entry:
+            return None
+
+        if age < self._max_fresh.get(name, max_stale / 2):
+            self._counters.increment('fresh_responses')
+            return entry
+
+        self._counters.increment('stale_responses')
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return entry
+            self._refreshing.add(cache_key)
+        reactor.callFromThread(self._refresh, cache_key, resource, filename)
+        return entry
+
+    def _refresh(self, cache_key, resource, filename):
+        d = self._generate_coalesced(cache_key, resource, filename)
+        d.addErrback(self._log_refresh_failure, cache_key)
+        d.addBoth(self._refreshed, cache_key)
+
+    def _log_refresh_failure(self, failure, cache_key):
+        logger.error(
+            'unexpected error while refreshing %s: %s',
+            cache_key,
+            failure.getTraceback(),
+        )
+
+    def _refreshed(self, _, cache_key):
+        with self._refreshing_lock:
+            self._refreshing.discard(cache_key)
 
     def _get_cached_content(self, cache_key):
         try:
-            return self._cache.get(cache_key)
+            return self._cache.get_entry(cache_key)
         except AttributeError:
             logger.warning("No cached content for %s", cache_key)
 
-    def _encode_and_cache(self, cache_key, content):
+    def _encode_and_cache(self, cache_key, content, start):
         if not content:
             return
 
-        encoded_content = content
-        self._cache.put(cache_key, encoded_content)
-        return encoded_content
+        encoded_content = content.encode('utf-8')
+        digest = cache.content_digest(encoded_content)
+        # written outside of the invalidations lock, only renamed under it
+        writer = self._cache.prepare_put(cache_key, encoded_content, digest)
+        if writer is not None and not self._invalidations.store_if_current(
+            cache_key, start, writer.commit
+        ):
+            writer.abort()
+        return cache.CacheEntry(encoded_content, digest)
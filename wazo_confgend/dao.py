@@ -0,0 +1,183 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Queries loading in one round trip the rows that xivo_dao returns one
+object at a time"""
+
+import collections
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import selectinload
+from xivo_dao.alchemy.context import Context
+from xivo_dao.alchemy.contextinclude import ContextInclude
+from xivo_dao.alchemy.extension import Extension
+from xivo_dao.alchemy.ivr import IVR
+from xivo_dao.alchemy.ivr_choice import IVRChoice
+from xivo_dao.alchemy.queuemember import QueueMember
+from xivo_dao.alchemy.userfeatures import UserFeatures
+from xivo_dao.alchemy.voicemail import Voicemail
+from xivo_dao.helpers.db_manager import daosession
+
+
+@daosession
+def find_context_settings_by_tenant(session, tenant_uuid):
+    # the enabled contexts of asterisk_conf_dao.find_context_settings, only
+    # with the columns used by the generators
+    query = session.query(
+        Context.name,
+        Context.contexttype,
+        Context.tenant_uuid,
+    ).filter(Context.commented == 0, Context.tenant_uuid == tenant_uuid)
+    return [row._asdict() for row in query]
+
+
+@daosession
+def find_contextincludes_settings_by_context(session, context_names=None):
+    query = session.query(
+        ContextInclude.context,
+        ContextInclude.include,
+        ContextInclude.priority,
+    ).order_by(ContextInclude.context, ContextInclude.priority)
+    if context_names is not None:
+        query = query.filter(ContextInclude.context.in_(context_names))
+    return _group_by_context(query)
+
+
+@daosession
+def find_contextincludes_fingerprints_by_context(session, context_names=None):
+    fingerprint = _fingerprint(
+        (ContextInclude.include, ContextInclude.priority),
+        ContextInclude.priority,
+        ContextInclude.include,
+    )
+    query = session.query(ContextInclude.context, fingerprint).group_by(
+        ContextInclude.context
+    )
+    if context_names is not None:
+        query = query.filter(ContextInclude.context.in_(context_names))
+    return dict(query)
+
+
+# columns of the rows of find_exten_settings_by_context
+EXTEN_SETTINGS_COLUMNS = ('id', 'context', 'exten', 'type', 'typeval', 'tenant_uuid')
+
+
+@daosession
+def find_exten_settings_by_context(session, context_names=None):
+    # plain tuples, lighter than dicts for the many extensions
+    query = (
+        session.query(
+            Extension.id,
+            Extension.context,
+            Extension.exten,
+            Extension.type,
+            Extension.typeval,
+            Context.tenant_uuid,
+        )
+        .join(Context, Context.name == Extension.context)
+        .filter(Extension.commented == 0)
+        .filter(Extension.typeval != '0')
+        .order_by(Extension.context, Extension.exten)
+    )
+    if context_names is not None:
+        query = query.filter(Extension.context.in_(context_names))
+    result = collections.defaultdict(list)
+    for row in query:
+        result[row.context].append(tuple(row))
+    return dict(result)
+
+
+@daosession
+def find_exten_fingerprints_by_context(session, context_names=None):
+    fingerprint = _fingerprint(
+        (Extension.id, Extension.exten, Extension.type, Extension.typeval),
+        Extension.id,
+    )
+    query = (
+        session.query(Extension.context, fingerprint)
+        .filter(Extension.commented == 0)
+        .filter(Extension.typeval != '0')
+        .group_by(Extension.context)
+    )
+    if context_names is not None:
+        query = query.filter(Extension.context.in_(context_names))
+    return dict(query)
+
+
+@daosession
+def find_ivrs(session):
+    # the choices and destinations rendered by the template are loaded with
+    # one query per relationship instead of one per IVR and choice
+    return (
+        session.query(IVR)
+        .options(
+            selectinload(IVR.dialactions),
+            selectinload(IVR.choices).selectinload(IVRChoice.dialaction),
+        )
+        .order_by(IVR.id)
+        .all()
+    )
+
+
+@daosession
+def find_queue_members_settings_by_queue(session):
+    # the member values of every queue in one query, ordered by position, to
+    # be kept in line with asterisk_conf_dao.find_queue_members_settings as
+    # checked by the integration tests
+    query = (
+        session.query(
+            QueueMember.queue_name,
+            QueueMember.interface,
+            QueueMember.penalty,
+            QueueMember.category,
+            UserFeatures.uuid,
+        )
+        .outerjoin(UserFeatures, UserFeatures.id == QueueMember.userid)
+        .filter(QueueMember.commented == 0)
+        .filter(QueueMember.usertype == 'user')
+        .order_by(QueueMember.queue_name, QueueMember.position)
+    )
+    result = collections.defaultdict(list)
+    for row in query:
+        result[row.queue_name].append(_format_queue_member(row))
+    return dict(result)
+
+
+def _format_queue_member(row):
+    if row.category == 'group':
+        # every line of the user rings
+        interface = f'Local/{row.uuid}@usersharedlines'
+        state_interface = f'hint:{row.uuid}@usersharedlines'
+    else:
+        interface, state_interface = row.interface, ''
+    return (interface, str(row.penalty), '', state_interface)
+
+
+VOICEMAIL_BATCH_SIZE = 1000
+
+
+@daosession
+def find_voicemails_ordered_by_context(session):
+    # the enabled voicemails of voicemail_dao.find_all_by, fetched by batches
+    # while they are iterated, the voicemails of a context following each other
+    return (
+        session.query(Voicemail)
+        .filter(Voicemail.commented == 0)
+        .order_by(Voicemail.context, Voicemail.mailbox)
+        .yield_per(VOICEMAIL_BATCH_SIZE)
+    )
+
+
+def _fingerprint(columns, *order_by):
+    # computed by the database, so only one short value per context is fetched
+    row = func.concat_ws(',', *columns)
+    separator = aggregate_order_by(literal_column("';'"), *order_by)
+    return func.md5(func.string_agg(row, separator))
+
+
+def _group_by_context(query):
+    result = collections.defaultdict(list)
+    for row in query:
+        result[row.context].append(row._asdict())
+    return dict(result)
@@ -1,18 +1,34 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import configparser
+import hashlib
 import logging
+import multiprocessing
+import re
+import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import StringIO
+from typing import NamedTuple
 
 from xivo import xivo_helpers
 from xivo_dao import asterisk_conf_dao
-from xivo_dao.resources.ivr import dao as ivr_dao
 
-from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend import dao
+from wazo_confgend.generators.util import AsteriskFileWriter, format_ast_option
 from wazo_confgend.helpers.asterisk import asterisk_parser
 
 logger = logging.getLogger(__name__)
 
+# fewer extensions are rendered faster serially than sent to the processes
+PARALLEL_MIN_EXTENS = 10000
+SHARDS_PER_PROCESS = 4
+# a split extensions.conf includes the output of confgend for each tenant
+CONFGEN_COMMAND = '/usr/bin/wazo-confgen'
+TENANT_EXTENSIONS_FILENAME = 'extensions-tenant-{tenant_uuid}.conf'
+
 
 DEFAULT_EXTENFEATURES = {
     'paging': 'GoSub(paging,s,1(${EXTEN:3}))',
@@ -49,165 +65,651 @@ DEFAULT_EXTENFEATURES = {
     'groupmemberleave': 'GoSub(group-member-leave,s,1(${EXTEN:3}))',
 }
 
+EXTENFEATURE_NAMES = (
+    'bsfilter',
+    'fwdbusy',
+    'fwdrna',
+    'fwdunc',
+    'phoneprogfunckey',
+    'vmusermsg',
+)
+
+# action of the extensions by type, formatted with the columns of their row
+EXTEN_ACTIONS = {
+    'user': 'GoSub(user,s,1({typeval},,{id}))',
+    'incall': 'GoSub(did,s,1({typeval},))',
+    'did': 'GoSub(did,s,1({typeval},))',
+}
+DEFAULT_EXTEN_ACTION = 'GoSub({type},s,1({typeval},))'
 
-class ExtensionGenerator:
-    def __init__(self, exten_row):
-        self._exten_row = exten_row
+# positional fields of the columns of the extension rows
+_EXTEN_ROW_FIELDS = {
+    column: f'{{{index}}}' for index, column in enumerate(dao.EXTEN_SETTINGS_COLUMNS)
+}
 
 
-class UserExtensionGenerator(ExtensionGenerator):
-    def generate(self):
-        return {
-            'tenant_uuid': self._exten_row['tenant_uuid'],
-            'context': self._exten_row['context'],
-            'exten': self._exten_row['exten'],
-            'priority': '1',
-            'action': 'GoSub(user,s,1({},,{}))'.format(
-                self._exten_row['typeval'], self._exten_row['id']
-            ),
-        }
+class DialplanTemplate:
+    """objtpl lines compiled once into a format string
 
+    Lines are stripped like AsteriskFileWriter.write_option does at compile time.
+    A value ending a line would also have to be stripped, so the rare values
+    that would be are rendered line by line.
+    """
 
-class IncallExtensionGenerator(ExtensionGenerator):
-    def generate(self):
-        return {
-            'tenant_uuid': self._exten_row['tenant_uuid'],
-            'context': self._exten_row['context'],
-            'exten': self._exten_row['exten'],
+    _PLACEHOLDERS = (
+        ('%%CONTEXT%%', '{context}'),
+        ('%%EXTEN%%', '{exten}'),
+        ('%%PRIORITY%%', '{priority}'),
+        ('%%ACTION%%', '{action}'),
+        ('%%TENANT_UUID%%', '{tenant_uuid}'),
+    )
+
+    def __init__(self, lines):
+        self._lines = []
+        self._line_end_fields = set()
+        self._row_formats = {}
+        for line in lines:
+            prefix, padding = (
+                ('exten', '') if line.startswith('%%EXTEN%%') else ('same ', '    ')
+            )
+            line = line.replace('{', '{{').replace('}', '}}')
+            for placeholder, field in self._PLACEHOLDERS:
+                line = line.replace(placeholder, field)
+            line = format_ast_option(prefix, f'{padding}{line}')
+            *_, (_, last_field, _, _) = string.Formatter().parse(line)
+            if last_field is not None:
+                self._line_end_fields.add(last_field)
+            self._lines.append(line)
+        self._format = ''.join(f'{line}\n' for line in self._lines) + '\n'
+
+    def render(self, exten):
+        values = {
+            'context': exten.get('context', ''),
+            'exten': exten.get('exten', ''),
+            'priority': exten.get('priority', ''),
+            'action': exten.get('action', ''),
+            'tenant_uuid': exten.get('tenant_uuid', ''),
+        }
+        for field in self._line_end_fields:
+            value = str(values[field])
+            if not value or value[-1].isspace():
+                return self._render_lines(values)
+        return self._format.format_map(values)
+
+    def _render_lines(self, values):
+        lines = [line.format_map(values).rstrip() for line in self._lines]
+        return ''.join(f'{line}\n' for line in lines) + '\n'
+
+    def render_row(self, row):
+        """Render an extension row of dao.find_exten_settings_by_context
+
+        The row is formatted as is by a format string compiled for its type,
+        without building the values of render.
+        """
+        row_format = self._row_formats.get(row[_TYPE_INDEX])
+        if row_format is None:
+            row_format = self._compile_row_format(row[_TYPE_INDEX])
+        template_format, line_end_indexes = row_format
+        for index in line_end_indexes:
+            value = str(row[index])
+            if not value or value[-1].isspace():
+                return self.render(_exten_from_row(row))
+        return template_format.format(*row)
+
+    def _compile_row_format(self, exten_type):
+        action = EXTEN_ACTIONS.get(exten_type, DEFAULT_EXTEN_ACTION)
+        fields = {
+            'context': _EXTEN_ROW_FIELDS['context'],
+            'exten': _EXTEN_ROW_FIELDS['exten'],
             'priority': '1',
-            'action': f"GoSub(did,s,1({self._exten_row['typeval']},))",
+            'action': action.format_map(_EXTEN_ROW_FIELDS),
+            'tenant_uuid': _EXTEN_ROW_FIELDS['tenant_uuid'],
         }
+        template_format = ''
+        for literal, field, _, _ in string.Formatter().parse(self._format):
+            template_format += literal.replace('{', '{{').replace('}', '}}')
+            if field is not None:
+                template_format += fields[field]
+        # the actions of the table never end with a space
+        line_end_indexes = [
+            dao.EXTEN_SETTINGS_COLUMNS.index(field)
+            for field in sorted(self._line_end_fields)
+            if field in dao.EXTEN_SETTINGS_COLUMNS
+        ]
+        row_format = self._row_formats[exten_type] = (template_format, line_end_indexes)
+        return row_format
+
+
+class SubroutineDialplanTemplate:
+    """objtpl lines shared by the extensions of a section in a subroutine
+
+    Each extension calls the subroutine with the context and extension of the
+    caller, its extension pattern and tenant. The ${CONTEXT} and ${EXTEN} of
+    the shared lines are replaced by the caller's. Only the first lines are
+    shared: the lines from the first jump, subroutine call or action stay in
+    the caller, so they run from its context and in its stack frame, e.g.
+    contextlib reading the caller's context with STACK_PEEK. Templates whose
+    remaining lines depend on their priority are not compacted.
+    """
+
+    _CALL = '%%EXTEN%%,%%PRIORITY%%,GoSub({name},s,1({arguments}))'
+    _ARGUMENTS = '${CONTEXT},${EXTEN},%%EXTEN%%,%%TENANT_UUID%%'
+    _ACTION = '%%ACTION%%'
+    _FIRST_LINE_PREFIX = '%%EXTEN%%,%%PRIORITY%%,'
+    # calling a subroutine for fewer lines only adds one
+    _MIN_SHARED_LINES = 2
+    _CHANNEL_VARIABLES = (
+        (re.compile(r'\$\{CONTEXT(?=[:}])'), '${ARG1'),
+        (re.compile(r'\$\{EXTEN(?=[:}])'), '${ARG2'),
+    )
+    _PLACEHOLDERS = (
+        ('%%CONTEXT%%', '${ARG1}'),
+        ('%%EXTEN%%', '${ARG3}'),
+        ('%%TENANT_UUID%%', '${ARG4}'),
+    )
+    _PRIORITY_DEPENDENT = re.compile(r'%%PRIORITY%%|\$\{PRIORITY\}|STACK_PEEK')
+    _CONTROL_FLOW = re.compile(r'(?i)\b(goto|gosub|macro|return|stackpop)\w*\(')
+    _JUMP = re.compile(r'(?i)(goto|gosub)(if|iftime)?\((.*)\)$')
+
+    @classmethod
+    def compile(cls, section_name, lines):
+        """Returns None when the lines are not one extension starting with lines
+        that can be shared"""
+        if not lines or not lines[0].startswith(cls._FIRST_LINE_PREFIX):
+            return None
+        applications = [lines[0][len(cls._FIRST_LINE_PREFIX) :]]
+        for line in lines[1:]:
+            if line.startswith('%%EXTEN%%') or ',' not in line:
+                return None
+            priority, application = line.split(',', 1)
+            # a labelled line is the target of a jump, it stays in the caller
+            applications.append(application if priority.strip() == 'n' else None)
+
+        shared = 0
+        while shared < len(applications) and cls._can_share(applications[shared]):
+            shared += 1
+        if shared < cls._MIN_SHARED_LINES:
+            return None
+        remaining_lines = [line.strip() for line in lines[shared:]]
+        if not all(cls._can_stay(line.split(',', 1)[1]) for line in remaining_lines):
+            return None
+
+        return cls(
+            cls._subroutine_name(section_name), applications[:shared], remaining_lines
+        )
 
+    @staticmethod
+    def _subroutine_name(section_name):
+        # sanitized names can collide, the hash of the section keeps them apart
+        suffix = hashlib.blake2b(section_name.encode('utf-8'), digest_size=4)
+        sanitized = re.sub('[^a-zA-Z0-9-]', '-', section_name)
+        return f'wazo-objtpl-{sanitized}-{suffix.hexdigest()}'
+
+    @classmethod
+    def _can_share(cls, application):
+        return not (
+            application is None
+            or cls._ACTION in application
+            or cls._PRIORITY_DEPENDENT.search(application)
+            or cls._CONTROL_FLOW.search(application)
+        )
 
-class GenericExtensionGenerator(ExtensionGenerator):
-    def generate(self):
-        return {
-            'tenant_uuid': self._exten_row['tenant_uuid'],
-            'context': self._exten_row['context'],
-            'exten': self._exten_row['exten'],
-            'priority': '1',
-            'action': 'GoSub({},s,1({},))'.format(
-                self._exten_row['type'], self._exten_row['typeval']
-            ),
-        }
+    @classmethod
+    def _can_stay(cls, application):
+        # the caller lines following the call have lower priorities than in
+        # the template
+        if '${PRIORITY}' in application:
+            return False
+        jump = cls._JUMP.match(application.strip())
+        if not jump:
+            return True
+        arguments = jump.group(3).split('(', 1)[0]
+        if jump.group(2):
+            targets = arguments.split('?', 1)[-1].split(':')
+        else:
+            targets = [arguments]
+        # only to a label or to an explicit context, extension and priority
+        return all(
+            len(target.split(',')) == 3 or not target.split(',')[-1].strip().isdigit()
+            for target in targets
+        )
+
+    def __init__(self, name, applications, remaining_lines):
+        self.name = name
+        call = self._CALL.format(name=name, arguments=self._ARGUMENTS)
+        self._call = DialplanTemplate([call] + remaining_lines)
+        first_application, *applications = applications
+        self._lines = [('exten', f's,1,{self._substitute(first_application)}')]
+        for application in applications:
+            self._lines.append(('same ', f'    n,{self._substitute(application)}'))
+        self._lines.append(('same ', '    n,Return()'))
+
+    def _substitute(self, application):
+        for pattern, argument in self._CHANNEL_VARIABLES:
+            application = pattern.sub(argument, application)
+        for placeholder, argument in self._PLACEHOLDERS:
+            application = application.replace(placeholder, argument)
+        return application
+
+    def render(self, exten):
+        return self._call.render(exten)
+
+    def render_row(self, row):
+        return self._call.render_row(row)
+
+    def write_subroutine(self, ast_writer):
+        ast_writer.write_section(self.name)
+        for prefix, line in self._lines:
+            ast_writer.write_option(prefix, line)
+
+
+class ContextSection(NamedTuple):
+    options: list
+    template: DialplanTemplate
+
+
+class ContextsTemplate:
+    """contexts.conf sections, with their objtpl lines compiled"""
+
+    def __init__(self, conf, compact=False):
+        self._sections = {}
+        self._context_sections = {}
+        for name in conf.sections():
+            options = []
+            objtpl_lines = []
+            for option_name, option_value in conf.items(name):
+                if option_name == 'objtpl':
+                    objtpl_lines.append(option_value)
+                else:
+                    options.append((option_name, option_value))
+            section = ContextSection(options, DialplanTemplate(objtpl_lines))
+            self._sections[name] = self._context_sections[name] = section
+            if compact:
+                template = SubroutineDialplanTemplate.compile(name, objtpl_lines)
+                if template:
+                    self._context_sections[name] = ContextSection(options, template)
+
+    @classmethod
+    def from_file(cls, filename, compact=False):
+        conf = asterisk_parser()
+        if filename is not None:
+            # load and validate template conf
+            try:
+                with open(filename) as contextsconf_file:
+                    conf.read_file(contextsconf_file)
+            except configparser.DuplicateSectionError:
+                raise ValueError(f"{filename} has conflicting section names")
+
+            if not conf.has_section('template'):
+                raise ValueError(f"Template section doesn't exist in {filename}")
+        return cls(conf, compact)
+
+    def is_ignored(self, context_name):
+        # context name preceded with '!' is ignored
+        return f'!{context_name}' in self._sections
+
+    def get_section(self, name):
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise configparser.NoSectionError(name)
+
+    def get_context_section(self, context_name, contexttype):
+        section = self._context_sections.get(context_name)
+        if section is None:
+            section = self._context_sections.get(f'type:{contexttype}')
+        if section is None:
+            self.get_section('template')
+            section = self._context_sections['template']
+        return section
+
+
+class ContextFragmentCache:
+    """Contexts rendered by the last extensions.conf generation, with the
+    fingerprint of the rows they were rendered from"""
+
+    def __init__(self):
+        self._fragments = {}
+        self._lock = threading.Lock()
+
+    def get(self, context_name, fingerprint):
+        cached = self._fragments.get(context_name)
+        if cached is None or cached[0] != fingerprint:
+            return None
+        return cached[1]
+
+    def update(self, fragments):
+        # the tenants of a split extensions.conf are generated concurrently
+        with self._lock:
+            self._fragments.update(fragments)
+
+    def retain(self, context_names):
+        context_names = set(context_names)
+        with self._lock:
+            self._fragments = {
+                name: cached
+                for name, cached in self._fragments.items()
+                if name in context_names
+            }
 
 
-extension_generators = {
-    'user': UserExtensionGenerator,
-    'incall': IncallExtensionGenerator,
-    'did': IncallExtensionGenerator,
-}
+_TYPE_INDEX = dao.EXTEN_SETTINGS_COLUMNS.index('type')
+
+
+def _exten_from_row(row):
+    exten_row = dict(zip(dao.EXTEN_SETTINGS_COLUMNS, row))
+    action = EXTEN_ACTIONS.get(exten_row['type'], DEFAULT_EXTEN_ACTION)
+    return {
+        'tenant_uuid': exten_row['tenant_uuid'],
+        'context': exten_row['context'],
+        'exten': exten_row['exten'],
+        'priority': '1',
+        'action': action.format_map(exten_row),
+    }
+
+
+def render_context(context_name, section, contextincludes, exten_rows):
+    output = StringIO()
+    ast_writer = AsteriskFileWriter(output)
+    for option_name, option_value in section.options:
+        ast_writer.write_option(
+            option_name, option_value.replace('%%CONTEXT%%', context_name)
+        )
+
+    # context includes
+    for row in contextincludes:
+        ast_writer.write_option('include', row['include'])
+    ast_writer.write_newline()
+
+    # objects extensions (user, group, ...)
+    output.writelines(map(section.template.render_row, exten_rows))
+    return output.getvalue()
+
+
+def render_contexts(contexts):
+    return [render_context(*context) for context in contexts]
+
+
+def _count_extens(contexts):
+    return sum(len(exten_rows) for _, _, _, exten_rows in contexts)
+
+
+class ContextRenderPool:
+    """Render contexts in worker processes, since rendering is bound by the GIL
+
+    Contexts are split in shards of about the same number of extensions, and the
+    fragments are returned in the order of the contexts.
+    """
+
+    def __init__(self, processes):
+        self._processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def render(self, contexts):
+        shards = self._split(contexts, self._processes * SHARDS_PER_PROCESS)
+        try:
+            results = list(self._get_executor().map(render_contexts, shards))
+        except BrokenProcessPool:
+            logger.error('context rendering processes died, rendering serially')
+            with self._lock:
+                self._executor = None
+            return render_contexts(contexts)
+        return [fragment for fragments in results for fragment in fragments]
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # forking the threaded daemon is unsafe
+                self._executor = ProcessPoolExecutor(
+                    self._processes, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    @staticmethod
+    def _split(contexts, count):
+        shard_size = max(_count_extens(contexts) // count, 1)
+        shards = [[]]
+        shard_extens = 0
+        for context in contexts:
+            if shard_extens >= shard_size:
+                shards.append([])
+                shard_extens = 0
+            shards[-1].append(context)
+            shard_extens += len(context[3])
+        return shards
 
 
 class ExtensionsConf:
-    def __init__(self, contextsconf, hint_generator, tpl_helper):
-        self.contextsconf = contextsconf
+    # the datasets not given to the constructor are fetched when needed
+    datasets = {
+        'extenfeatures': lambda: asterisk_conf_dao.find_extenfeatures_settings(
+            features=EXTENFEATURE_NAMES
+        ),
+        'contexts': lambda: asterisk_conf_dao.find_context_settings(),
+        'xivofeatures': lambda: asterisk_conf_dao.find_exten_xivofeatures_setting(),
+        'ivrs': lambda: dao.find_ivrs(),
+    }
+
+    def __init__(
+        self,
+        contexts_template,
+        hint_generator,
+        tpl_helper,
+        fragment_cache=None,
+        render_pool=None,
+        datasets=None,
+    ):
+        self.contexts_template = contexts_template
         self.hint_generator = hint_generator
         self._tpl_helper = tpl_helper
+        self._fragment_cache = fragment_cache or ContextFragmentCache()
+        self._render_pool = render_pool
+        self._datasets = dict(datasets or {})
+
+    def _get_dataset(self, name):
+        if name not in self._datasets:
+            self._datasets[name] = self.datasets[name]()
+        return self._datasets[name]
 
     def generate(self, output):
         ast_writer = AsteriskFileWriter(output)
-        conf = asterisk_parser()
+        contexts_template = self.contexts_template
 
-        if self.contextsconf is not None:
-            # load and validate template conf
-            try:
-                with open(self.contextsconf) as contextsconf_file:
-                    conf.read_file(contextsconf_file)
-            except configparser.DuplicateSectionError:
-                raise ValueError(f"{self.contextsconf} has conflicting section names")
+        # hints & features (init)
+        self._generate_global_hints(output)
+        xfeatures = self._find_xfeatures()
+        contexts = self._find_contexts()
 
-            if not conf.has_section('template'):
-                raise ValueError(
-                    f"Template section doesn't exist in {self.contextsconf}"
-                )
+        self._generate_contexts(contexts, None, output, ast_writer)
+        self._fragment_cache.retain(ctx['name'] for ctx in contexts)
+        self._generate_subroutines(contexts, ast_writer)
+
+        self._generate_extension_features(contexts_template, xfeatures, ast_writer)
+        self._generate_ivr(output)
+
+    def generate_root(self, output, cached=False):
+        """Generate extensions.conf with the contexts of each tenant in an
+        included file generated by generate_tenant
+
+        The hint generator only has to be indexed for the contexts of the root
+        file. With cached, the included files are requested with --cached, as
+        they only have to be generated again once invalidated.
+        """
+        ast_writer = AsteriskFileWriter(output)
+        contexts_template = self.contexts_template
 
-        # hints & features (init)
         self._generate_global_hints(output)
-        extenfeature_names = (
-            'bsfilter',
-            'fwdbusy',
-            'fwdrna',
-            'fwdunc',
-            'phoneprogfunckey',
-            'vmusermsg',
+        xfeatures = self._find_xfeatures()
+        contexts = self._find_contexts()
+
+        tenant_uuids = dict.fromkeys(
+            ctx['tenant_uuid'] for ctx in contexts if ctx.get('tenant_uuid')
+        )
+        command = f'{CONFGEN_COMMAND} --cached' if cached else CONFGEN_COMMAND
+        ast_writer.write_newline()
+        for tenant_uuid in tenant_uuids:
+            filename = TENANT_EXTENSIONS_FILENAME.format(tenant_uuid=tenant_uuid)
+            output.write(f'#exec {command} asterisk/{filename}\n')
+
+        global_contexts = [ctx for ctx in contexts if not ctx.get('tenant_uuid')]
+        self.hint_generator.build_index(ctx['name'] for ctx in global_contexts)
+        self._generate_contexts(
+            global_contexts,
+            [ctx['name'] for ctx in global_contexts],
+            output,
+            ast_writer,
         )
-        extenfeatures = asterisk_conf_dao.find_extenfeatures_settings(
-            features=extenfeature_names
+        self._fragment_cache.retain(ctx['name'] for ctx in contexts)
+        self._generate_subroutines(contexts, ast_writer)
+
+        self._generate_extension_features(contexts_template, xfeatures, ast_writer)
+        self._generate_ivr(output)
+
+    def generate_tenant(self, tenant_uuid, output):
+        """Generate the contexts of a tenant included by generate_root
+
+        The contexts dataset may hold only the contexts of the tenant, and the
+        hint generator only has to be indexed for them.
+        """
+        ast_writer = AsteriskFileWriter(output)
+        contexts = [
+            ctx
+            for ctx in self._find_contexts()
+            if ctx.get('tenant_uuid') == tenant_uuid
+        ]
+        self.hint_generator.build_index(ctx['name'] for ctx in contexts)
+        self._generate_contexts(
+            contexts, [ctx['name'] for ctx in contexts], output, ast_writer
         )
-        xfeatures = {
+
+    def _find_xfeatures(self):
+        return {
             extenfeature.feature: {
                 'exten': extenfeature.exten,
                 'enabled': extenfeature.enabled,
             }
-            for extenfeature in extenfeatures
+            for extenfeature in self._get_dataset('extenfeatures')
         }
 
-        # foreach active context
-        for ctx in asterisk_conf_dao.find_context_settings():
-            # context name preceded with '!' is ignored
+    def _find_contexts(self):
+        return [
+            ctx
+            for ctx in self._get_dataset('contexts')
+            if not self.contexts_template.is_ignored(ctx['name'])
+        ]
+
+    def _generate_contexts(self, contexts, context_names, output, ast_writer):
+        # context_names is None when contexts are all the contexts, so
+        # every row is loaded without filtering on the names
+        if not contexts:
+            return
+        contexts_template = self.contexts_template
+
+        # the contexts whose rows did not change since the last generation are
+        # not rendered again. The fingerprints are queried before the rows, so a
+        # fragment is never older than its fingerprint.
+        include_fingerprints = dao.find_contextincludes_fingerprints_by_context(
+            context_names
+        )
+        exten_fingerprints = dao.find_exten_fingerprints_by_context(context_names)
+        fingerprints = {}
+        fragments = {}
+        for ctx in contexts:
+            context_name = ctx['name']
+            fingerprint = (
+                contexts_template.get_context_section(context_name, ctx['contexttype']),
+                ctx.get('tenant_uuid'),
+                include_fingerprints.get(context_name),
+                exten_fingerprints.get(context_name),
+            )
+            fingerprints[context_name] = fingerprint
+            fragment = self._fragment_cache.get(context_name, fingerprint)
+            if fragment is not None:
+                fragments[context_name] = fragment
+
+        contextincludes = extens = {}
+        stale_context_names = [
+            ctx['name'] for ctx in contexts if ctx['name'] not in fragments
+        ]
+        if stale_context_names:
+            # loaded for every context at once, to not query once per context
+            if len(stale_context_names) == len(contexts):
+                stale_context_names = context_names
+            contextincludes = dao.find_contextincludes_settings_by_context(
+                stale_context_names
+            )
+            extens = dao.find_exten_settings_by_context(stale_context_names)
+
+        stale_contexts = [
+            (
+                ctx['name'],
+                fingerprints[ctx['name']][0],
+                contextincludes.get(ctx['name'], []),
+                extens.get(ctx['name'], []),
+            )
+            for ctx in contexts
+            if ctx['name'] not in fragments
+        ]
+        if self._render_pool and _count_extens(stale_contexts) >= PARALLEL_MIN_EXTENS:
+            stale_fragments = self._render_pool.render(stale_contexts)
+        else:
+            stale_fragments = render_contexts(stale_contexts)
+        for (context_name, *_), fragment in zip(stale_contexts, stale_fragments):
+            fragments[context_name] = fragment
+
+        for ctx in contexts:
             context_name = ctx['name']
-            if conf and conf.has_section(f'!{context_name}'):
-                continue
             ast_writer.write_newline()
             ast_writer.write_section(context_name)
-            if conf.has_section(context_name):
-                section = context_name
-            elif conf.has_section(f"type:{ctx['contexttype']}"):
-                section = f"type:{ctx['contexttype']}"
-            else:
-                section = 'template'
-
-            tmpl = []
-            for option_name, option_value in conf.items(section):
-                if option_name == 'objtpl':
-                    tmpl.append(option_value)
-                    continue
-                ast_writer.write_option(
-                    option_name, option_value.replace('%%CONTEXT%%', context_name)
-                )
-
-            # context includes
-            for row in asterisk_conf_dao.find_contextincludes_settings(context_name):
-                ast_writer.write_option('include', row['include'])
-            ast_writer.write_newline()
+            output.write(fragments[context_name])
 
-            # objects extensions (user, group, ...)
-            for exten_row in asterisk_conf_dao.find_exten_settings(context_name):
-                exten_generator = extension_generators.get(
-                    exten_row['type'], GenericExtensionGenerator
-                )
-                exten = exten_generator(exten_row).generate()
-                self.gen_dialplan_from_template(tmpl, exten, ast_writer)
+            self._generate_hints(context_name, output)
 
-            self._generate_hints(ctx['name'], output)
+        self._fragment_cache.update(
+            {
+                context_name: (fingerprints[context_name], fragment)
+                for context_name, fragment in fragments.items()
+            }
+        )
 
-        self._generate_extension_features(conf, xfeatures, ast_writer)
-        self._generate_ivr(output)
+    def _generate_subroutines(self, contexts, ast_writer):
+        subroutines = {}
+        for ctx in contexts:
+            template = self.contexts_template.get_context_section(
+                ctx['name'], ctx['contexttype']
+            ).template
+            if isinstance(template, SubroutineDialplanTemplate):
+                subroutines.setdefault(template.name, template)
 
-        return output.getvalue()
+        for subroutine in subroutines.values():
+            ast_writer.write_newline()
+            subroutine.write_subroutine(ast_writer)
 
-    def _generate_extension_features(self, conf, xfeatures, ast_writer):
+    def _generate_extension_features(self, contexts_template, xfeatures, ast_writer):
         # XiVO features
         context = 'xivo-features'
         cfeatures = []
-        tmpl = []
         ast_writer.write_section(context)
-        for option_name, option_value in conf.items(context):
-            if option_name == 'objtpl':
-                tmpl.append(option_value)
-                continue
+        section = contexts_template.get_section(context)
+        for option_name, option_value in section.options:
             ast_writer.write_option(
                 option_name, option_value.replace('%%CONTEXT%%', context)
             )
             ast_writer.write_newline()
 
-        for exten in asterisk_conf_dao.find_exten_xivofeatures_setting():
+        for exten in self._get_dataset('xivofeatures'):
             feature = exten['feature']
             if feature in DEFAULT_EXTENFEATURES:
                 exten['action'] = DEFAULT_EXTENFEATURES[feature]
                 exten['context'] = context
-                self.gen_dialplan_from_template(tmpl, exten, ast_writer)
+                self.gen_dialplan_from_template(section.template, exten, ast_writer)
 
         for x in ('busy', 'rna', 'unc'):
             fwdtype = f"fwd{x}"
@@ -226,22 +728,13 @@ class ExtensionsConf:
                 ast_writer.write_option('exten', exten_feature)
 
     def gen_dialplan_from_template(self, template, exten, ast_writer):
+        if not isinstance(template, DialplanTemplate):
+            template = DialplanTemplate(template)
+
         if 'priority' not in exten:
             exten['priority'] = 1
 
-        for line in template:
-            prefix, padding = (
-                ('exten', '') if line.startswith('%%EXTEN%%') else ('same ', '    ')
-            )
-
-            line = line.replace('%%CONTEXT%%', str(exten.get('context', '')))
-            line = line.replace('%%EXTEN%%', str(exten.get('exten', '')))
-            line = line.replace('%%PRIORITY%%', str(exten.get('priority', '')))
-            line = line.replace('%%ACTION%%', str(exten.get('action', '')))
-            line = line.replace('%%TENANT_UUID%%', str(exten.get('tenant_uuid', '')))
-
-            ast_writer.write_option(prefix, f'{padding}{line}')
-        ast_writer.write_newline()
+        ast_writer.write_raw(template.render(exten))
 
     def _generate_global_hints(self, output):
         output.write('[usersharedlines]\n')
@@ -253,9 +746,10 @@ class ExtensionsConf:
             output.write(f'{line}\n')
 
     def _generate_ivr(self, output):
-        for ivr in ivr_dao.find_all_by():
+        templates = self._tpl_helper.get_customizable_templates(
+            'asterisk/extensions/ivr'
+        )
+        for ivr in self._get_dataset('ivrs'):
             template_context = {'ivr': ivr}
-            template = self._tpl_helper.get_customizable_template(
-                'asterisk/extensions/ivr', ivr.id
-            )
+            template = templates.get(ivr.id)
             output.write(f'{template.dump(template_context)}\n')
@@ -1,10 +1,11 @@
-# Copyright 2011-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 from xivo_dao import asterisk_conf_dao
 
 from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend.prefetch import fetch_serially
 
 
 def write_allow_rules(allowed, ast_writer):
@@ -14,10 +15,18 @@ def write_allow_rules(allowed, ast_writer):
 
 
 class IaxConf:
-    def __init__(self):
-        self._general_settings = asterisk_conf_dao.find_iax_general_settings()
-        self._call_limit_settings = asterisk_conf_dao.find_iax_calllimits_settings()
-        self._trunk_settings = asterisk_conf_dao.find_iax_trunk_settings()
+    datasets = {
+        'general': lambda: asterisk_conf_dao.find_iax_general_settings(),
+        'call_limits': lambda: asterisk_conf_dao.find_iax_calllimits_settings(),
+        'trunks': lambda: asterisk_conf_dao.find_iax_trunk_settings(),
+    }
+
+    def __init__(self, datasets=None):
+        if datasets is None:
+            datasets = fetch_serially(self.datasets)
+        self._general_settings = datasets['general']
+        self._call_limit_settings = datasets['call_limits']
+        self._trunk_settings = datasets['trunks']
 
     def generate(self, output):
         ast_writer = AsteriskFileWriter(output)
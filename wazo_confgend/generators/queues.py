@@ -1,8 +1,9 @@
-# Copyright 2013-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2013-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 from xivo_dao import asterisk_conf_dao
 
+from wazo_confgend import dao
 from wazo_confgend.generators.util import AsteriskFileWriter
 
 
@@ -21,6 +22,8 @@ class QueuesConf:
         for item in asterisk_conf_dao.find_queue_general_settings():
             writer.write_option(item['var_name'], item['var_val'])
 
+        # loaded for every queue at once, to not query once per queue
+        members = dao.find_queue_members_settings_by_queue()
         for q in asterisk_conf_dao.find_queue_settings():
             writer.write_section(q['name'], comment=q['label'])
 
@@ -32,8 +35,5 @@ class QueuesConf:
 
                 writer.write_option(k, v)
 
-            queuemember_settings = asterisk_conf_dao.find_queue_members_settings(
-                q['name']
-            )
-            for values in queuemember_settings:
+            for values in members.get(q['name'], []):
                 writer.write_option('member', ','.join(values))
@@ -1,12 +1,14 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
+import collections
 from operator import itemgetter
 
 from xivo_dao import asterisk_conf_dao
 
 from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend.prefetch import fetch_serially
 
 _GUEST_DEVICE_NAME = 'guest'
 _GUEST_LINE_NAME = 'guestline'
@@ -15,11 +17,20 @@ ABSOLUTE_CHANNEL_TIMEOUT = '36000'
 
 
 class SccpConf:
-    def __init__(self):
-        self._sccpgeneralsettings = asterisk_conf_dao.find_sccp_general_settings()
-        self._sccpline = asterisk_conf_dao.find_sccp_line_settings()
-        self._sccpdevice = asterisk_conf_dao.find_sccp_device_settings()
-        self._sccpspeeddial = asterisk_conf_dao.find_sccp_speeddial_settings()
+    datasets = {
+        'general': lambda: asterisk_conf_dao.find_sccp_general_settings(),
+        'lines': lambda: asterisk_conf_dao.find_sccp_line_settings(),
+        'devices': lambda: asterisk_conf_dao.find_sccp_device_settings(),
+        'speeddials': lambda: asterisk_conf_dao.find_sccp_speeddial_settings(),
+    }
+
+    def __init__(self, datasets=None):
+        if datasets is None:
+            datasets = fetch_serially(self.datasets)
+        self._sccpgeneralsettings = datasets['general']
+        self._sccpline = datasets['lines']
+        self._sccpdevice = datasets['devices']
+        self._sccpspeeddial = datasets['speeddials']
 
     def generate(self, output):
         splitted_settings = _SplittedGeneralSettings.new_from_dao_general_settings(
@@ -88,10 +99,10 @@ class _SccpDeviceConf:
     _TPL_NAME = 'xivo_device_tpl'
 
     def __init__(self, sccpspeeddialdevices):
-        self._sccpspeeddialdevices = sorted(
-            sccpspeeddialdevices,
-            key=itemgetter('fknum'),
-        )
+        # the speeddials of each device, sorted by fknum
+        self._speeddials_by_device = collections.defaultdict(list)
+        for item in sorted(sccpspeeddialdevices, key=itemgetter('fknum')):
+            self._speeddials_by_device[item['device']].append(item)
 
     def generate(self, sccpdevice, general_device_items, output):
         ast_writer = AsteriskFileWriter(output)
@@ -123,11 +134,10 @@ class _SccpDeviceConf:
             ast_writer.write_newline()
 
     def _generate_speeddials(self, device, ast_writer):
-        for item in self._sccpspeeddialdevices:
-            if item['device'] == device:
-                ast_writer.write_option(
-                    'speeddial', f"{item['user_id']:d}-{item['fknum']:d}"
-                )
+        for item in self._speeddials_by_device.get(device, []):
+            ast_writer.write_option(
+                'speeddial', f"{item['user_id']:d}-{item['fknum']:d}"
+            )
 
 
 class _SccpLineConf:
@@ -1,23 +1,239 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import os
+import tempfile
 import textwrap
 import unittest
 from io import StringIO
 from unittest.mock import Mock, patch
 
-from hamcrest import assert_that, contains_string
+from hamcrest import assert_that, contains_exactly, contains_string, starts_with
 from jinja2.loaders import DictLoader
 from xivo_dao.alchemy.ivr import IVR
 
-from wazo_confgend.generators.extensionsconf import ExtensionsConf
+from wazo_confgend.generators.extensionsconf import (
+    ContextRenderPool,
+    ContextsTemplate,
+    DialplanTemplate,
+    ExtensionsConf,
+    SubroutineDialplanTemplate,
+    render_contexts,
+)
 from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend.helpers.asterisk import asterisk_parser
 from wazo_confgend.hints.generator import HintGenerator
 from wazo_confgend.template import TemplateHelper
 
 
+class TestContextsTemplate(unittest.TestCase):
+    def setUp(self):
+        conf = asterisk_parser()
+        conf.read_string(
+            textwrap.dedent(
+                '''\
+                [template]
+                objtpl = %%EXTEN%%,1,NoOp(template)
+
+                [type:internal]
+                include = xivo-features
+                objtpl = %%EXTEN%%,1,NoOp(internal)
+
+                [my-context]
+                objtpl = %%EXTEN%%,1,NoOp(my-context)
+
+                [!ignored]
+                '''
+            )
+        )
+        self.contexts_template = ContextsTemplate(conf)
+
+    def test_get_context_section(self):
+        sections = {
+            ('my-context', 'internal'): 'my-context',
+            ('other', 'internal'): 'internal',
+            ('other', 'incall'): 'template',
+        }
+        for (name, contexttype), expected in sections.items():
+            section = self.contexts_template.get_context_section(name, contexttype)
+            assert_that(
+                section.template.render({'exten': '1000'}),
+                contains_string(f'NoOp({expected})'),
+            )
+
+        section = self.contexts_template.get_context_section('other', 'internal')
+        self.assertEqual(section.options, [('include', 'xivo-features')])
+
+    def test_is_ignored(self):
+        self.assertTrue(self.contexts_template.is_ignored('ignored'))
+        self.assertFalse(self.contexts_template.is_ignored('my-context'))
+
+    def test_from_file_without_template_section(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.conf') as f:
+            f.write('[type:internal]\n')
+            f.flush()
+
+            self.assertRaises(ValueError, ContextsTemplate.from_file, f.name)
+
+
+INTERNAL_SUBROUTINE = 'wazo-objtpl-type-internal-513ec2e1'
+
+
+class TestCompactContextsTemplate(unittest.TestCase):
+    def setUp(self):
+        self.filename = 'etc/wazo-confgend/templates/contexts.conf'
+        self.contexts_template = ContextsTemplate.from_file(self.filename, compact=True)
+        self.exten = {
+            'context': 'ctx',
+            'exten': '1001',
+            'priority': 1,
+            'action': 'GoSub(user,s,1(12,,34))',
+            'tenant_uuid': 'tenant',
+        }
+
+    def test_context_sections_call_a_subroutine_then_the_remaining_lines(self):
+        section = self.contexts_template.get_context_section('ctx', 'internal')
+
+        self.assertEqual(
+            section.template.render(self.exten),
+            f'exten = 1001,1,GoSub({INTERNAL_SUBROUTINE},s,1('
+            '${CONTEXT},${EXTEN},1001,tenant))\n'
+            'same  =     n,GoSub(contextlib,entry-exten-context,1)\n'
+            'same  =     n,GoSub(user,s,1(12,,34))\n\n',
+        )
+
+    def test_the_action_is_not_executed_from_the_subroutine(self):
+        lines = [
+            '%%EXTEN%%,%%PRIORITY%%,Set(BASE=${CONTEXT}/${EXTEN})',
+            'n,Set(TENANT=%%TENANT_UUID%%)',
+            'n,%%ACTION%%',
+        ]
+        template = SubroutineDialplanTemplate.compile('type:internal', lines)
+        output = StringIO()
+
+        template.write_subroutine(AsteriskFileWriter(output))
+
+        self.assertEqual(
+            output.getvalue(),
+            f'[{INTERNAL_SUBROUTINE}]\n'
+            'exten = s,1,Set(BASE=${ARG1}/${ARG2})\n'
+            'same  =     n,Set(TENANT=${ARG4})\n'
+            'same  =     n,Return()\n',
+        )
+        self.assertEqual(
+            template.render({**self.exten, 'action': 'Goto(${EXTEN},2)'}),
+            f'exten = 1001,1,GoSub({INTERNAL_SUBROUTINE},s,1('
+            '${CONTEXT},${EXTEN},1001,tenant))\n'
+            'same  =     n,Goto(${EXTEN},2)\n\n',
+        )
+
+    def test_subroutine_calls_and_jumps_stay_in_the_caller(self):
+        lines = [
+            '%%EXTEN%%,%%PRIORITY%%,Set(A=${CONTEXT})',
+            'n,Set(B=1)',
+            'n,GoSub(contextlib,entry-exten-context,1)',
+            'n,Set(C=2)',
+            'n(retry),Macro(dial)',
+            'n,ExecIf($[${X}]?GoSub(ctx,s,1))',
+            'n,GotoIf($[${X}]?retry)',
+            'n,%%ACTION%%',
+        ]
+        template = SubroutineDialplanTemplate.compile('type:internal', lines)
+        output = StringIO()
+
+        template.write_subroutine(AsteriskFileWriter(output))
+
+        self.assertEqual(
+            output.getvalue(),
+            f'[{INTERNAL_SUBROUTINE}]\n'
+            'exten = s,1,Set(A=${ARG1})\n'
+            'same  =     n,Set(B=1)\n'
+            'same  =     n,Return()\n',
+        )
+        self.assertEqual(
+            template.render(self.exten).splitlines()[1:-1],
+            [f'same  =     {line}' for line in lines[2:-1]]
+            + ['same  =     n,GoSub(user,s,1(12,,34))'],
+        )
+
+    def test_templates_not_compacted(self):
+        for lines in (
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,%%ACTION%%'],
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n(retry),NoOp()', 'n,NoOp()'],
+            ['%%EXTEN%%,%%PRIORITY%%,Set(P=${PRIORITY})', 'n,NoOp()', 'n,NoOp()'],
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,GoSub(ctx,s,1)', 'n,NoOp()'],
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,NoOp()', 'n,Goto(5)'],
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,NoOp()', 'n,GotoIf($[${X}]?4:a)'],
+            ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,NoOp()', 'n,Set(P=${PRIORITY})'],
+        ):
+            self.assertIsNone(
+                SubroutineDialplanTemplate.compile('type:internal', lines), lines
+            )
+
+    def test_subroutine_names_are_unique(self):
+        lines = ['%%EXTEN%%,%%PRIORITY%%,NoOp()', 'n,NoOp()']
+
+        names = [
+            SubroutineDialplanTemplate.compile(section_name, lines).name
+            for section_name in ('type:internal', 'type-internal', 'type_internal')
+        ]
+
+        self.assertEqual(len(set(names)), 3)
+        for name in names:
+            assert_that(name, starts_with('wazo-objtpl-type-internal-'))
+
+    def test_subroutines_execute_the_same_lines(self):
+        normal = ContextsTemplate.from_file(self.filename)
+        for contexttype in ('internal', 'incall', 'outcall', 'unknown'):
+            template = normal.get_context_section('ctx', contexttype).template
+            subroutine = self.contexts_template.get_context_section(
+                'ctx', contexttype
+            ).template
+
+            self.assertEqual(
+                self._inline(subroutine, self.exten),
+                template.render(self.exten).splitlines()[0:-1],
+            )
+
+    def test_incall_keeps_the_jump_to_the_action_label_in_the_caller(self):
+        section = self.contexts_template.get_context_section('ctx', 'incall')
+
+        rendered = section.template.render(self.exten)
+        assert_that(rendered, contains_string('GoSub(wazo-objtpl-type-incall-'))
+        assert_that(rendered, contains_string('n,GotoIf(${XIVO_FROM_S}?:action)'))
+        assert_that(rendered, contains_string('n(action),GoSub(user'))
+
+    def test_xivo_features_is_not_compacted(self):
+        section = self.contexts_template.get_section('xivo-features')
+
+        assert_that(
+            section.template.render(self.exten), contains_string('n,GoSub(user')
+        )
+
+    def test_templates_with_several_extensions_are_not_compacted(self):
+        lines = ['%%EXTEN%%,%%PRIORITY%%,NoOp()', '%%EXTEN%%,hint,Custom:1']
+
+        self.assertIsNone(SubroutineDialplanTemplate.compile('type:internal', lines))
+
+    def _inline(self, subroutine, exten):
+        # the lines of the subroutine followed by the lines of the caller
+        # after the call
+        output = StringIO()
+        subroutine.write_subroutine(AsteriskFileWriter(output))
+        lines = output.getvalue().splitlines()[1:-1]
+        arguments = {
+            '${ARG1}': '${CONTEXT}',
+            '${ARG2}': '${EXTEN}',
+            '${ARG3}': exten['exten'],
+            '${ARG4}': exten['tenant_uuid'],
+        }
+        lines[0] = lines[0].replace('s,1,', f'{exten["exten"]},{exten["priority"]},')
+        for argument, value in arguments.items():
+            lines = [line.replace(argument, value) for line in lines]
+        return lines + subroutine.render(exten).splitlines()[1:-1]
+
+
 class TestExtensionsConf(unittest.TestCase):
     maxDiff = 10000
 
@@ -26,7 +242,7 @@ class TestExtensionsConf(unittest.TestCase):
         self.tpl_mapping = {}
         self.tpl_helper = TemplateHelper(DictLoader(self.tpl_mapping))
         self.extensionsconf = ExtensionsConf(
-            'etc/wazo-confgend/templates/contexts.conf',
+            ContextsTemplate.from_file('etc/wazo-confgend/templates/contexts.conf'),
             self.hint_generator,
             self.tpl_helper,
         )
@@ -34,13 +250,18 @@ class TestExtensionsConf(unittest.TestCase):
 
     @patch('xivo_dao.asterisk_conf_dao.find_exten_xivofeatures_setting')
     def test_extensions_features(self, mock_find_exten_xivofeatures_setting):
-        mock_conf = Mock()
-        mock_conf.items.return_value = [
-            ('objtpl', '%%EXTEN%%,%%PRIORITY%%,Set(__WAZO_BASE_CONTEXT=${CONTEXT})'),
-            ('objtpl', 'n,Set(__XIVO_BASE_EXTEN=${EXTEN})'),
-            ('objtpl', 'n,GoSub(contextlib,entry-exten-context,1)'),
-            ('objtpl', 'n,%%ACTION%%'),
-        ]
+        conf = asterisk_parser()
+        conf.read_string(
+            textwrap.dedent(
+                '''\
+                [xivo-features]
+                objtpl = %%EXTEN%%,%%PRIORITY%%,Set(__WAZO_BASE_CONTEXT=${CONTEXT})
+                objtpl = n,Set(__XIVO_BASE_EXTEN=${EXTEN})
+                objtpl = n,GoSub(contextlib,entry-exten-context,1)
+                objtpl = n,%%ACTION%%
+                '''
+            )
+        )
         xfeatures = {
             'fwdrna': {'exten': '_*22.', 'enabled': True},
             'fwdbusy': {'exten': '_*23.', 'enabled': True},
@@ -72,9 +293,8 @@ class TestExtensionsConf(unittest.TestCase):
 
         ast_writer = AsteriskFileWriter(self.output)
         self.extensionsconf._generate_extension_features(
-            mock_conf, xfeatures, ast_writer
+            ContextsTemplate(conf), xfeatures, ast_writer
         )
-        mock_conf.items.assert_called_once_with('xivo-features')
         mock_find_exten_xivofeatures_setting.assert_called_once()
         self.assertEqual(
             self.output.getvalue(),
@@ -121,6 +341,86 @@ class TestExtensionsConf(unittest.TestCase):
             "exten = *98,1,Set('__WAZO_BASE_CONTEXT': ${CONTEXT})\n\n",
         )
 
+    def test_generate_dialplan_from_compiled_template(self):
+        template = DialplanTemplate(
+            [
+                '%%EXTEN%%,%%PRIORITY%%,Set(__WAZO_TENANT_UUID=%%TENANT_UUID%%)',
+                'n,Set(CTX={%%CONTEXT%%})  ',
+                'n,%%ACTION%%',
+            ]
+        )
+        exten = {
+            'context': 'ctx',
+            'exten': '1001',
+            'action': 'GoSub(callrecord,s,1() )  ',
+            'tenant_uuid': 'tenant',
+        }
+
+        ast_writer = AsteriskFileWriter(self.output)
+        self.extensionsconf.gen_dialplan_from_template(template, exten, ast_writer)
+
+        self.assertEqual(
+            self.output.getvalue(),
+            textwrap.dedent(
+                """\
+                exten = 1001,1,Set(__WAZO_TENANT_UUID=tenant)
+                same  =     n,Set(CTX={ctx})
+                same  =     n,GoSub(callrecord,s,1() )
+
+                """
+            ),
+        )
+
+    def test_render_row_formats_the_action_of_the_type(self):
+        template = DialplanTemplate(
+            [
+                '%%EXTEN%%,%%PRIORITY%%,Set(__WAZO_TENANT_UUID=%%TENANT_UUID%%)',
+                'n,Set(CTX={%%CONTEXT%%})',
+                'n,%%ACTION%%',
+            ]
+        )
+        actions = {
+            'user': 'GoSub(user,s,1(12,,34))',
+            'incall': 'GoSub(did,s,1(12,))',
+            'did': 'GoSub(did,s,1(12,))',
+            'group': 'GoSub(group,s,1(12,))',
+        }
+
+        for exten_type, action in actions.items():
+            result = template.render_row(
+                (34, 'ctx', '1001', exten_type, '12', 'tenant')
+            )
+
+            self.assertEqual(
+                result,
+                textwrap.dedent(
+                    f"""\
+                    exten = 1001,1,Set(__WAZO_TENANT_UUID=tenant)
+                    same  =     n,Set(CTX={{ctx}})
+                    same  =     n,{action}
+
+                    """
+                ),
+            )
+
+    def test_render_row_strips_the_values_ending_a_line(self):
+        template = DialplanTemplate(
+            ['%%EXTEN%%,1,NoOp(%%TENANT_UUID%%)', 'n,%%EXTEN%%']
+        )
+
+        result = template.render_row((34, 'ctx', '1001 ', 'user', '12', 'tenant'))
+
+        self.assertEqual(result, 'exten = 1001 ,1,NoOp(tenant)\nsame  =     n,1001\n\n')
+
+    def test_render_dialplan_template_with_missing_values(self):
+        template = DialplanTemplate(
+            ['%%EXTEN%%,1,NoOp(%%TENANT_UUID%%)', 'n,%%ACTION%%']
+        )
+
+        result = template.render({'exten': 1001})
+
+        self.assertEqual(result, 'exten = 1001,1,NoOp()\nsame  =     n,\n\n')
+
     def test_generate_hints(self):
         hints = [
             'exten = 1000,hint,SIP/abcdef',
@@ -136,10 +436,10 @@ class TestExtensionsConf(unittest.TestCase):
         for hint in hints:
             self.assertTrue(hint in self.output.getvalue())
 
-    @patch('wazo_confgend.generators.extensionsconf.ivr_dao')
-    def test_generate_ivrs(self, mock_ivr_dao):
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    def test_generate_ivrs(self, mock_dao):
         ivr = IVR(id=42, name='foo', menu_sound='héllo-world')
-        mock_ivr_dao.find_all_by.return_value = [ivr]
+        mock_dao.find_ivrs.return_value = [ivr]
         self.tpl_mapping['asterisk/extensions/ivr.jinja'] = textwrap.dedent(
             '''
             [xivo-ivr-{{ ivr.id }}]
@@ -155,9 +455,9 @@ class TestExtensionsConf(unittest.TestCase):
             contains_string('same  =   n,Background(héllo-world)'),
         )
 
-    @patch('wazo_confgend.generators.extensionsconf.ivr_dao')
+    @patch('wazo_confgend.generators.extensionsconf.dao')
     @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
-    def test_generate(self, mock_asterisk_conf_dao, mock_ivr_dao):
+    def test_generate(self, mock_asterisk_conf_dao, mock_dao):
         hints = [
             'exten = 1000,hint,SIP/abcdef',
             'exten = 4000,hint,confbridge:1',
@@ -173,7 +473,7 @@ class TestExtensionsConf(unittest.TestCase):
         ]
         self.tpl_mapping['asterisk/extensions/ivr.jinja'] = "[xivo-ivr-{{ ivr.id }}]"
 
-        mock_ivr_dao.find_all_by.return_value = [
+        mock_dao.find_ivrs.return_value = [
             IVR(id=42, name='foo', menu_sound='hello-world'),
             IVR(id=43, name='bar', menu_sound='youhou'),
         ]
@@ -186,31 +486,32 @@ class TestExtensionsConf(unittest.TestCase):
                 "tenant_uuid": "tenant-uuid",
             },
         ]
-        mock_asterisk_conf_dao.find_contextincludes_settings.return_value = [
-            {"include": "include-me.conf"}
-        ]
-        mock_asterisk_conf_dao.find_exten_settings.side_effect = [
-            [
-                {
-                    "type": "incall",
-                    "context": "default",
-                    "exten": "foo@bar",
-                    "typeval": "incallfilter",
-                    "id": 1234,
-                    "tenant_uuid": "2b853b5b-6c19-4123-90da-3ce05fe9aa74",
-                }
+        mock_dao.find_contextincludes_settings_by_context.return_value = {
+            "ctx_name": [{"include": "include-me.conf"}],
+            "ctx_internal": [{"include": "include-me.conf"}],
+        }
+        mock_dao.find_exten_settings_by_context.return_value = {
+            "ctx_name": [
+                (
+                    1234,
+                    "default",
+                    "foo@bar",
+                    "incall",
+                    "incallfilter",
+                    "2b853b5b-6c19-4123-90da-3ce05fe9aa74",
+                )
             ],
-            [
-                {
-                    "type": "user",
-                    "context": "ctx_internal",
-                    "exten": "user@ctx_internal",
-                    "typeval": "user",
-                    "id": 56,
-                    "tenant_uuid": "5adadf7b-5a4c-4701-9486-a4e8f9d21db0",
-                }
+            "ctx_internal": [
+                (
+                    56,
+                    "ctx_internal",
+                    "user@ctx_internal",
+                    "user",
+                    "user",
+                    "5adadf7b-5a4c-4701-9486-a4e8f9d21db0",
+                )
             ],
-        ]
+        }
 
         self.extensionsconf.generate(self.output)
 
@@ -219,3 +520,242 @@ class TestExtensionsConf(unittest.TestCase):
         with open(os.path.join(path, "expected_generated_extension.conf")) as f:
             expected_lines = [line for line in f.read().split("\n") if line]
         self.assertEqual(expected_lines, lines)
+
+    def _mock_contexts(self, mock_asterisk_conf_dao, mock_dao, count):
+        mock_asterisk_conf_dao.find_extenfeatures_settings.return_value = [
+            Mock(feature=feature, exten='*1', enabled=False)
+            for feature in ('fwdbusy', 'fwdrna', 'fwdunc')
+        ]
+        mock_asterisk_conf_dao.find_exten_xivofeatures_setting.return_value = []
+        mock_dao.find_ivrs.return_value = []
+        mock_asterisk_conf_dao.find_context_settings.return_value = [
+            {'name': f'ctx-{i}', 'contexttype': 'internal', 'tenant_uuid': 'tenant'}
+            for i in range(count)
+        ]
+        mock_dao.find_contextincludes_fingerprints_by_context.return_value = {
+            f'ctx-{i}': 'fingerprint' for i in range(count - 1)
+        }
+        mock_dao.find_exten_fingerprints_by_context.return_value = {}
+        mock_dao.find_contextincludes_settings_by_context.return_value = {
+            f'ctx-{i}': [{'include': f'ctx-{i + 1}'}] for i in range(count - 1)
+        }
+        mock_dao.find_exten_settings_by_context.return_value = {}
+        self.hint_generator.generate_global_hints.return_value = []
+        self.hint_generator.generate.return_value = []
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_query_count_does_not_depend_on_contexts(
+        self, mock_asterisk_conf_dao, mock_dao
+    ):
+        self._mock_contexts(mock_asterisk_conf_dao, mock_dao, 100)
+
+        self.extensionsconf.generate(self.output)
+
+        mock_dao.find_contextincludes_fingerprints_by_context.assert_called_once_with(
+            None
+        )
+        mock_dao.find_exten_fingerprints_by_context.assert_called_once_with(None)
+        mock_dao.find_contextincludes_settings_by_context.assert_called_once_with(None)
+        mock_dao.find_exten_settings_by_context.assert_called_once_with(None)
+        mock_asterisk_conf_dao.find_contextincludes_settings.assert_not_called()
+        mock_asterisk_conf_dao.find_exten_settings.assert_not_called()
+        assert_that(self.output.getvalue(), contains_string('include = ctx-99'))
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_renders_only_the_changed_contexts(
+        self, mock_asterisk_conf_dao, mock_dao
+    ):
+        self._mock_contexts(mock_asterisk_conf_dao, mock_dao, 3)
+        self.extensionsconf.generate(StringIO())
+
+        mock_dao.find_exten_fingerprints_by_context.return_value = {'ctx-1': 'changed'}
+        mock_dao.find_exten_settings_by_context.return_value = {
+            'ctx-1': [(34, 'ctx-1', '1001', 'user', '12', 'tenant')]
+        }
+        mock_dao.find_contextincludes_settings_by_context.reset_mock()
+        mock_dao.find_exten_settings_by_context.reset_mock()
+
+        self.extensionsconf.generate(self.output)
+
+        mock_dao.find_contextincludes_settings_by_context.assert_called_once_with(
+            ['ctx-1']
+        )
+        mock_dao.find_exten_settings_by_context.assert_called_once_with(['ctx-1'])
+        expected_output = StringIO()
+        ExtensionsConf(
+            self.extensionsconf.contexts_template,
+            self.hint_generator,
+            self.tpl_helper,
+        ).generate(expected_output)
+        self.assertEqual(self.output.getvalue(), expected_output.getvalue())
+        assert_that(self.output.getvalue(), contains_string('GoSub(user,s,1(12,,34))'))
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_uses_the_prefetched_datasets(
+        self, mock_asterisk_conf_dao, mock_dao
+    ):
+        self._mock_contexts(mock_asterisk_conf_dao, mock_dao, 3)
+        datasets = {name: fetch() for name, fetch in ExtensionsConf.datasets.items()}
+        for mock in (mock_asterisk_conf_dao, mock_dao):
+            mock.reset_mock()
+        extensionsconf = ExtensionsConf(
+            self.extensionsconf.contexts_template,
+            self.hint_generator,
+            self.tpl_helper,
+            datasets=datasets,
+        )
+
+        extensionsconf.generate(self.output)
+
+        mock_asterisk_conf_dao.find_context_settings.assert_not_called()
+        mock_asterisk_conf_dao.find_extenfeatures_settings.assert_not_called()
+        mock_asterisk_conf_dao.find_exten_xivofeatures_setting.assert_not_called()
+        mock_dao.find_ivrs.assert_not_called()
+        assert_that(self.output.getvalue(), contains_string('[ctx-2]'))
+
+    def _mock_tenant_contexts(self, mock_asterisk_conf_dao, mock_dao):
+        self._mock_contexts(mock_asterisk_conf_dao, mock_dao, 3)
+        mock_asterisk_conf_dao.find_context_settings.return_value = [
+            {'name': 'ctx-0', 'contexttype': 'internal', 'tenant_uuid': 'tenant-a'},
+            {'name': 'ctx-1', 'contexttype': 'internal', 'tenant_uuid': 'tenant-b'},
+            {'name': 'ctx-2', 'contexttype': 'internal', 'tenant_uuid': None},
+            {'name': 'ctx-3', 'contexttype': 'internal', 'tenant_uuid': 'tenant-a'},
+        ]
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_root_includes_the_tenants(self, mock_asterisk_conf_dao, mock_dao):
+        self._mock_tenant_contexts(mock_asterisk_conf_dao, mock_dao)
+
+        self.extensionsconf.generate_root(self.output)
+
+        output = self.output.getvalue()
+        assert_that(
+            output,
+            contains_string(
+                '#exec /usr/bin/wazo-confgen asterisk/extensions-tenant-tenant-a.conf\n'
+                '#exec /usr/bin/wazo-confgen asterisk/extensions-tenant-tenant-b.conf\n'
+            ),
+        )
+        assert_that(output, contains_string('[ctx-2]'))
+        assert_that(output, contains_string('[xivo-features]'))
+        self.assertNotIn('[ctx-0]', output)
+        mock_dao.find_exten_settings_by_context.assert_called_once_with(['ctx-2'])
+        (context_names,), _ = self.hint_generator.build_index.call_args
+        assert_that(list(context_names), contains_exactly('ctx-2'))
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_root_cached(self, mock_asterisk_conf_dao, mock_dao):
+        self._mock_tenant_contexts(mock_asterisk_conf_dao, mock_dao)
+
+        self.extensionsconf.generate_root(self.output, cached=True)
+
+        assert_that(
+            self.output.getvalue(),
+            contains_string(
+                '#exec /usr/bin/wazo-confgen --cached '
+                'asterisk/extensions-tenant-tenant-a.conf\n'
+            ),
+        )
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_tenant_queries_only_its_contexts(
+        self, mock_asterisk_conf_dao, mock_dao
+    ):
+        self._mock_tenant_contexts(mock_asterisk_conf_dao, mock_dao)
+
+        self.extensionsconf.generate_tenant('tenant-a', self.output)
+
+        output = self.output.getvalue()
+        assert_that(output, contains_string('include = ctx-1\n'))
+        assert_that(output, contains_string('[ctx-3]'))
+        self.assertNotIn('[ctx-1]', output)
+        self.assertNotIn('[xivo-features]', output)
+        for find in (
+            mock_dao.find_contextincludes_fingerprints_by_context,
+            mock_dao.find_exten_fingerprints_by_context,
+            mock_dao.find_contextincludes_settings_by_context,
+            mock_dao.find_exten_settings_by_context,
+        ):
+            find.assert_called_once_with(['ctx-0', 'ctx-3'])
+        (context_names,), _ = self.hint_generator.build_index.call_args
+        assert_that(list(context_names), contains_exactly('ctx-0', 'ctx-3'))
+
+    @patch('wazo_confgend.generators.extensionsconf.dao')
+    @patch('wazo_confgend.generators.extensionsconf.asterisk_conf_dao')
+    def test_generate_compact_writes_each_subroutine_once(
+        self, mock_asterisk_conf_dao, mock_dao
+    ):
+        self._mock_contexts(mock_asterisk_conf_dao, mock_dao, 3)
+        mock_dao.find_exten_settings_by_context.return_value = {
+            f'ctx-{i}': [(34, f'ctx-{i}', '1001', 'user', '12', 'tenant')]
+            for i in range(3)
+        }
+        extensionsconf = ExtensionsConf(
+            ContextsTemplate.from_file(
+                'etc/wazo-confgend/templates/contexts.conf', compact=True
+            ),
+            self.hint_generator,
+            self.tpl_helper,
+        )
+
+        extensionsconf.generate(self.output)
+
+        output = self.output.getvalue()
+        self.assertEqual(output.count(f'[{INTERNAL_SUBROUTINE}]'), 1)
+        self.assertEqual(output.count(f'GoSub({INTERNAL_SUBROUTINE},s,1('), 3)
+        self.assertLess(
+            output.index(f'[{INTERNAL_SUBROUTINE}]'), output.index('[xivo-features]')
+        )
+
+
+class TestContextRenderPool(unittest.TestCase):
+    def setUp(self):
+        contexts_template = ContextsTemplate.from_file(
+            'etc/wazo-confgend/templates/contexts.conf'
+        )
+        section = contexts_template.get_context_section('ctx', 'internal')
+        self.contexts = [
+            (
+                f'ctx-{i}',
+                section,
+                [{'include': f'ctx-{i + 1}'}],
+                [
+                    (j, f'ctx-{i}', str(1000 + j), 'user', str(j), 'tenant')
+                    for j in range(i)
+                ],
+            )
+            for i in range(10)
+        ]
+
+    def test_render_is_identical_to_the_serial_rendering(self):
+        pool = ContextRenderPool(2)
+        self.addCleanup(pool.shutdown)
+
+        result = pool.render(self.contexts)
+
+        self.assertEqual(result, render_contexts(self.contexts))
+
+    @patch('wazo_confgend.generators.extensionsconf.ProcessPoolExecutor')
+    def test_shutdown_stops_the_processes(self, ProcessPoolExecutor):
+        pool = ContextRenderPool(2)
+        pool.shutdown()
+        ProcessPoolExecutor.assert_not_called()
+
+        pool.render(self.contexts)
+        pool.shutdown()
+
+        ProcessPoolExecutor.return_value.shutdown.assert_called_once_with()
+
+    def test_split_keeps_the_order(self):
+        shards = ContextRenderPool._split(self.contexts, 4)
+
+        self.assertEqual([len(shard) for shard in shards], [6, 2, 2])
+        self.assertEqual(
+            [context for shard in shards for context in shard], self.contexts
+        )
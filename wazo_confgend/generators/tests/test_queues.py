@@ -1,4 +1,4 @@
-# Copyright 2012-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2012-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -18,7 +18,7 @@ class TestQueuesConf(unittest.TestCase):
         'xivo_dao.asterisk_conf_dao.find_queue_general_settings', Mock(return_value=[])
     )
     @patch(
-        'xivo_dao.asterisk_conf_dao.find_queue_members_settings', Mock(return_value=[])
+        'wazo_confgend.dao.find_queue_members_settings_by_queue', Mock(return_value={})
     )
     def test_empty_sections(self):
         assert_generates_config(
@@ -29,7 +29,7 @@ class TestQueuesConf(unittest.TestCase):
         )
 
     @patch(
-        'xivo_dao.asterisk_conf_dao.find_queue_members_settings', Mock(return_value=[])
+        'wazo_confgend.dao.find_queue_members_settings_by_queue', Mock(return_value={})
     )
     @patch('xivo_dao.asterisk_conf_dao.find_queue_settings', Mock(return_value=[]))
     @patch('xivo_dao.asterisk_conf_dao.find_queue_general_settings')
@@ -51,7 +51,7 @@ class TestQueuesConf(unittest.TestCase):
         'xivo_dao.asterisk_conf_dao.find_queue_general_settings', Mock(return_value=[])
     )
     @patch('xivo_dao.asterisk_conf_dao.find_queue_settings')
-    @patch('xivo_dao.asterisk_conf_dao.find_queue_members_settings')
+    @patch('wazo_confgend.dao.find_queue_members_settings_by_queue')
     def test_queues_section(self, find_queue_members_settings, find_queue_settings):
         find_queue_settings.return_value = [
             {
@@ -62,10 +62,13 @@ class TestQueuesConf(unittest.TestCase):
                 'leaveempty': '',
             }
         ]
-        find_queue_members_settings.return_value = [
-            ('PJSIP/abc', '1', '', ''),
-            ('iface', '2', 'name', 'state_iface'),
-        ]
+        find_queue_members_settings.return_value = {
+            'grp-supertenant-42f6b00e-0181-427b-b885-cf0b95893762': [
+                ('PJSIP/abc', '1', '', ''),
+                ('iface', '2', 'name', 'state_iface'),
+            ],
+            'other': [('PJSIP/def', '0', '', '')],
+        }
 
         assert_generates_config(
             self.queues_conf,
@@ -80,6 +83,4 @@ class TestQueuesConf(unittest.TestCase):
         ''',
         )
         find_queue_settings.assert_called_once_with()
-        find_queue_members_settings.assert_called_once_with(
-            'grp-supertenant-42f6b00e-0181-427b-b885-cf0b95893762'
-        )
+        find_queue_members_settings.assert_called_once_with()
@@ -1,4 +1,4 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -278,6 +278,43 @@ class TestSccpDeviceConf(unittest.TestCase):
         ''',
         )
 
+    def test_speeddials_of_multiple_devices(self):
+        sccpdevice = [
+            {'name': name, 'device': name, 'line': '', 'voicemail': ''}
+            for name in ('SEP1', 'SEP2', 'SEP3')
+        ]
+        sccpspeeddials = [
+            {'fknum': fknum, 'user_id': user_id, 'device': device}
+            for fknum, user_id, device in (
+                (3, 1, 'SEP2'),
+                (1, 2, 'SEP1'),
+                (2, 1, 'SEP2'),
+                (2, 3, 'SEP2'),
+                (1, 4, 'SEP4'),
+            )
+        ]
+
+        device_conf = _SccpDeviceConf(sccpspeeddials)
+        device_conf._generate_devices(sccpdevice, self._ast_writer)
+
+        assert_config_equal(
+            self._output.getvalue(),
+            '''
+            [SEP1](xivo_device_tpl)
+            type = device
+            speeddial = 2-1
+
+            [SEP2](xivo_device_tpl)
+            type = device
+            speeddial = 1-2
+            speeddial = 3-2
+            speeddial = 1-3
+
+            [SEP3](xivo_device_tpl)
+            type = device
+        ''',
+        )
+
 
 class TestSccpLineConf(unittest.TestCase):
     def setUp(self):
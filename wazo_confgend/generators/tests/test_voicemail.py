@@ -1,10 +1,11 @@
-# Copyright 2012-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2012-2026 The Wazo Authors  (see the AUTHORS file)
 # Copyright (C) 2016 Proformatique Inc.
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import textwrap
 import unittest
+from io import StringIO
 from unittest.mock import Mock, patch
 
 from hamcrest import assert_that, equal_to
@@ -18,9 +19,10 @@ class TestVoicemailGenerator(unittest.TestCase):
     def test_given_no_voicemails_when_generating_then_generates_nothing(self):
         generator = VoicemailGenerator([])
 
-        output = generator.generate()
+        output = StringIO()
+        generator.generate(output)
 
-        assert_that(output, equal_to(''))
+        assert_that(output.getvalue(), equal_to(''))
 
     def test_given_voicemail_with_minimal_parameters_when_generating_then_generates_one_entry(
         self,
@@ -41,8 +43,9 @@ class TestVoicemailGenerator(unittest.TestCase):
             """
         )
 
-        output = generator.generate()
-        assert_that(output, equal_to(expected))
+        output = StringIO()
+        generator.generate(output)
+        assert_that(output.getvalue(), equal_to(expected))
 
     def test_given_voicemail_with_all_parameters_when_generating_then_generates_one_entry(
         self,
@@ -75,8 +78,9 @@ class TestVoicemailGenerator(unittest.TestCase):
             """
         )
 
-        output = generator.generate()
-        assert_that(output, equal_to(expected))
+        output = StringIO()
+        generator.generate(output)
+        assert_that(output.getvalue(), equal_to(expected))
 
     def test_given_voicemail_parameter_with_special_characters_when_generating_then_escapes_characters(
         self,
@@ -102,8 +106,9 @@ class TestVoicemailGenerator(unittest.TestCase):
             """
         )
 
-        output = generator.generate()
-        assert_that(output, equal_to(expected))
+        output = StringIO()
+        generator.generate(output)
+        assert_that(output.getvalue(), equal_to(expected))
 
     def test_given_two_voicemails_in_same_context_when_generating_then_generates_two_entries(
         self,
@@ -128,8 +133,9 @@ class TestVoicemailGenerator(unittest.TestCase):
             """
         )
 
-        output = generator.generate()
-        assert_that(output, equal_to(expected))
+        output = StringIO()
+        generator.generate(output)
+        assert_that(output.getvalue(), equal_to(expected))
 
     def test_given_two_voicemails_in_different_contexts_when_generating_then_generates_two_contexts(
         self,
@@ -156,8 +162,42 @@ class TestVoicemailGenerator(unittest.TestCase):
             """
         )
 
-        output = generator.generate()
-        assert_that(output, equal_to(expected))
+        output = StringIO()
+        generator.generate(output)
+        assert_that(output.getvalue(), equal_to(expected))
+
+    @patch('wazo_confgend.dao.find_voicemails_ordered_by_context')
+    def test_build_streams_the_voicemails_ordered_by_context(self, find_voicemails):
+        voicemails = iter(
+            [
+                Voicemail(name='first', number='1000', context='default', options=[]),
+                Voicemail(name='second', number='1001', context='default', options=[]),
+                Voicemail(name='other', number='1000', context='otherctx', options=[]),
+            ]
+        )
+        find_voicemails.return_value = voicemails
+
+        generator = VoicemailGenerator.build()
+        output = StringIO()
+        generator.generate(output)
+
+        assert_that(
+            output.getvalue(),
+            equal_to(
+                textwrap.dedent(
+                    """\
+                    [default]
+                    1000 => ,first,,,deletevoicemail=no
+                    1001 => ,second,,,deletevoicemail=no
+
+                    [otherctx]
+                    1000 => ,other,,,deletevoicemail=no
+
+                    """
+                )
+            ),
+        )
+        find_voicemails.assert_called_once_with()
 
 
 class TestVoicemailConf(unittest.TestCase):
@@ -167,7 +207,6 @@ class TestVoicemailConf(unittest.TestCase):
     )
     def setUp(self):
         self.voicemail_generator = Mock(VoicemailGenerator)
-        self.voicemail_generator.generate.return_value = ''
 
         self.voicemail_conf = VoicemailConf(self.voicemail_generator)
         self.voicemail_conf._voicemail_settings = []
@@ -188,7 +227,9 @@ class TestVoicemailConf(unittest.TestCase):
     )
     def test_non_ascii_voicemail(self):
         voicemail_generator = Mock(VoicemailGenerator)
-        voicemail_generator.generate.return_value = '[defaulté]'
+        voicemail_generator.generate.side_effect = lambda output: output.write(
+            '[defaulté]'
+        )
         voicemail_conf = VoicemailConf(voicemail_generator)
         voicemail_conf._voicemail_settings = []
 
@@ -249,12 +290,14 @@ class TestVoicemailConf(unittest.TestCase):
         )
 
     def test_voicemail_generation_included_in_config(self):
-        self.voicemail_generator.generate.return_value = textwrap.dedent(
-            """\
-            [default]
-            1000 => ,myvoicemail,,,
-
-            """
+        self.voicemail_generator.generate.side_effect = lambda output: output.write(
+            textwrap.dedent(
+                """\
+                [default]
+                1000 => ,myvoicemail,,,
+
+                """
+            )
         )
 
         assert_generates_config(
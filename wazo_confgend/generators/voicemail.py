@@ -1,31 +1,33 @@
-# Copyright 2011-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import itertools
 
 from xivo_dao import asterisk_conf_dao
-from xivo_dao.resources.voicemail import dao as voicemail_dao
 
+from wazo_confgend import dao
 from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend.prefetch import fetch_serially
+
+ESCAPE_TABLE = str.maketrans({'\n': '\\n', '\r': '\\r', '\t': '\\t', '|': None})
 
 
 class VoicemailGenerator:
     @classmethod
     def build(cls):
-        return cls(voicemail_dao.find_all_by(enabled=True))
+        return cls(dao.find_voicemails_ordered_by_context())
 
     def __init__(self, voicemails):
+        # the voicemails of a context must follow each other
         self._voicemails = voicemails
 
-    def generate(self):
-        output = ''
+    def generate(self, output):
         for context, voicemails in self.group_voicemails():
-            output += self.format_context(context)
-            output += '\n'
-            output += self.format_voicemails(voicemails)
-            output += '\n\n'
-        return output
+            output.write(self.format_context(context))
+            output.write('\n')
+            output.writelines(f'{self.format_voicemail(v)}\n' for v in voicemails)
+            output.write('\n')
 
     def group_voicemails(self):
         return itertools.groupby(self._voicemails, lambda v: v.context)
@@ -33,9 +35,6 @@ class VoicemailGenerator:
     def format_context(self, context):
         return f'[{context}]'
 
-    def format_voicemails(self, voicemails):
-        return '\n'.join(self.format_voicemail(v) for v in voicemails)
-
     def format_voicemail(self, voicemail):
         parts = (
             voicemail.password or '',
@@ -77,25 +76,28 @@ class VoicemailGenerator:
         return 'no'
 
     def escape_string(self, value):
-        return (
-            value.replace('\n', '\\n')
-            .replace('\r', '\\r')
-            .replace('\t', '\\t')
-            .replace('|', '')
-        )
+        return value.translate(ESCAPE_TABLE)
 
 
 class VoicemailConf:
-    def __init__(self, voicemail_generator):
+    datasets = {
+        'settings': lambda: asterisk_conf_dao.find_voicemail_general_settings(),
+    }
+
+    def __init__(self, voicemail_generator, datasets=None):
+        if datasets is None:
+            datasets = fetch_serially(self.datasets)
         self.voicemail_generator = voicemail_generator
-        self._voicemail_settings = asterisk_conf_dao.find_voicemail_general_settings()
+        self._voicemail_settings = datasets['settings']
 
     def generate(self, output):
         ast_writer = AsteriskFileWriter(output)
         self._gen_general_section(ast_writer)
         ast_writer.write_newline()
         self._gen_zonemessages_section(ast_writer)
-        output.write(f'\n{self.voicemail_generator.generate()}\n')
+        output.write('\n')
+        self.voicemail_generator.generate(output)
+        output.write('\n')
 
     def _gen_general_section(self, ast_writer):
         ast_writer.write_section('general')
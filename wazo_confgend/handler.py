@@ -1,4 +1,4 @@
-# Copyright 2016-2022 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -84,15 +84,3 @@ class FrontendHandlerFactory(HandlerFactory):
         except AttributeError as e:
             logger.error(e)
             raise NoSuchHandler()
-
-
-class NullHandlerFactory(HandlerFactory):
-    class _NullHandler:
-        def __init__(self, resource, filename):
-            self._error_msg = f'No handler found for {resource}/{filename}'
-
-        def generate(self):
-            logger.error(self._error_msg)
-
-    def get(self, resource, filename):
-        return self._NullHandler(resource, filename).generate
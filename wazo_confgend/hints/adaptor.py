@@ -1,4 +1,4 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import logging
@@ -17,13 +17,29 @@ class HintAdaptor:
             "hint generation must be implemented in a child class"
         )
 
+    def contexts(self):
+        return self._hints.keys()
+
+    def retain(self, context_names):
+        """Keep only the hints of context_names"""
+        self._hints = {
+            context: self._hints[context]
+            for context in context_names
+            if context in self._hints
+        }
+
 
 class ProgfunckeyAdaptor(HintAdaptor):
+    def __init__(self, dao, progfunckey=None):
+        super().__init__(dao)
+        self._progfunckey = progfunckey
+
     def generate(self, context):
-        progfunckey = self.dao.progfunckey_extension()
+        if self._progfunckey is None:
+            self._progfunckey = self.dao.progfunckey_extension()
         for hint in self.find_hints(context):
             arguments = self.progfunckey_arguments(hint)
-            extension = fkey_extension(progfunckey, arguments)
+            extension = fkey_extension(self._progfunckey, arguments)
             yield (extension, f'Custom:{extension}')
 
 
@@ -56,8 +72,8 @@ class ConferenceAdaptor(HintAdaptor):
 
 
 class ForwardAdaptor(ProgfunckeyAdaptor):
-    def __init__(self, dao):
-        super().__init__(dao)
+    def __init__(self, dao, progfunckey=None):
+        super().__init__(dao, progfunckey)
         self._hints = self.dao.forward_hints()
 
     def find_hints(self, context):
@@ -68,8 +84,8 @@ class ForwardAdaptor(ProgfunckeyAdaptor):
 
 
 class GroupMemberAdaptor(ProgfunckeyAdaptor):
-    def __init__(self, dao):
-        super().__init__(dao)
+    def __init__(self, dao, progfunckey=None):
+        super().__init__(dao, progfunckey)
         self._hints = self.dao.groupmember_hints()
 
     def find_hints(self, context):
@@ -80,8 +96,8 @@ class GroupMemberAdaptor(ProgfunckeyAdaptor):
 
 
 class ServiceAdaptor(ProgfunckeyAdaptor):
-    def __init__(self, dao):
-        super().__init__(dao)
+    def __init__(self, dao, progfunckey=None):
+        super().__init__(dao, progfunckey)
         self._hints = self.dao.service_hints()
 
     def find_hints(self, context):
@@ -92,8 +108,8 @@ class ServiceAdaptor(ProgfunckeyAdaptor):
 
 
 class AgentAdaptor(ProgfunckeyAdaptor):
-    def __init__(self, dao):
-        super().__init__(dao)
+    def __init__(self, dao, progfunckey=None):
+        super().__init__(dao, progfunckey)
         self._hints = self.dao.agent_hints()
 
     def find_hints(self, context):
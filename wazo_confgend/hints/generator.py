@@ -1,6 +1,8 @@
-# Copyright 2014-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import collections
+
 from xivo_dao.resources.func_key import hint_dao
 
 from wazo_confgend.hints import adaptor as hint_adaptor
@@ -10,14 +12,17 @@ class HintGenerator:
     DIALPLAN = "exten = {extension},hint,{hint}"
 
     @classmethod
-    def build(cls):
+    def build(cls, index=True, context_names=None):
+        """With context_names, only the hints of these contexts are kept once
+        loaded"""
+        progfunckey = hint_dao.progfunckey_extension()
         context_resource_adaptors = [
             hint_adaptor.UserAdaptor(hint_dao),
             hint_adaptor.ConferenceAdaptor(hint_dao),
-            hint_adaptor.ServiceAdaptor(hint_dao),
-            hint_adaptor.ForwardAdaptor(hint_dao),
-            hint_adaptor.GroupMemberAdaptor(hint_dao),
-            hint_adaptor.AgentAdaptor(hint_dao),
+            hint_adaptor.ServiceAdaptor(hint_dao, progfunckey),
+            hint_adaptor.ForwardAdaptor(hint_dao, progfunckey),
+            hint_adaptor.GroupMemberAdaptor(hint_dao, progfunckey),
+            hint_adaptor.AgentAdaptor(hint_dao, progfunckey),
             hint_adaptor.BSFilterAdaptor(hint_dao),
             hint_adaptor.CustomAdaptor(hint_dao),
         ]
@@ -25,14 +30,42 @@ class HintGenerator:
             hint_adaptor.UserSharedHintAdaptor(hint_dao),
         ]
 
-        return cls(
+        if context_names is not None:
+            # hint_dao loads the hints of every context, of every tenant
+            for adaptor in context_resource_adaptors:
+                adaptor.retain(context_names)
+
+        generator = cls(
             context_resource_adaptors,
             global_resource_adaptors,
         )
+        if index:
+            generator.build_index()
+        return generator
 
     def __init__(self, context_resource_adaptors, global_resource_adaptors):
         self.context_resource_adaptors = context_resource_adaptors
         self.global_resource_adaptors = global_resource_adaptors
+        self._index = None
+
+    def build_index(self, context_names=None):
+        """Generate the hints of every context at once, in the order generate
+        would for each context, or only of context_names when given"""
+        if context_names is not None:
+            context_names = set(context_names)
+        index = collections.defaultdict(list)
+        existing = collections.defaultdict(set)
+        for adaptor in self.context_resource_adaptors:
+            for context in adaptor.contexts():
+                if context_names is not None and context not in context_names:
+                    continue
+                for extension, hint in adaptor.generate(context):
+                    if extension not in existing[context]:
+                        index[context].append(
+                            self.DIALPLAN.format(extension=extension, hint=hint)
+                        )
+                        existing[context].add(extension)
+        self._index = dict(index)
 
     def generate_global_hints(self):
         for adaptor in self.global_resource_adaptors:
@@ -40,6 +73,11 @@ class HintGenerator:
                 yield self.DIALPLAN.format(extension=extension, hint=hint)
 
     def generate(self, context):
+        if self._index is not None:
+            return self._index.get(context, [])
+        return self._generate(context)
+
+    def _generate(self, context):
         existing = set()
         for adaptor in self.context_resource_adaptors:
             for extension, hint in adaptor.generate(context):
@@ -1,4 +1,4 @@
-# Copyright 2014-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -41,6 +41,18 @@ class TestUserAdaptor(TestAdaptor):
         assert_that(self.adaptor.generate(CONTEXT), has_item(('1000', 'SIP/abcdef')))
         self.dao.user_hints.assert_called_once_with()
 
+    def test_adaptor_retains_the_hints_of_some_contexts(self):
+        self.dao.user_hints.return_value = {
+            CONTEXT: [Hint(user_id=42, extension='1000', argument='SIP/abcdef')],
+            'other': [Hint(user_id=43, extension='1001', argument='SIP/ghijkl')],
+        }
+        adaptor = UserAdaptor(self.dao)
+
+        adaptor.retain(['other', 'unknown'])
+
+        assert_that(adaptor.contexts(), contains_exactly('other'))
+        assert_that(list(adaptor.generate(CONTEXT)), contains_exactly())
+
 
 class TestUserSharedHintsAdaptor(TestAdaptor):
     def setUp(self):
@@ -125,6 +137,22 @@ class TestForwardAdaptor(TestAdaptor):
             ),
         )
 
+    def test_given_progfunckey_then_it_is_not_fetched(self):
+        self.dao.forward_hints.return_value = {
+            CONTEXT: [Hint(user_id=42, extension='*23', argument=None)],
+            'other': [Hint(user_id=43, extension='*23', argument=None)],
+        }
+        self.adaptor = ForwardAdaptor(self.dao, '*736')
+
+        assert_that(
+            list(self.adaptor.generate(CONTEXT)) + list(self.adaptor.generate('other')),
+            contains_exactly(
+                ('*73642***223', 'Custom:*73642***223'),
+                ('*73643***223', 'Custom:*73643***223'),
+            ),
+        )
+        self.dao.progfunckey_extension.assert_not_called()
+
 
 class TestServiceAdaptor(TestAdaptor):
     def test_adaptor_generates_service_hint(self):
@@ -1,10 +1,10 @@
-# Copyright 2014-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2014-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import unittest
 from unittest.mock import Mock, patch
 
-from hamcrest import assert_that, contains_exactly
+from hamcrest import assert_that, contains_exactly, equal_to
 
 from .. import adaptor
 from ..adaptor import HintAdaptor
@@ -91,9 +91,13 @@ class TestGenerator(unittest.TestCase):
         custom_adaptor = Mock(adaptor.CustomAdaptor)
         user_adaptor = Mock(adaptor.UserAdaptor)
         custom_adaptor.generate.return_value = [('1000', 'Custom:1000')]
+        custom_adaptor.contexts.return_value = [CONTEXT]
         user_adaptor.generate.return_value = [('1000', 'PJSIP/abcdef')]
+        user_adaptor.contexts.return_value = [CONTEXT]
 
-        with patch('wazo_confgend.hints.generator.hint_adaptor') as adaptors:
+        with patch('wazo_confgend.hints.generator.hint_adaptor') as adaptors, patch(
+            'wazo_confgend.hints.generator.hint_dao'
+        ):
             adaptors.UserAdaptor.return_value = user_adaptor
             adaptors.CustomAdaptor.return_value = custom_adaptor
 
@@ -104,3 +108,77 @@ class TestGenerator(unittest.TestCase):
                 list(result),
                 contains_exactly('exten = 1000,hint,PJSIP/abcdef'),
             )
+
+    def test_build_retains_the_hints_of_some_contexts(self):
+        with patch('wazo_confgend.hints.generator.hint_adaptor') as adaptors, patch(
+            'wazo_confgend.hints.generator.hint_dao'
+        ):
+            HintGenerator.build(index=False, context_names=[CONTEXT])
+
+            adaptors.UserAdaptor.return_value.retain.assert_called_once_with([CONTEXT])
+            adaptors.CustomAdaptor.return_value.retain.assert_called_once_with(
+                [CONTEXT]
+            )
+            adaptors.UserSharedHintAdaptor.return_value.retain.assert_not_called()
+
+
+class TestGeneratorIndex(unittest.TestCase):
+    def test_index_generates_the_same_hints_as_each_context(self):
+        first_adaptor = Mock(HintAdaptor)
+        first_adaptor.contexts.return_value = [CONTEXT, 'other']
+        first_adaptor.generate.side_effect = lambda context: [
+            ('1000', f'PJSIP/{context}')
+        ]
+        second_adaptor = Mock(HintAdaptor)
+        second_adaptor.contexts.return_value = [CONTEXT]
+        second_adaptor.generate.side_effect = lambda context: {
+            CONTEXT: [('1000', 'Custom:1000'), ('*7', 'Custom:*7')]
+        }.get(context, [])
+
+        generator = HintGenerator([first_adaptor, second_adaptor], [])
+        expected = {
+            context: list(generator.generate(context)) for context in (CONTEXT, 'other')
+        }
+        generator.build_index()
+        first_adaptor.generate.reset_mock()
+
+        for context in (CONTEXT, 'other', 'unknown'):
+            assert_that(
+                generator.generate(context), equal_to(expected.get(context, []))
+            )
+        first_adaptor.generate.assert_not_called()
+
+    def test_index_of_some_contexts(self):
+        adaptor = Mock(HintAdaptor)
+        adaptor.contexts.return_value = [CONTEXT, 'other']
+        adaptor.generate.side_effect = lambda context: [('1000', f'PJSIP/{context}')]
+        generator = HintGenerator([adaptor], [])
+
+        generator.build_index(['other', 'unknown'])
+
+        adaptor.generate.assert_called_once_with('other')
+        assert_that(
+            generator.generate('other'),
+            contains_exactly('exten = 1000,hint,PJSIP/other'),
+        )
+        assert_that(generator.generate(CONTEXT), equal_to([]))
+
+    @patch('wazo_confgend.hints.generator.hint_dao')
+    def test_build_fetches_the_progfunckey_once(self, hint_dao):
+        hint_dao.progfunckey_extension.return_value = '*735'
+        for name in ('user', 'conference', 'service', 'groupmember', 'agent'):
+            getattr(hint_dao, f'{name}_hints').return_value = {}
+        hint_dao.bsfilter_hints.return_value = {}
+        hint_dao.custom_hints.return_value = {}
+        hint_dao.forward_hints.return_value = {
+            CONTEXT: [Mock(user_id=42, extension='*23', argument=None)],
+            'other': [Mock(user_id=43, extension='*23', argument=None)],
+        }
+
+        generator = HintGenerator.build()
+
+        assert_that(
+            generator.generate('other'),
+            contains_exactly('exten = *73543***223,hint,Custom:*73543***223'),
+        )
+        hint_dao.progfunckey_extension.assert_called_once_with()
@@ -0,0 +1,141 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import collections
+import contextlib
+import fnmatch
+import threading
+
+from twisted.internet import defer
+
+
+class InvalidationLog:
+    """Invalidations of the cache keys and key patterns, numbered in order
+
+    A generation starts at the number of the last invalidation, and its content
+    is current while its key was not invalidated since, by itself or by a
+    pattern. Only the invalidations needed by the running generations are
+    kept.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = 0
+        self._invalidated = {}
+        self._running = collections.Counter()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._last += 1
+            if self._running:
+                self._invalidated[key] = self._last
+
+    def begin(self):
+        with self._lock:
+            self._running[self._last] += 1
+            return self._last
+
+    def end(self, start):
+        with self._lock:
+            self._running[start] -= 1
+            if not self._running[start]:
+                del self._running[start]
+            oldest = min(self._running, default=self._last)
+            self._invalidated = {
+                key: number
+                for key, number in self._invalidated.items()
+                if number > oldest
+            }
+
+    @contextlib.contextmanager
+    def generation(self):
+        start = self.begin()
+        try:
+            yield start
+        finally:
+            self.end(start)
+
+    def is_current(self, key, start):
+        with self._lock:
+            return self._is_current(key, start)
+
+    def store_if_current(self, key, start, store):
+        # checked and stored under the lock, so the key cannot be invalidated
+        # between the check and the store
+        with self._lock:
+            if not self._is_current(key, start):
+                return False
+            store()
+            return True
+
+    def _is_current(self, key, start):
+        for invalidated, number in self._invalidated.items():
+            if number <= start:
+                continue
+            if invalidated == key:
+                return False
+            if '*' in invalidated and fnmatch.fnmatchcase(key, invalidated):
+                return False
+        return True
+
+
+class _Call:
+    def __init__(self, start):
+        self.start = start
+        self._waiters = []
+
+    def wait(self):
+        d = defer.Deferred()
+        self._waiters.append(d)
+        return d
+
+    def fire(self, result):
+        waiters, self._waiters = self._waiters, []
+        for d in waiters:
+            d.callback(result)
+
+
+class InFlightTable:
+    """Coalesce the concurrent generations of a key into a single generation
+
+    Must be used from the reactor thread, so that waiting for a generation does
+    not hold a worker thread. A caller never joins a generation whose key was
+    invalidated since it started.
+    """
+
+    def __init__(self, counters, invalidations):
+        self._counters = counters
+        self._invalidations = invalidations
+        self._calls = {}
+
+    def run(self, key, function, *args):
+        """Returns a Deferred of the result of function(start, *args), a
+        function returning a Deferred"""
+        d = self.join(key)
+        if d is None:
+            d = self.lead(key, function, *args)
+        return d
+
+    def join(self, key):
+        """Returns a Deferred of the result of the generation in flight, or
+        None when there is no current one"""
+        call = self._calls.get(key)
+        if call is None or not self._invalidations.is_current(key, call.start):
+            return None
+        self._counters.increment('coalesced_requests')
+        return call.wait()
+
+    def lead(self, key, function, *args):
+        self._counters.increment('generations')
+        call = self._calls[key] = _Call(self._invalidations.begin())
+        d = call.wait()
+        generation = defer.maybeDeferred(function, call.start, *args)
+        generation.addBoth(self._finish, key, call)
+        return d
+
+    def _finish(self, result, key, call):
+        self._invalidations.end(call.start)
+        # replaced when a caller came after an invalidation
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        call.fire(result)
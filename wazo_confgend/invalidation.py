@@ -0,0 +1,231 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import fnmatch
+import logging
+
+import psycopg2
+from twisted.internet import threads
+from twisted.internet.interfaces import IReadDescriptor
+from zope.interface import implementer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'wazo_confgend_invalidate'
+RECONNECT_DELAY = 5
+TRIGGERS_QUERY = (
+    "SELECT 1 FROM pg_trigger "
+    "WHERE tgname IN ('wazo_confgend_notify', 'wazo_confgend_notify_tenant') "
+    "LIMIT 1"
+)
+
+_PJSIP = ['asterisk/pjsip.conf']
+_ASTERISK_FILES = _PJSIP + [
+    'asterisk/confbridge.conf',
+    'asterisk/hep.conf',
+    'asterisk/rtp.conf',
+]
+# the {tenant_uuid} of a key is the tenant of the modified rows when the
+# notification has one, else * invalidating the files of every tenant
+_EXTENSIONS = [
+    'asterisk/extensions.conf',
+    'asterisk/extensions-tenant-{tenant_uuid}.conf',
+]
+_USERS = _EXTENSIONS + [
+    'asterisk/pjsip.conf',
+    'asterisk/queues.conf',
+    'asterisk/sccp.conf',
+]
+
+# files to invalidate when a table is modified, a table name with a * matching
+# every table of a family. Any other table invalidates every file.
+TABLE_FILES = {
+    'agentfeatures': _EXTENSIONS + ['asterisk/queues.conf'],
+    'agentqueueskill': ['asterisk/queueskills.conf'],
+    'asterisk_file': _ASTERISK_FILES,
+    'asterisk_file_section': _ASTERISK_FILES,
+    'asterisk_file_variable': _ASTERISK_FILES,
+    'callfilter': _EXTENSIONS,
+    'callfiltermember': _EXTENSIONS,
+    'conference': _EXTENSIONS + ['asterisk/confbridge.conf'],
+    'context': _EXTENSIONS,
+    'contextinclude': _EXTENSIONS,
+    'dialaction': _EXTENSIONS,
+    'endpoint_sip': _PJSIP,
+    'endpoint_sip_section': _PJSIP,
+    'endpoint_sip_section_option': _PJSIP,
+    'extensions': _EXTENSIONS + ['asterisk/res_parking.conf', 'asterisk/sccp.conf'],
+    'feature_extension': _EXTENSIONS,
+    'features': ['asterisk/features.conf'],
+    'func_key': _EXTENSIONS + ['asterisk/sccp.conf'],
+    'func_key_dest_*': _EXTENSIONS + ['asterisk/sccp.conf'],
+    'func_key_mapping': _EXTENSIONS + ['asterisk/sccp.conf'],
+    'func_key_template': _EXTENSIONS + ['asterisk/sccp.conf'],
+    'groupfeatures': _EXTENSIONS + ['asterisk/queues.conf'],
+    'ivr': _EXTENSIONS,
+    'ivr_choice': _EXTENSIONS,
+    'linefeatures': _USERS,
+    'meeting': _PJSIP,
+    'moh': ['asterisk/musiconhold.conf'],
+    'parking_lot': ['asterisk/res_parking.conf'],
+    'pjsip_transport': _PJSIP,
+    'pjsip_transport_option': _PJSIP,
+    'queue': ['asterisk/queues.conf'],
+    'queuefeatures': _EXTENSIONS + ['asterisk/queues.conf'],
+    'queuemember': ['asterisk/queues.conf'],
+    'queueskill': ['asterisk/queueskills.conf'],
+    'queueskillrule': ['asterisk/queueskillrules.conf'],
+    'sccpdevice': ['asterisk/sccp.conf'],
+    'sccpgeneralsettings': ['asterisk/sccp.conf'],
+    'sccpline': ['asterisk/sccp.conf'],
+    'schedule': _EXTENSIONS,
+    'schedule_path': _EXTENSIONS,
+    'schedule_time': _EXTENSIONS,
+    'staticiax': ['asterisk/iax.conf'],
+    'staticqueue': ['asterisk/queues.conf'],
+    'staticvoicemail': ['asterisk/voicemail.conf'],
+    'trunkfeatures': ['asterisk/iax.conf', 'asterisk/pjsip.conf'],
+    'user_line': _USERS,
+    'userfeatures': _USERS + ['asterisk/voicemail.conf'],
+    'useriax': ['asterisk/iax.conf'],
+    'voicemail': _EXTENSIONS + ['asterisk/voicemail.conf'],
+}
+
+
+class CacheInvalidator:
+    def __init__(self, invalidate, table_files):
+        self._invalidate = invalidate
+        self._table_files = table_files
+
+    def table_changed(self, payload):
+        # <table> or <table>:<tenant_uuid> for the rows of a tenant
+        table, _, tenant_uuid = payload.partition(':')
+        logger.debug('table %s changed for tenant %s', table, tenant_uuid or '*')
+        cache_keys = self._find_cache_keys(table)
+        if cache_keys is None:
+            logger.debug('no files known for table %s, invalidating all', table)
+            self.invalidate_all()
+            return
+        for cache_key in cache_keys:
+            self._invalidate(cache_key.format(tenant_uuid=tenant_uuid or '*'))
+
+    def _find_cache_keys(self, table):
+        if table in self._table_files:
+            return self._table_files[table]
+        for pattern, cache_keys in self._table_files.items():
+            if '*' in pattern and fnmatch.fnmatchcase(table, pattern):
+                return cache_keys
+        return None
+
+    def invalidate_all(self):
+        cache_keys = {key for keys in self._table_files.values() for key in keys}
+        for cache_key in sorted(cache_keys):
+            self._invalidate(cache_key.format(tenant_uuid='*'))
+
+
+class MissingTriggersError(Exception):
+    def __str__(self):
+        return (
+            'the wazo_confgend_notify triggers are not installed, '
+            'see confgend-notify-triggers.sql'
+        )
+
+
+@implementer(IReadDescriptor)
+class PostgresNotifier:
+    """Listen to the table change notifications from the reactor thread
+
+    The triggers sending the notifications are installed by the database
+    migrations, the notifications are not listened to until they are.
+    Notifications sent while disconnected are lost, so every file is
+    invalidated when the connection is established.
+    """
+
+    def __init__(self, reactor, db_uri, invalidator):
+        self._reactor = reactor
+        self._db_uri = db_uri
+        self._invalidator = invalidator
+        self._connection = None
+        self._reconnect_call = None
+        self._stopped = False
+
+    def start(self):
+        self._reconnect_call = None
+        # connecting blocks, it must not hold the reactor thread
+        d = threads.deferToThreadPool(
+            self._reactor, self._reactor.getThreadPool(), self._connect
+        )
+        d.addCallbacks(self._listen, self._connect_failed)
+
+    def _connect(self):
+        connection = psycopg2.connect(self._db_uri)
+        try:
+            connection.set_session(autocommit=True)
+            with connection.cursor() as cursor:
+                cursor.execute(TRIGGERS_QUERY)
+                if cursor.fetchone() is None:
+                    raise MissingTriggersError()
+                cursor.execute(f'LISTEN {CHANNEL}')
+        except Exception:
+            connection.close()
+            raise
+        return connection
+
+    def _listen(self, connection):
+        if self._stopped:
+            connection.close()
+            return
+
+        logger.info('listening to database notifications on %s', CHANNEL)
+        self._connection = connection
+        self._reactor.addReader(self)
+        self._invalidator.invalidate_all()
+
+    def _connect_failed(self, failure):
+        failure.trap(psycopg2.Error, MissingTriggersError)
+        logger.error('cannot listen to database notifications: %s', failure.value)
+        self._reconnect_later()
+
+    def stop(self):
+        self._stopped = True
+        if self._reconnect_call is not None:
+            self._reconnect_call.cancel()
+            self._reconnect_call = None
+        self._disconnect()
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        self._reactor.removeReader(self)
+        self._connection.close()
+        self._connection = None
+
+    def fileno(self):
+        if self._connection is None:
+            return -1
+        return self._connection.fileno()
+
+    def doRead(self):
+        try:
+            self._connection.poll()
+        except psycopg2.Error as e:
+            logger.error('database notifications connection lost: %s', e)
+            self._disconnect()
+            self._reconnect_later()
+            return
+
+        while self._connection.notifies:
+            notify = self._connection.notifies.pop(0)
+            self._invalidator.table_changed(notify.payload)
+
+    def connectionLost(self, reason):
+        self._connection = None
+        self._reconnect_later()
+
+    def logPrefix(self):
+        return 'PostgresNotifier'
+
+    def _reconnect_later(self):
+        if self._stopped:
+            return
+        self._reconnect_call = self._reactor.callLater(RECONNECT_DELAY, self.start)
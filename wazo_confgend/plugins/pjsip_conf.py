@@ -1,14 +1,13 @@
-# Copyright 2018-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2018-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
-from io import StringIO
-
 from xivo_dao import asterisk_conf_dao
 from xivo_dao.resources.asterisk_file import dao as asterisk_file_dao
 from xivo_dao.resources.pjsip_transport import dao as transport_dao
 
 from wazo_confgend.generators.util import AsteriskFileWriter
+from wazo_confgend.streaming import streamable
 
 from ..helpers.asterisk import AsteriskFileGenerator
 
@@ -17,9 +16,9 @@ class PJSIPConfGenerator:
     def __init__(self, dependencies):
         pass
 
-    def generate(self):
+    @streamable
+    def generate(self, output):
         asterisk_file_generator = AsteriskFileGenerator(asterisk_file_dao)
-        output = StringIO()
         asterisk_file_generator.generate(
             'pjsip.conf', output, required_sections=['global', 'system']
         )
@@ -30,7 +29,6 @@ class PJSIPConfGenerator:
         self.generate_trunks(output)
         output.write('\n')
         self.generate_meeting_guests(output)
-        return output.getvalue()
 
     def generate_transports(self, output):
         writer = AsteriskFileWriter(output)
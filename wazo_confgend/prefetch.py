@@ -0,0 +1,102 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Fetch the independent datasets a generator declares in parallel
+
+A generator declares its datasets as a dict of functions querying the
+database, and receives the dict of their results.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+from xivo_dao.helpers.db_manager import Session
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_serially(datasets):
+    return {name: fetch() for name, fetch in datasets.items()}
+
+
+def check_pool_size(config):
+    """Raise ValueError when the workers and the prefetch threads can need more
+    connections than the pool of the database engine holds
+
+    A worker holds its connection while waiting for its datasets, so the
+    prefetch threads could otherwise wait for a connection until the pool
+    timeout.
+    """
+    if not config['prefetch_threads']:
+        return
+    pool = Session.get_bind().pool
+    if not isinstance(pool, QueuePool) or pool._max_overflow < 0:
+        return
+    connections = config['max_threads'] + config['prefetch_threads']
+    pool_size = pool.size() + pool._max_overflow
+    if connections > pool_size:
+        raise ValueError(
+            f'max_threads + prefetch_threads ({connections}) exceeds the '
+            f'{pool_size} connections of the database pool'
+        )
+
+
+class Prefetcher:
+    """Fetch datasets on separate pooled connections, in the snapshot of the
+    session of the calling thread
+
+    Each dataset is fetched in its own REPEATABLE READ transaction importing
+    the snapshot exported by the calling transaction, so the datasets are
+    consistent with each other. The calling transaction must be REPEATABLE
+    READ too, as the generations are, so what it queries afterwards is
+    consistent with them. Without workers, the datasets are fetched one after
+    the other in the calling session.
+
+    The datasets are detached from their session once fetched, so the objects
+    they return must have every attribute used by the generator loaded.
+    """
+
+    def __init__(self, max_workers):
+        self._executor = None
+        if max_workers:
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix='confgend-prefetch'
+            )
+
+    def fetch(self, datasets):
+        if self._executor is None or len(datasets) < 2:
+            return fetch_serially(datasets)
+
+        snapshot_id = self._export_snapshot(Session())
+        futures = {
+            name: self._executor.submit(self._fetch_in_snapshot, fetch, snapshot_id)
+            for name, fetch in datasets.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+    def _fetch_in_snapshot(self, fetch, snapshot_id):
+        # the dao functions use the session of the current thread
+        session = Session()
+        try:
+            self._import_snapshot(session, snapshot_id)
+            result = fetch()
+            # the loaded objects must stay usable once the session is closed
+            session.expunge_all()
+            return result
+        finally:
+            session.rollback()
+            Session.remove()
+
+    @staticmethod
+    def _export_snapshot(session):
+        return session.execute(text('SELECT pg_export_snapshot()')).scalar()
+
+    @staticmethod
+    def _import_snapshot(session, snapshot_id):
+        session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+        session.execute(
+            text('SET TRANSACTION SNAPSHOT :snapshot_id'),
+            {'snapshot_id': snapshot_id},
+        )
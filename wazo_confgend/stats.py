@@ -0,0 +1,29 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import collections
+import threading
+
+import yaml
+
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = collections.Counter()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counts[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class StatsFrontend:
+    def __init__(self, counters):
+        self._counters = counters
+
+    def stats_yml(self):
+        return yaml.safe_dump({'counters': self._counters.snapshot()})
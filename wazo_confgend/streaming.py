@@ -0,0 +1,124 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import functools
+import tempfile
+import threading
+from io import StringIO
+
+from twisted.internet import threads
+
+from wazo_confgend.cache import new_content_hash
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+def streamable(generate):
+    """Decorate a handler writing its content to an output file object
+
+    Called with an output keyword argument, the content is written to it and
+    nothing is returned. Called without, the content is returned as a string.
+    """
+
+    @functools.wraps(generate)
+    def wrapper(*args, output=None):
+        if output is not None:
+            generate(*args, output)
+            return None
+
+        output = StringIO()
+        generate(*args, output)
+        return output.getvalue()
+
+    wrapper.streamable = True
+    return wrapper
+
+
+class ChunkedWriter:
+    """File object encoding what is written in chunks pushed to sinks"""
+
+    def __init__(self, sinks, chunk_size=CHUNK_SIZE):
+        self._sinks = sinks
+        self._chunk_size = chunk_size
+        self._buffer = []
+        self._buffered = 0
+        self.bytes_written = 0
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self._chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+
+        chunk = ''.join(self._buffer).encode('utf-8')
+        self._buffer = []
+        self._buffered = 0
+        for sink in self._sinks:
+            sink.write(chunk)
+        self.bytes_written += len(chunk)
+
+
+class ContentSpool:
+    """Sink keeping the content and its digest until the content is complete
+
+    The content is kept in memory up to max_memory bytes, then in a temporary
+    file.
+    """
+
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._hash = new_content_hash()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+    def write(self, chunk):
+        self._file.write(chunk)
+        self._hash.update(chunk)
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    def read_chunks(self, chunk_size=CHUNK_SIZE):
+        self._file.seek(0)
+        return iter(functools.partial(self._file.read, chunk_size), b'')
+
+
+class TransportStream:
+    """Push producer writing chunks from a worker thread to a transport
+
+    Once registered on the transport, the worker thread is blocked while the
+    transport is paused, bounding the memory used to the size of a chunk.
+    """
+
+    def __init__(self, transport, reactor):
+        self._transport = transport
+        self._reactor = reactor
+        self._writable = threading.Event()
+        self._writable.set()
+        self._stopped = False
+
+    def pauseProducing(self):
+        self._writable.clear()
+
+    def resumeProducing(self):
+        self._writable.set()
+
+    def stopProducing(self):
+        self._stopped = True
+        self._writable.set()
+
+    def write(self, chunk):
+        self._writable.wait()
+        if self._stopped:
+            return
+        threads.blockingCallFromThread(self._reactor, self._transport.write, chunk)
@@ -1,4 +1,4 @@
-# Copyright 2016-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -28,11 +28,47 @@ class TemplateHelper:
         filename_custom = f'{name}-{custom_part}.jinja'
         return _Template(self._env.select_template([filename_custom, filename]))
 
+    def get_customizable_templates(self, name):
+        return _CustomizableTemplates(self._env, name)
+
     def get_legacy_contexts_conf(self):
         # TODO return contextsconf as an OrderedRawConf like previously...
         pass
 
 
+class _CustomizableTemplates:
+    """Templates of many custom parts, with the custom templates listed once
+    instead of being looked for each custom part"""
+
+    def __init__(self, env, name):
+        self._env = env
+        self._name = name
+        self._templates = {}
+        prefix = f'{name}-'
+        try:
+            self._custom_filenames = set(
+                env.list_templates(filter_func=lambda n: n.startswith(prefix))
+            )
+        except TypeError:
+            # the loader cannot list its templates
+            self._custom_filenames = None
+
+    def get(self, custom_part):
+        filename = f'{self._name}.jinja'
+        filename_custom = f'{self._name}-{custom_part}.jinja'
+        if self._custom_filenames is None:
+            return _Template(self._env.select_template([filename_custom, filename]))
+
+        if filename_custom in self._custom_filenames:
+            filename = filename_custom
+        template = self._templates.get(filename)
+        if template is None:
+            template = self._templates[filename] = _Template(
+                self._env.get_template(filename)
+            )
+        return template
+
+
 class _Template:
     def __init__(self, jinja_template):
         self._jinja_template = jinja_template
@@ -1,10 +1,14 @@
-# Copyright 2011-2024 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2011-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
+from hamcrest import assert_that, is_, is_not
+
 from wazo_confgend.asterisk import AsteriskFrontend
 from wazo_confgend.generators.tests.util import assert_config_equal
 
@@ -50,3 +54,91 @@ class Test(unittest.TestCase):
             """,
         )
         find_queue_skillrule_settings.assert_called_once_with()
+
+
+class TestTenantExtensions(unittest.TestCase):
+    def setUp(self):
+        self.config = {
+            'templates': {'contextsconf': None},
+            'extensions_split_by_tenant': True,
+        }
+
+    @patch('wazo_confgend.asterisk.dao')
+    @patch('wazo_confgend.asterisk.HintGenerator')
+    @patch('wazo_confgend.asterisk.ExtensionsConf')
+    def test_tenant_extensions_handler(self, ExtensionsConf, HintGenerator, dao):
+        frontend = AsteriskFrontend(self.config, Mock())
+        generate_tenant = ExtensionsConf.return_value.generate_tenant
+        generate_tenant.side_effect = lambda tenant_uuid, output: output.write(
+            f'[ctx-{tenant_uuid}]\n'
+        )
+
+        contexts = [{'name': 'ctx-a', 'contexttype': 'internal'}]
+        dao.find_context_settings_by_tenant.return_value = contexts
+
+        handler = getattr(frontend, 'extensions-tenant-0c2a-4d_conf')
+
+        assert_that(handler(), is_('[ctx-0c2a-4d]\n'))
+        assert_that(handler.streamable, is_(True))
+        HintGenerator.build.assert_called_once_with(
+            index=False, context_names=['ctx-a']
+        )
+        dao.find_context_settings_by_tenant.assert_called_once_with('0c2a-4d')
+        *_, datasets = ExtensionsConf.call_args[0]
+        assert_that(datasets, is_({'contexts': contexts}))
+
+    @patch('wazo_confgend.asterisk.ExtensionsConf')
+    def test_root_extensions_includes_cached_tenants_when_invalidated(
+        self, ExtensionsConf
+    ):
+        self.config['cache_invalidation'] = {'enabled': True}
+        frontend = AsteriskFrontend(self.config, Mock())
+        frontend._prefetcher = Mock()
+        frontend._prefetcher.fetch.return_value = {'hints': Mock()}
+
+        frontend.extensions_conf()
+
+        generate_root = ExtensionsConf.return_value.generate_root
+        generate_root.assert_called_once_with(generate_root.call_args[0][0], True)
+
+    def test_tenant_extensions_handler_when_not_split(self):
+        self.config['extensions_split_by_tenant'] = False
+        frontend = AsteriskFrontend(self.config, Mock())
+
+        self.assertRaises(
+            AttributeError, getattr, frontend, 'extensions-tenant-0c2a-4d_conf'
+        )
+        self.assertRaises(AttributeError, getattr, frontend, 'unknown_conf')
+
+
+class TestContextsTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.contextsconf = os.path.join(self.tmpdir.name, 'contexts.conf')
+        self._write_contextsconf('[template]\nobjtpl = %%EXTEN%%,1,NoOp()\n')
+        config = {'templates': {'contextsconf': self.contextsconf}}
+        self.asteriskFrontEnd = AsteriskFrontend(config, Mock())
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _write_contextsconf(self, content, mtime=None):
+        with open(self.contextsconf, 'w') as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(self.contextsconf, (mtime, mtime))
+
+    def test_contexts_template_is_parsed_once(self):
+        first = self.asteriskFrontEnd._get_contexts_template()
+        second = self.asteriskFrontEnd._get_contexts_template()
+
+        assert_that(second, is_(first))
+
+    def test_contexts_template_is_parsed_again_when_modified(self):
+        first = self.asteriskFrontEnd._get_contexts_template()
+        self._write_contextsconf('[template]\n\n[type:internal]\n', mtime=1)
+
+        second = self.asteriskFrontEnd._get_contexts_template()
+
+        assert_that(second, is_not(is_(first)))
+        assert_that(second.get_context_section('ctx', 'internal').options, is_([]))
@@ -0,0 +1,265 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from hamcrest import assert_that, close_to, equal_to
+
+from ..cache import CacheEntry, FileCache, MemoryCache, content_digest
+from ..stats import Counters
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = FileCache(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_put_and_get(self):
+        self.cache.put('asterisk/sip.conf', b'content')
+
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'content'))
+
+    def test_put_replaces_the_file(self):
+        self.cache.put('asterisk/sip.conf', b'old content')
+        path = os.path.join(self.tmpdir.name, 'asterisk/sip.conf')
+        with open(path, 'rb') as f:
+            self.cache.put('asterisk/sip.conf', b'new')
+
+            assert_that(f.read(), equal_to(b'old content'))
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'new'))
+        assert_that(
+            os.listdir(os.path.join(self.tmpdir.name, 'asterisk')),
+            equal_to(['sip.conf']),
+        )
+
+    def test_get_entry_reads_the_digest_kept_with_the_file(self):
+        self.cache.put('asterisk/sip.conf', b'content', 'digest')
+
+        assert_that(
+            self.cache.get_entry('asterisk/sip.conf'),
+            equal_to(CacheEntry(b'content', 'digest')),
+        )
+        assert_that(self.cache.get_entry('asterisk/other.conf'), equal_to(None))
+
+    def test_writer_keeps_the_digest_of_the_content(self):
+        writer = self.cache.open_writer('asterisk/sip.conf')
+        writer.write(b'con')
+        writer.write(b'tent')
+        writer.commit()
+
+        assert_that(
+            self.cache.get_entry('asterisk/sip.conf'),
+            equal_to(CacheEntry(b'content', content_digest(b'content'))),
+        )
+
+    @patch('wazo_confgend.cache.os.getxattr', Mock(side_effect=OSError))
+    def test_digest_is_computed_without_extended_attributes(self):
+        self.cache.put('asterisk/sip.conf', b'content', 'digest')
+
+        assert_that(
+            self.cache.get_entry('asterisk/sip.conf'),
+            equal_to(CacheEntry(b'content', content_digest(b'content'))),
+        )
+
+    def test_get_age(self):
+        assert_that(self.cache.get_age('asterisk/sip.conf'), equal_to(None))
+
+        self.cache.put('asterisk/sip.conf', b'content')
+        path = os.path.join(self.tmpdir.name, 'asterisk/sip.conf')
+        os.utime(path, (time.time() - 60, time.time() - 60))
+
+        assert_that(self.cache.get_age('asterisk/sip.conf'), close_to(60, 5))
+
+    def test_writer_replaces_the_content_once_committed(self):
+        self.cache.put('asterisk/sip.conf', b'old')
+
+        writer = self.cache.open_writer('asterisk/sip.conf')
+        writer.write(b'new ')
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'old'))
+        writer.write(b'content')
+        writer.commit()
+
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'new content'))
+
+    def test_concurrent_writers_of_a_key_do_not_mix_their_content(self):
+        first = self.cache.open_writer('asterisk/sip.conf')
+        second = self.cache.open_writer('asterisk/sip.conf')
+        first.write(b'first ')
+        second.write(b'second ')
+        first.write(b'content')
+        second.write(b'content')
+
+        first.commit()
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'first content'))
+        second.commit()
+
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'second content'))
+        assert_that(
+            os.listdir(os.path.join(self.tmpdir.name, 'asterisk')),
+            equal_to(['sip.conf']),
+        )
+
+    def test_prepared_put_replaces_the_content_once_committed(self):
+        self.cache.put('asterisk/sip.conf', b'old')
+
+        writer = self.cache.prepare_put('asterisk/sip.conf', b'new', 'digest')
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'old'))
+        writer.commit()
+
+        assert_that(
+            self.cache.get_entry('asterisk/sip.conf'),
+            equal_to(CacheEntry(b'new', 'digest')),
+        )
+
+    def test_invalidate_matching(self):
+        self.cache.put('asterisk/extensions-tenant-1.conf', b'content')
+        self.cache.put('asterisk/extensions-tenant-2.conf', b'content')
+        self.cache.put('asterisk/extensions.conf', b'content')
+
+        self.cache.invalidate_matching('asterisk/extensions-tenant-*.conf')
+
+        assert_that(
+            os.listdir(os.path.join(self.tmpdir.name, 'asterisk')),
+            equal_to(['extensions.conf']),
+        )
+
+    def test_aborted_writer_keeps_the_previous_content(self):
+        self.cache.put('asterisk/sip.conf', b'old')
+
+        writer = self.cache.open_writer('asterisk/sip.conf')
+        writer.write(b'partial')
+        writer.abort()
+
+        assert_that(self.cache.get('asterisk/sip.conf'), equal_to(b'old'))
+        assert_that(
+            os.listdir(os.path.join(self.tmpdir.name, 'asterisk')),
+            equal_to(['sip.conf']),
+        )
+
+
+class TestMemoryCache(unittest.TestCase):
+    def setUp(self):
+        self.backend = Mock()
+        self.backend.get_entry.return_value = None
+        self.counters = Counters()
+        self.cache = MemoryCache(self.backend, 10, self.counters)
+
+    def test_get_loads_from_backend_once(self):
+        self.backend.get_entry.return_value = CacheEntry(b'content', 'digest')
+
+        result_1 = self.cache.get('key')
+        result_2 = self.cache.get('key')
+
+        assert_that([result_1, result_2], equal_to([b'content', b'content']))
+        self.backend.get_entry.assert_called_once_with('key')
+        assert_that(
+            self.counters.snapshot(),
+            equal_to({'memory_cache_misses': 1, 'memory_cache_hits': 1}),
+        )
+
+    def test_get_entry_keeps_the_digest(self):
+        self.cache.put('key', b'content', 'digest')
+
+        assert_that(
+            self.cache.get_entry('key'), equal_to(CacheEntry(b'content', 'digest'))
+        )
+
+    def test_digest_is_loaded_from_backend(self):
+        self.backend.get_entry.return_value = CacheEntry(b'content', 'digest')
+
+        entry = self.cache.get_entry('key')
+
+        assert_that(entry, equal_to(CacheEntry(b'content', 'digest')))
+
+    def test_miss_is_not_kept_when_invalidated_while_read(self):
+        def get_entry(key):
+            self.cache.invalidate(key)
+            return CacheEntry(b'stale', 'digest')
+
+        self.backend.get_entry.side_effect = get_entry
+
+        assert_that(self.cache.get('key'), equal_to(b'stale'))
+
+        self.backend.get_entry.side_effect = None
+        self.backend.get_entry.return_value = None
+        assert_that(self.cache.get('key'), equal_to(None))
+
+    def test_put_writes_through(self):
+        self.cache.put('key', b'content')
+
+        assert_that(self.cache.get('key'), equal_to(b'content'))
+        self.backend.put.assert_called_once_with(
+            'key', b'content', content_digest(b'content')
+        )
+        self.backend.get_entry.assert_not_called()
+
+    def test_least_recently_used_entries_are_evicted_above_max_bytes(self):
+        self.cache.put('a', b'aaaa')
+        self.cache.put('b', b'bbbb')
+        self.cache.get('a')
+        self.cache.put('c', b'cccc')
+
+        assert_that(self.cache.get('a'), equal_to(b'aaaa'))
+        assert_that(self.cache.get('c'), equal_to(b'cccc'))
+        assert_that(self.cache.get('b'), equal_to(None))
+        assert_that(self.counters.snapshot()['memory_cache_evictions'], equal_to(1))
+
+    def test_entries_larger_than_max_bytes_are_not_kept(self):
+        self.cache.put('key', b'a' * 11)
+
+        self.cache.get('key')
+
+        self.backend.get_entry.assert_called_once_with('key')
+
+    def test_invalidate(self):
+        self.cache.put('key', b'content')
+
+        self.cache.invalidate('key')
+
+        assert_that(self.cache.get('key'), equal_to(None))
+        self.backend.invalidate.assert_called_once_with('key')
+
+    def test_invalidate_matching(self):
+        self.cache.put('tenant-1', b'1')
+        self.cache.put('other', b'2')
+        self.backend.get_entry.return_value = None
+
+        self.cache.invalidate_matching('tenant-*')
+
+        assert_that(self.cache.get('tenant-1'), equal_to(None))
+        assert_that(self.cache.get('other'), equal_to(b'2'))
+        self.backend.invalidate_matching.assert_called_once_with('tenant-*')
+
+    def test_prepared_put_is_stored_on_commit(self):
+        self.cache.put('key', b'old')
+        backend_writer = self.backend.prepare_put.return_value
+
+        writer = self.cache.prepare_put('key', b'new', 'digest')
+
+        self.backend.prepare_put.assert_called_once_with('key', b'new', 'digest')
+        assert_that(self.cache.get('key'), equal_to(b'old'))
+
+        writer.commit()
+
+        backend_writer.commit.assert_called_once_with()
+        assert_that(self.cache.get_entry('key'), equal_to(CacheEntry(b'new', 'digest')))
+
+    def test_committed_writer_discards_the_entry(self):
+        self.cache.put('key', b'old')
+        backend_writer = self.backend.open_writer.return_value
+
+        writer = self.cache.open_writer('key')
+        writer.write(b'new')
+        writer.commit()
+
+        backend_writer.write.assert_called_once_with(b'new')
+        backend_writer.commit.assert_called_once_with()
+        self.backend.get_entry.return_value = CacheEntry(b'new', 'digest')
+        assert_that(self.cache.get('key'), equal_to(b'new'))
@@ -1,15 +1,33 @@
-# Copyright 2018-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2018-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
 import random
+import struct
 import tempfile
 import unittest
-from unittest.mock import Mock
-
-from hamcrest import assert_that, calling, equal_to, raises
-
-from ..confgen import Confgen, ConfgendFactory
+from unittest.mock import Mock, call, patch
+
+from hamcrest import (
+    assert_that,
+    calling,
+    contains_exactly,
+    equal_to,
+    instance_of,
+    raises,
+)
+from twisted.internet import defer
+
+from ..cache import CacheEntry, content_digest
+from ..confgen import (
+    PROTOCOL_V2_GREETING,
+    Confgen,
+    ConfgendFactory,
+    FramedConfgen,
+    Response,
+    Status,
+)
+from ..handler import NoSuchHandler
 
 
 def sample_unicode_string(length):
@@ -41,6 +59,9 @@ def sample_unicode_string(length):
 class TestConfgen(unittest.TestCase):
     def setUp(self):
         self.factory = Mock()
+        self.factory.generate_deferred.side_effect = lambda *args: defer.maybeDeferred(
+            self.factory.generate_response, *args
+        )
         self.transport = Mock()
         self.protocol = Confgen()
         self.protocol.factory = self.factory
@@ -51,18 +72,22 @@ class TestConfgen(unittest.TestCase):
 
         self.protocol.dataReceived(cmd)
 
-        self.factory.generate.assert_called_once_with('resource', 'filename.conf')
+        self.factory.generate_response.assert_called_once_with(
+            'resource', 'filename.conf'
+        )
         self.transport.write.assert_called_once_with(
-            self.factory.generate.return_value.encode("utf-8")
+            self.factory.generate_response.return_value.content
         )
 
     def test_receive_command_no_result(self):
-        self.factory.generate.return_value = None
+        self.factory.generate_response.return_value = Response(Status.NOT_FOUND)
         cmd = b'resource/filename.conf\n'
 
         self.protocol.dataReceived(cmd)
 
-        self.factory.generate.assert_called_once_with('resource', 'filename.conf')
+        self.factory.generate_response.assert_called_once_with(
+            'resource', 'filename.conf'
+        )
         self.transport.write.assert_not_called()
 
     def test_receive_with_arguments(self):
@@ -70,11 +95,11 @@ class TestConfgen(unittest.TestCase):
 
         self.protocol.dataReceived(cmd)
 
-        self.factory.generate.assert_called_once_with(
+        self.factory.generate_response.assert_called_once_with(
             'resource', 'filename.conf', 'arg1', 'arg2'
         )
         self.transport.write.assert_called_once_with(
-            self.factory.generate.return_value.encode("utf-8")
+            self.factory.generate_response.return_value.content
         )
 
     def test_receive_unicode(self):
@@ -83,12 +108,85 @@ class TestConfgen(unittest.TestCase):
         cmd = f"resource/{filename}.conf arg1 arg2\n"
         self.protocol.dataReceived(cmd.encode("utf-8"))
         print(self.factory.generate.mock_calls)
-        self.factory.generate.assert_called_with(
+        self.factory.generate_response.assert_called_with(
             'resource', f"{filename}.conf", 'arg1', 'arg2'
         )
         self.transport.write.assert_called_with(
-            self.factory.generate.return_value.encode("utf-8")
+            self.factory.generate_response.return_value.content
+        )
+
+    def test_connection_is_closed_after_the_content_is_written(self):
+        deferred = defer.Deferred()
+        self.factory.generate_deferred.side_effect = None
+        self.factory.generate_deferred.return_value = deferred
+
+        self.protocol.dataReceived(b'resource/filename.conf\n')
+
+        self.transport.loseConnection.assert_not_called()
+
+        deferred.callback(Response(Status.OK, b'some content'))
+
+        self.transport.write.assert_called_once_with(b'some content')
+        self.transport.loseConnection.assert_called_once_with()
+
+    def test_receive_batch_command(self):
+        self.factory.generate_batch_deferred.return_value = defer.succeed(
+            Response(Status.OK, b'multipart')
+        )
+
+        self.protocol.dataReceived(b'batch a/b.conf c/d.conf\n')
+
+        self.factory.generate_batch_deferred.assert_called_once_with(
+            'a/b.conf', 'c/d.conf'
+        )
+        self.transport.write.assert_called_once_with(b'multipart')
+        self.transport.loseConnection.assert_called_once_with()
+
+    def test_receive_not_modified(self):
+        self.factory.generate_response.return_value = Response(
+            Status.NOT_MODIFIED, digest='digest'
+        )
+
+        self.protocol.dataReceived(b'resource/filename.conf if-none-match=digest\n')
+
+        self.transport.write.assert_called_once_with(b'unchanged\n')
+
+    def test_receive_with_digest(self):
+        self.factory.generate_response.return_value = Response(
+            Status.OK, b'content', 'digest'
+        )
+
+        self.protocol.dataReceived(b'resource/filename.conf digest\n')
+
+        assert_that(
+            self.transport.write.call_args_list,
+            contains_exactly(call(b'digest\n'), call(b'content')),
+        )
+
+    @patch('wazo_confgend.confgen.TransportStream')
+    def test_receive_stream_command(self, TransportStream):
+        stream = TransportStream.return_value
+        self.factory.generate_stream_deferred.return_value = defer.succeed(
+            Response(Status.OK)
+        )
+
+        self.protocol.dataReceived(b'resource/filename.conf stream\n')
+
+        self.transport.registerProducer.assert_called_once_with(stream, True)
+        self.factory.generate_stream_deferred.assert_called_once_with(
+            'resource', 'filename.conf', stream, 'stream'
         )
+        self.transport.unregisterProducer.assert_called_once_with()
+        self.transport.write.assert_not_called()
+        self.transport.loseConnection.assert_called_once_with()
+
+    def test_connection_is_closed_on_generation_error(self):
+        self.factory.generate_response.side_effect = Exception
+
+        self.protocol.dataReceived(b'resource/filename.conf\n')
+
+        self.transport.write.assert_not_called()
+        self.transport.loseConnection.assert_called_once_with()
 
     def test_receive_bad_encoding(self):
         # test behavior when receiving non-utf-8 garbage
@@ -100,11 +198,109 @@ class TestConfgen(unittest.TestCase):
         )
 
 
+def frame(payload):
+    return struct.pack('!I', len(payload)) + payload
+
+
+class TestFramedConfgen(unittest.TestCase):
+    def setUp(self):
+        self.factory = Mock()
+        self.transport = Mock()
+        self.protocol = Confgen()
+        self.protocol.factory = self.factory
+        self.protocol.makeConnection(self.transport)
+
+    def written_frames(self):
+        data = b''.join(call.args[0] for call in self.transport.write.call_args_list)
+        frames = []
+        while data:
+            (length,) = struct.unpack('!I', data[:4])
+            frames.append(data[4 : 4 + length])
+            data = data[4 + length :]
+        return frames
+
+    def test_greeting_switches_to_framed_protocol(self):
+        self.factory.generate_deferred.return_value = defer.succeed(
+            Response(Status.OK, b'some content')
+        )
+
+        self.protocol.dataReceived(
+            PROTOCOL_V2_GREETING + frame(b'resource/filename.conf  arg1')
+        )
+
+        assert_that(self.protocol._framed_protocol, instance_of(FramedConfgen))
+        self.factory.generate_deferred.assert_called_once_with(
+            'resource', 'filename.conf', 'arg1'
+        )
+        assert_that(self.written_frames(), contains_exactly(b'200\nsome content'))
+        self.transport.loseConnection.assert_not_called()
+
+    def test_digest_is_sent_in_the_status_line(self):
+        self.factory.generate_deferred.side_effect = [
+            defer.succeed(Response(Status.OK, b'some content', 'abc')),
+            defer.succeed(Response(Status.NOT_MODIFIED, digest='abc')),
+        ]
+        self.protocol.dataReceived(PROTOCOL_V2_GREETING)
+
+        self.protocol.dataReceived(
+            frame(b'resource/file.conf')
+            + frame(b'resource/file.conf if-none-match=abc')
+        )
+
+        assert_that(
+            self.written_frames(),
+            contains_exactly(b'200 abc\nsome content', b'304 abc\n'),
+        )
+
+    def test_pipelined_responses_are_sent_in_request_order(self):
+        first, second = defer.Deferred(), defer.Deferred()
+        self.factory.generate_deferred.side_effect = [first, second]
+        self.protocol.dataReceived(PROTOCOL_V2_GREETING)
+
+        second_frame = frame(b'resource/second.conf cached')
+        self.protocol.dataReceived(frame(b'resource/first.conf') + second_frame[:10])
+        self.protocol.dataReceived(second_frame[10:])
+        second.callback(Response(Status.CACHED, b'second'))
+
+        self.transport.write.assert_not_called()
+
+        first.callback(Response(Status.NOT_FOUND))
+
+        assert_that(self.written_frames(), contains_exactly(b'404\n', b'203\nsecond'))
+
+    def test_batch_command(self):
+        self.factory.generate_batch_deferred.return_value = defer.succeed(
+            Response(Status.OK, b'multipart')
+        )
+        self.protocol.dataReceived(PROTOCOL_V2_GREETING)
+
+        self.protocol.dataReceived(frame(b'batch a/b.conf c/d.conf'))
+
+        self.factory.generate_batch_deferred.assert_called_once_with(
+            'a/b.conf', 'c/d.conf'
+        )
+        assert_that(self.written_frames(), contains_exactly(b'200\nmultipart'))
+
+    def test_invalid_and_failed_commands(self):
+        self.factory.generate_deferred.return_value = defer.fail(Exception())
+        self.protocol.dataReceived(PROTOCOL_V2_GREETING)
+
+        self.protocol.dataReceived(frame(b'invalid') + frame(b'resource/file.conf'))
+
+        assert_that(self.written_frames(), contains_exactly(b'400\n', b'500\n'))
+
+
 class TestConfgendFactory(unittest.TestCase):
     def setUp(self):
         config = {
             'templates': {'contextsconf': ''},
             'plugins': {},
+            'max_stale': {'test.stale.yml': 30, 'test.default.yml': 30},
+            'max_fresh': {'test.stale.yml': 5},
+            'max_threads': 2,
+            'memory_cache_size': 1024,
+            'cache_invalidation': {'enabled': False},
+            'warm_up': {'files': [], 'max_concurrency': 1},
         }
         cachedir = tempfile.gettempdir()
 
@@ -119,23 +315,23 @@ class TestConfgendFactory(unittest.TestCase):
 
         result = self.factory.generate('test', 'myfile.yml')
 
-        assert_that(result, equal_to(self.handler.return_value))
+        assert_that(result, equal_to(b'some content'))
 
     def test_that_error_on_generate_returns_cached_value(self):
         self.handler.side_effect = Exception
-        self.get_cached_content.return_value = 'cached content'
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
 
         result = self.factory.generate('test', 'myfile.yml')
 
-        assert_that(result, equal_to(self.get_cached_content.return_value))
+        assert_that(result, equal_to(b'cached content'))
 
     def test_that_the_cached_argument_returns_the_cached_value(self):
         self.handler.return_value = 'some content'
-        self.get_cached_content.return_value = 'cached content'
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
 
         result = self.factory.generate('test', 'myfile.yml', 'cached')
 
-        assert_that(result, equal_to(self.get_cached_content.return_value))
+        assert_that(result, equal_to(b'cached content'))
 
     def test_that_the_cached_argument_returns_the_a_generated_value_when_no_cache(self):
         self.handler.return_value = 'some content'
@@ -143,10 +339,467 @@ class TestConfgendFactory(unittest.TestCase):
 
         result = self.factory.generate('test', 'myfile.yml', 'cached')
 
-        assert_that(result, equal_to(self.handler.return_value))
+        assert_that(result, equal_to(b'some content'))
+
+    def test_generate_response_status(self):
+        self.handler.return_value = 'some content'
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate_response('test', 'myfile.yml')
+        expected_digest = content_digest(b'some content')
+        assert_that(
+            result, equal_to(Response(Status.OK, b'some content', expected_digest))
+        )
+
+        result = self.factory.generate_response('test', 'myfile.yml', 'cached')
+        assert_that(
+            result, equal_to(Response(Status.CACHED, b'cached content', 'digest'))
+        )
+
+    def test_if_none_match_with_the_same_digest_returns_not_modified(self):
+        self.handler.return_value = 'some content'
+        digest = content_digest(b'some content')
+
+        result = self.factory.generate_response(
+            'test', 'myfile.yml', f'if-none-match={digest}'
+        )
+
+        assert_that(result, equal_to(Response(Status.NOT_MODIFIED, digest=digest)))
+
+    def test_if_none_match_with_another_digest_returns_the_content(self):
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate_response(
+            'test', 'myfile.yml', 'cached', 'if-none-match=other'
+        )
+
+        assert_that(
+            result, equal_to(Response(Status.CACHED, b'cached content', 'digest'))
+        )
+
+    def test_that_error_on_generate_without_cache_returns_an_error(self):
+        self.handler.side_effect = Exception
+        self.get_cached_content.return_value = None
+
+        result = self.factory.generate_response('test', 'myfile.yml')
+
+        assert_that(result, equal_to(Response(Status.ERROR)))
+
+    def test_that_unknown_file_returns_not_found(self):
+        self.handler_factory.get.side_effect = NoSuchHandler
+        self.get_cached_content.return_value = None
+
+        result = self.factory.generate_response('test', 'myfile.yml')
+
+        assert_that(result, equal_to(Response(Status.NOT_FOUND)))
+
+    @patch('wazo_confgend.confgen.reactor')
+    def test_stale_content_is_returned_and_refreshed(self, reactor):
+        self.cache.get_age.return_value = 10
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate_response('test', 'stale.yml')
+
+        assert_that(
+            result, equal_to(Response(Status.CACHED, b'cached content', 'digest'))
+        )
+        self.handler.assert_not_called()
+        reactor.callFromThread.assert_called_once_with(
+            self.factory._refresh, 'test/stale.yml', 'test', 'stale.yml'
+        )
+
+    @patch('wazo_confgend.confgen.reactor')
+    def test_fresh_content_is_returned_without_refresh(self, reactor):
+        self.cache.get_age.return_value = 4
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate_response('test', 'stale.yml')
+
+        assert_that(
+            result, equal_to(Response(Status.CACHED, b'cached content', 'digest'))
+        )
+        self.handler.assert_not_called()
+        reactor.callFromThread.assert_not_called()
+
+    @patch('wazo_confgend.confgen.reactor')
+    def test_content_is_fresh_for_half_its_max_stale_by_default(self, reactor):
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        self.cache.get_age.return_value = 14
+        self.factory.generate_response('test', 'default.yml')
+        reactor.callFromThread.assert_not_called()
+
+        self.cache.get_age.return_value = 16
+        self.factory.generate_response('test', 'default.yml')
+        reactor.callFromThread.assert_called_once_with(
+            self.factory._refresh, 'test/default.yml', 'test', 'default.yml'
+        )
+
+    @patch('wazo_confgend.confgen.threads')
+    @patch('wazo_confgend.confgen.reactor')
+    def test_stale_content_is_refreshed_once_at_a_time(self, reactor, threads):
+        pending = []
+        threads.deferToThreadPool.side_effect = self._defer_to_pool(pending)
+        self.cache.get_age.return_value = 10
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        self.factory.generate_response('test', 'stale.yml')
+        self.factory.generate_response('test', 'stale.yml')
+
+        assert_that(reactor.callFromThread.call_count, equal_to(1))
+
+        self.handler.return_value = 'some content'
+        self.factory._refresh('test/stale.yml', 'test', 'stale.yml')
+        pending.pop()()
+        self.factory.generate_response('test', 'stale.yml')
+
+        assert_that(reactor.callFromThread.call_count, equal_to(2))
+
+    def test_content_older_than_max_stale_is_generated(self):
+        self.handler.return_value = 'some content'
+        self.cache.get_age.return_value = 31
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate('test', 'stale.yml')
+
+        assert_that(result, equal_to(b'some content'))
+
+    def test_content_without_max_stale_is_generated(self):
+        self.handler.return_value = 'some content'
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+
+        result = self.factory.generate('test', 'myfile.yml')
+
+        assert_that(result, equal_to(b'some content'))
+        self.cache.get_age.assert_not_called()
+
+    def test_stop_factory_stops_the_context_render_processes(self):
+        self.factory._threadpool = Mock()
+        self.factory._asterisk_frontend = Mock()
+
+        self.factory.stopFactory()
+
+        self.factory._threadpool.stop.assert_called_once_with()
+        self.factory._asterisk_frontend.shutdown.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.reactor')
+    def test_invalidate(self, reactor):
+        self.factory._warm_up = Mock()
+
+        self.factory.invalidate('test/myfile.yml')
+
+        self.cache.invalidate.assert_called_once_with('test/myfile.yml')
+        reactor.callFromThread.assert_called_once_with(
+            self.factory._warm_up.schedule, 'test/myfile.yml'
+        )
+
+    @patch('wazo_confgend.confgen.reactor', Mock())
+    def test_content_is_not_cached_when_invalidated_during_generation(self):
+        def handler():
+            self.factory.invalidate('test/myfile.yml')
+            return 'stale content'
+
+        self.handler_factory.get.return_value = handler
+
+        result = self.factory.generate('test', 'myfile.yml')
+
+        assert_that(result, equal_to(b'stale content'))
+        writer = self.cache.prepare_put.return_value
+        writer.commit.assert_not_called()
+        writer.abort.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.reactor')
+    def test_invalidate_pattern(self, reactor):
+        def handler():
+            self.factory.invalidate('test/my*.yml')
+            return 'stale content'
+
+        self.handler_factory.get.return_value = handler
+
+        self.factory.generate('test', 'myfile.yml')
+
+        self.cache.invalidate_matching.assert_called_once_with('test/my*.yml')
+        self.cache.prepare_put.return_value.commit.assert_not_called()
+        reactor.callFromThread.assert_called_once_with(
+            self.factory._warm_up.schedule, 'test/my*.yml'
+        )
+
+    @patch('wazo_confgend.confgen.reactor', Mock())
+    def test_content_is_cached_when_another_file_is_invalidated(self):
+        def handler():
+            self.factory.invalidate('test/other.yml')
+            return 'some content'
+
+        self.handler_factory.get.return_value = handler
+
+        self.factory.generate('test', 'myfile.yml')
+
+        self.cache.prepare_put.assert_called_once_with(
+            'test/myfile.yml', b'some content', content_digest(b'some content')
+        )
+        self.cache.prepare_put.return_value.commit.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.session_scope')
+    def test_generate_in_a_single_snapshot(self, session_scope):
+        session = session_scope.return_value.__enter__.return_value
+        self.handler_factory.get.return_value = Mock(return_value='some content')
+
+        self.factory.generate('test', 'myfile.yml')
+
+        session_scope.assert_called_once_with(read_only=True)
+        session.connection.assert_called_once_with(
+            execution_options={'isolation_level': 'REPEATABLE READ'}
+        )
+
+    @patch('wazo_confgend.confgen.session_scope')
+    def test_generate_batch_response(self, session_scope):
+        session = session_scope.return_value.__enter__.return_value
+        handlers = {
+            'a.yml': Mock(return_value='é content'),
+            'fail.yml': Mock(side_effect=Exception),
+        }
+
+        def get_handler(resource, filename):
+            if filename not in handlers:
+                raise NoSuchHandler()
+            return handlers[filename]
+
+        self.handler_factory.get.side_effect = get_handler
+        self.get_cached_content.return_value = None
+
+        result = self.factory.generate_batch_response(
+            'test/a.yml', 'test/unknown.yml', 'invalid', 'test/fail.yml'
+        )
+
+        expected_content = (
+            '200 test/a.yml 10\né content'
+            '404 test/unknown.yml 0\n'
+            '400 invalid 0\n'
+            '500 test/fail.yml 0\n'
+        ).encode('utf-8')
+        assert_that(result, equal_to(Response(Status.OK, expected_content)))
+        session_scope.assert_called_once_with(read_only=True)
+        session.connection.assert_called_once_with(
+            execution_options={'isolation_level': 'REPEATABLE READ'}
+        )
+        savepoint = session.begin_nested.return_value
+        assert_that(savepoint.commit.call_count, equal_to(2))
+        savepoint.rollback.assert_called_once_with()
+
+    def test_generate_stream(self):
+        def handler(output):
+            output.write('some content')
+
+        self.handler_factory.get.return_value = handler
+        handler.streamable = True
+        stream = Mock()
+        cache_writer = self.cache.open_writer.return_value
+
+        result = self.factory.generate_stream('test', 'myfile.yml', stream)
+
+        assert_that(result, equal_to(Response(Status.OK)))
+        stream.write.assert_called_once_with(b'some content')
+        cache_writer.write.assert_called_once_with(b'some content')
+        cache_writer.commit.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.reactor', Mock())
+    def test_stream_is_not_cached_when_invalidated_during_generation(self):
+        def handler(output):
+            output.write('stale content')
+            self.factory.invalidate('test/myfile.yml')
+
+        self.handler_factory.get.return_value = handler
+        handler.streamable = True
+        stream = Mock()
+        cache_writer = self.cache.open_writer.return_value
+
+        result = self.factory.generate_stream('test', 'myfile.yml', stream)
+
+        assert_that(result, equal_to(Response(Status.OK)))
+        stream.write.assert_called_once_with(b'stale content')
+        cache_writer.commit.assert_not_called()
+        cache_writer.abort.assert_called_once_with()
+
+    def test_that_error_on_generate_stream_streams_cached_value(self):
+        self.handler.side_effect = Exception
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+        stream = Mock()
+        cache_writer = self.cache.open_writer.return_value
+
+        result = self.factory.generate_stream('test', 'myfile.yml', stream)
+
+        assert_that(result, equal_to(Response(Status.CACHED, digest='digest')))
+        stream.write.assert_called_once_with(b'cached content')
+        cache_writer.abort.assert_called_once_with()
+
+    def test_generate_stream_with_the_same_digest_sends_unchanged(self):
+        def handler(output):
+            output.write('some content')
+
+        self.handler_factory.get.return_value = handler
+        handler.streamable = True
+        digest = content_digest(b'some content')
+        stream = Mock()
+        cache_writer = self.cache.open_writer.return_value
+
+        result = self.factory.generate_stream(
+            'test', 'myfile.yml', stream, 'stream', f'if-none-match={digest}'
+        )
+
+        assert_that(result, equal_to(Response(Status.NOT_MODIFIED, digest=digest)))
+        stream.write.assert_called_once_with(b'unchanged\n')
+        cache_writer.commit.assert_called_once_with()
+
+    def test_generate_stream_with_digest_sends_the_digest_first(self):
+        def handler(output):
+            output.write('some content')
+
+        self.handler_factory.get.return_value = handler
+        handler.streamable = True
+        digest = content_digest(b'some content')
+        stream = Mock()
+
+        result = self.factory.generate_stream(
+            'test', 'myfile.yml', stream, 'stream', 'digest', 'if-none-match=other'
+        )
+
+        assert_that(result, equal_to(Response(Status.OK, digest=digest)))
+        assert_that(
+            stream.write.call_args_list,
+            contains_exactly(call(f'{digest}\n'.encode()), call(b'some content')),
+        )
+
+    def test_generate_stream_from_cache_with_the_same_digest_sends_unchanged(self):
+        self.handler_factory.get.side_effect = NoSuchHandler
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+        stream = Mock()
+
+        result = self.factory.generate_stream(
+            'test', 'myfile.yml', stream, 'stream', 'if-none-match=digest'
+        )
+
+        assert_that(result, equal_to(Response(Status.NOT_MODIFIED, digest='digest')))
+        stream.write.assert_called_once_with(b'unchanged\n')
+
+    @patch('wazo_confgend.confgen.reactor', Mock())
+    def test_generate_stream_with_the_invalidate_argument(self):
+        stream = Mock()
+
+        result = self.factory.generate_stream(
+            'test', 'myfile.yml', stream, 'stream', 'invalidate'
+        )
+
+        assert_that(result, equal_to(Response(Status.OK)))
+        self.cache.invalidate.assert_called_once_with('test/myfile.yml')
+        self.handler.assert_not_called()
+        stream.write.assert_not_called()
+
+    def test_generate_stream_with_the_cached_argument_streams_the_cached_value(self):
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+        stream = Mock()
+
+        result = self.factory.generate_stream(
+            'test', 'myfile.yml', stream, 'stream', 'cached', 'digest'
+        )
+
+        assert_that(result, equal_to(Response(Status.CACHED, digest='digest')))
+        assert_that(
+            stream.write.call_args_list,
+            contains_exactly(call(b'digest\n'), call(b'cached content')),
+        )
+        self.handler.assert_not_called()
+
+    @patch('wazo_confgend.confgen.threads')
+    def test_generate_stream_deferred_joins_a_generation_in_flight(self, threads):
+        pending = []
+        threads.deferToThreadPool.side_effect = self._defer_to_pool(pending)
+        self.handler.return_value = 'some content'
+        self.get_cached_content.return_value = None
+        stream = Mock()
+        results = []
+
+        self.factory.generate_deferred('test', 'myfile.yml')
+        d = self.factory.generate_stream_deferred(
+            'test', 'myfile.yml', stream, 'stream'
+        )
+        d.addCallback(results.append)
+        for release in pending:
+            release()
+
+        digest = content_digest(b'some content')
+        assert_that(len(pending), equal_to(1))
+        assert_that(results, contains_exactly(Response(Status.OK, digest=digest)))
+        stream.write.assert_called_once_with(b'some content')
 
     def test_the_invalidate_command(self):
         result = self.factory.generate('test', 'myfile.yml', 'invalidate')
 
         assert_that(result, equal_to(None))
         self.cache.invalidate.assert_called_once_with('test/myfile.yml')
+
+    def _defer_to_pool(self, pending):
+        # runs in the calling thread, the generations only once released
+        def defer_to_pool(reactor, threadpool, function, *args):
+            if function != self.factory._do_generate_and_cache:
+                return defer.maybeDeferred(function, *args)
+            d = defer.Deferred()
+            pending.append(lambda: d.callback(function(*args)))
+            return d
+
+        return defer_to_pool
+
+    @patch('wazo_confgend.confgen.threads')
+    def test_generate_deferred_coalesces_concurrent_generations(self, threads):
+        pending = []
+        threads.deferToThreadPool.side_effect = self._defer_to_pool(pending)
+        self.handler.return_value = 'some content'
+        self.get_cached_content.return_value = None
+        results = []
+
+        for _ in range(3):
+            d = self.factory.generate_deferred('test', 'myfile.yml')
+            d.addCallback(results.append)
+        for release in pending:
+            release()
+
+        digest = content_digest(b'some content')
+        assert_that(len(pending), equal_to(1))
+        assert_that(
+            results, equal_to([Response(Status.OK, b'some content', digest)] * 3)
+        )
+        self.handler.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.reactor', Mock())
+    @patch('wazo_confgend.confgen.threads')
+    def test_generate_deferred_does_not_join_an_invalidated_generation(self, threads):
+        pending = []
+        threads.deferToThreadPool.side_effect = self._defer_to_pool(pending)
+        self.handler.return_value = 'some content'
+        self.get_cached_content.return_value = None
+
+        self.factory.generate_deferred('test', 'myfile.yml')
+        self.factory.invalidate('test/myfile.yml')
+        self.factory.generate_deferred('test', 'myfile.yml')
+        for release in pending:
+            release()
+
+        assert_that(len(pending), equal_to(2))
+        writer = self.cache.prepare_put.return_value
+        writer.commit.assert_called_once_with()
+        writer.abort.assert_called_once_with()
+
+    @patch('wazo_confgend.confgen.threads')
+    def test_generate_deferred_with_cached_content_does_not_generate(self, threads):
+        threads.deferToThreadPool.side_effect = self._defer_to_pool([])
+        self.get_cached_content.return_value = CacheEntry(b'cached content', 'digest')
+        results = []
+
+        d = self.factory.generate_deferred(
+            'test', 'myfile.yml', 'cached', 'if-none-match=digest'
+        )
+        d.addCallback(results.append)
+
+        assert_that(
+            results, contains_exactly(Response(Status.NOT_MODIFIED, digest='digest'))
+        )
+        self.handler.assert_not_called()
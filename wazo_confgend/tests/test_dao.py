@@ -0,0 +1,59 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from typing import NamedTuple
+from unittest.mock import MagicMock, patch
+
+from hamcrest import assert_that, equal_to
+
+from .. import dao
+
+
+class QueueMemberRow(NamedTuple):
+    queue_name: str
+    interface: str
+    penalty: int
+    category: str
+    uuid: str
+
+
+@patch('xivo_dao.helpers.db_manager.Session')
+class TestFindQueueMembersSettingsByQueue(unittest.TestCase):
+    def _mock_rows(self, Session, rows):
+        query = MagicMock()
+        for method in ('outerjoin', 'filter', 'order_by'):
+            getattr(query, method).return_value = query
+        query.__iter__.side_effect = lambda: iter(rows)
+        Session.return_value.query.return_value = query
+        return query
+
+    def test_members_are_grouped_by_queue(self, Session):
+        self._mock_rows(
+            Session,
+            [
+                QueueMemberRow('q1', 'PJSIP/abc', 0, 'queue', 'user-1'),
+                QueueMemberRow('q1', 'PJSIP/def', 2, 'group', 'user-2'),
+                QueueMemberRow('q2', 'SCCP/1001', 1, 'queue', 'user-3'),
+            ],
+        )
+
+        members = dao.find_queue_members_settings_by_queue()
+
+        assert_that(
+            members,
+            equal_to(
+                {
+                    'q1': [
+                        ('PJSIP/abc', '0', '', ''),
+                        (
+                            'Local/user-2@usersharedlines',
+                            '2',
+                            '',
+                            'hint:user-2@usersharedlines',
+                        ),
+                    ],
+                    'q2': [('SCCP/1001', '1', '', '')],
+                }
+            ),
+        )
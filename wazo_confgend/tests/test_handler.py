@@ -1,4 +1,4 @@
-# Copyright 2016-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # Copyright (C) 2016 Proformatique Inc.
 # SPDX-License-Identifier: GPL-3.0-or-later
 
@@ -7,14 +7,13 @@ from unittest import TestCase
 from unittest.mock import Mock, patch
 from unittest.mock import sentinel as s
 
-from hamcrest import assert_that, calling, equal_to, none, raises
+from hamcrest import assert_that, calling, equal_to, raises
 
 from ..handler import (
     CachedHandlerFactoryDecorator,
     FrontendHandlerFactory,
     MultiHandlerFactory,
     NoSuchHandler,
-    NullHandlerFactory,
     PluginHandlerFactory,
 )
 
@@ -149,12 +148,3 @@ class TestFrontendHandlerFactory(TestCase):
         result = factory.get(resource, filename)
 
         assert_that(result, equal_to(frontend.filename))
-
-
-class TestNullHandlerFactory(TestCase):
-    def test_when_get_then_return_null_handler(self):
-        factory = NullHandlerFactory()
-
-        result = factory.get(s.resource, s.filename)
-
-        assert_that(result(), none())
@@ -0,0 +1,155 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import Mock
+
+from hamcrest import assert_that, contains_exactly, equal_to, instance_of
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+from ..inflight import InFlightTable, InvalidationLog
+from ..stats import Counters
+
+
+class TestInvalidationLog(unittest.TestCase):
+    def setUp(self):
+        self.invalidations = InvalidationLog()
+
+    def test_generation_is_current_until_its_key_is_invalidated(self):
+        with self.invalidations.generation() as start:
+            self.invalidations.invalidate('asterisk/other.conf')
+            assert_that(
+                self.invalidations.is_current('asterisk/sip.conf', start),
+                equal_to(True),
+            )
+
+            self.invalidations.invalidate('asterisk/sip.conf')
+            assert_that(
+                self.invalidations.is_current('asterisk/sip.conf', start),
+                equal_to(False),
+            )
+
+    def test_generation_is_not_current_when_a_matching_pattern_is_invalidated(self):
+        with self.invalidations.generation() as start:
+            self.invalidations.invalidate('asterisk/s*.conf')
+
+            assert_that(
+                self.invalidations.is_current('asterisk/sip.conf', start),
+                equal_to(False),
+            )
+
+    def test_invalidations_before_a_generation_do_not_matter(self):
+        self.invalidations.invalidate('asterisk/sip.conf')
+
+        with self.invalidations.generation() as start:
+            assert_that(
+                self.invalidations.is_current('asterisk/sip.conf', start),
+                equal_to(True),
+            )
+
+    def test_invalidations_are_kept_while_a_generation_needs_them(self):
+        first = self.invalidations.begin()
+        self.invalidations.invalidate('asterisk/sip.conf')
+        second = self.invalidations.begin()
+        self.invalidations.invalidate('asterisk/iax.conf')
+
+        self.invalidations.end(second)
+        assert_that(
+            self.invalidations.is_current('asterisk/sip.conf', first),
+            equal_to(False),
+        )
+
+        self.invalidations.end(first)
+        assert_that(self.invalidations._invalidated, equal_to({}))
+
+    def test_store_if_current(self):
+        store = Mock()
+
+        with self.invalidations.generation() as start:
+            stored = self.invalidations.store_if_current('key', start, store)
+
+        assert_that(stored, equal_to(True))
+        store.assert_called_once_with()
+
+        with self.invalidations.generation() as start:
+            self.invalidations.invalidate('key')
+            stored = self.invalidations.store_if_current('key', start, store)
+
+        assert_that(stored, equal_to(False))
+        store.assert_called_once_with()
+
+
+class TestInFlightTable(unittest.TestCase):
+    def setUp(self):
+        self.counters = Counters()
+        self.invalidations = InvalidationLog()
+        self.table = InFlightTable(self.counters, self.invalidations)
+        self.generations = []
+        self.function = Mock(side_effect=self._new_generation)
+
+    def _new_generation(self, *args):
+        d = defer.Deferred()
+        self.generations.append(d)
+        return d
+
+    def _results(self, *deferreds):
+        results = []
+        for d in deferreds:
+            d.addBoth(results.append)
+        return results
+
+    def test_sequential_calls_are_not_coalesced(self):
+        results = []
+        self.table.run('key', self.function, 'first').addCallback(results.append)
+        self.generations[0].callback('first')
+        self.table.run('key', self.function, 'second').addCallback(results.append)
+        self.generations[1].callback('second')
+
+        assert_that(results, contains_exactly('first', 'second'))
+        assert_that(self.counters.snapshot(), equal_to({'generations': 2}))
+
+    def test_concurrent_calls_share_the_result(self):
+        results = self._results(
+            *[self.table.run('key', self.function, 'leader') for _ in range(4)]
+        )
+
+        self.generations[0].callback('leader')
+
+        self.function.assert_called_once_with(0, 'leader')
+        assert_that(results, equal_to(['leader'] * 4))
+        assert_that(
+            self.counters.snapshot(),
+            equal_to({'generations': 1, 'coalesced_requests': 3}),
+        )
+
+    def test_calls_after_an_invalidation_are_not_coalesced(self):
+        stale = self.table.run('key', self.function, 'stale')
+        self.invalidations.invalidate('key')
+        current = self.table.run('key', self.function, 'current')
+        joined = self.table.run('key', self.function, 'joined')
+        results = self._results(stale, current, joined)
+
+        self.generations[0].callback('stale')
+        self.generations[1].callback('current')
+
+        assert_that(results, contains_exactly('stale', 'current', 'current'))
+        assert_that(
+            self.counters.snapshot(),
+            equal_to({'generations': 2, 'coalesced_requests': 1}),
+        )
+        assert_that(self.invalidations._invalidated, equal_to({}))
+
+    def test_error_is_shared_and_key_released(self):
+        results = self._results(
+            self.table.run('key', self.function),
+            self.table.run('key', self.function),
+        )
+
+        self.generations[0].errback(RuntimeError())
+
+        assert_that(
+            results, contains_exactly(instance_of(Failure), instance_of(Failure))
+        )
+        self.table.run('key', self.function)
+        assert_that(self.function.call_count, equal_to(2))
@@ -0,0 +1,209 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import Mock, call, patch
+
+import psycopg2
+from hamcrest import assert_that, contains_exactly, contains_inanyorder, equal_to
+from twisted.internet import defer
+
+from ..invalidation import (
+    CHANNEL,
+    RECONNECT_DELAY,
+    TABLE_FILES,
+    TRIGGERS_QUERY,
+    CacheInvalidator,
+    PostgresNotifier,
+)
+
+
+class FakeNotifier:
+    def __init__(self, invalidator):
+        self._invalidator = invalidator
+
+    def notify(self, table):
+        self._invalidator.table_changed(table)
+
+
+class TestCacheInvalidator(unittest.TestCase):
+    def setUp(self):
+        self.invalidate = Mock()
+        table_files = {
+            'userfeatures': ['asterisk/extensions.conf', 'asterisk/sccp.conf'],
+            'queuemember': ['asterisk/queues.conf'],
+            'queue': ['asterisk/queues.conf'],
+        }
+        self.invalidator = CacheInvalidator(self.invalidate, table_files)
+        self.notifier = FakeNotifier(self.invalidator)
+
+    def test_table_changed_invalidates_only_the_affected_files(self):
+        self.notifier.notify('queuemember')
+
+        self.invalidate.assert_called_once_with('asterisk/queues.conf')
+
+    def test_table_changed_invalidates_every_file_of_the_table(self):
+        self.notifier.notify('userfeatures')
+
+        assert_that(
+            self.invalidate.call_args_list,
+            contains_inanyorder(
+                call('asterisk/extensions.conf'), call('asterisk/sccp.conf')
+            ),
+        )
+
+    def test_unknown_table_changed_invalidates_every_file(self):
+        self.notifier.notify('unknown')
+
+        assert_that(
+            self.invalidate.call_args_list,
+            contains_inanyorder(
+                call('asterisk/extensions.conf'),
+                call('asterisk/queues.conf'),
+                call('asterisk/sccp.conf'),
+            ),
+        )
+
+    def test_table_changed_matching_a_family_of_tables(self):
+        invalidator = CacheInvalidator(
+            self.invalidate, {'func_key_dest_*': ['asterisk/sccp.conf']}
+        )
+
+        invalidator.table_changed('func_key_dest_user')
+
+        self.invalidate.assert_called_once_with('asterisk/sccp.conf')
+
+    def test_table_changed_for_a_tenant_invalidates_its_files(self):
+        invalidator = CacheInvalidator(
+            self.invalidate,
+            {
+                'extensions': [
+                    'asterisk/extensions.conf',
+                    'asterisk/extensions-tenant-{tenant_uuid}.conf',
+                ]
+            },
+        )
+
+        invalidator.table_changed('extensions:0c2a')
+        invalidator.table_changed('extensions:')
+        invalidator.table_changed('extensions')
+
+        assert_that(
+            self.invalidate.call_args_list,
+            equal_to(
+                [
+                    call('asterisk/extensions.conf'),
+                    call('asterisk/extensions-tenant-0c2a.conf'),
+                    call('asterisk/extensions.conf'),
+                    call('asterisk/extensions-tenant-*.conf'),
+                    call('asterisk/extensions.conf'),
+                    call('asterisk/extensions-tenant-*.conf'),
+                ]
+            ),
+        )
+
+    def test_invalidate_all(self):
+        self.invalidator.invalidate_all()
+
+        assert_that(
+            self.invalidate.call_args_list,
+            contains_inanyorder(
+                call('asterisk/extensions.conf'),
+                call('asterisk/queues.conf'),
+                call('asterisk/sccp.conf'),
+            ),
+        )
+
+    def test_table_files_are_cache_keys(self):
+        for cache_keys in TABLE_FILES.values():
+            for cache_key in cache_keys:
+                cache_key = cache_key.format(tenant_uuid='0c2a')
+                resource, filename = cache_key.split('/')
+                assert_that(resource, equal_to('asterisk'))
+
+
+@patch(
+    'wazo_confgend.invalidation.threads.deferToThreadPool',
+    Mock(side_effect=lambda reactor, pool, f: defer.maybeDeferred(f)),
+)
+@patch('wazo_confgend.invalidation.psycopg2.connect')
+class TestPostgresNotifier(unittest.TestCase):
+    def setUp(self):
+        self.reactor = Mock()
+        self.invalidator = Mock()
+        self.notifier = PostgresNotifier(
+            self.reactor, 'postgresql://db', self.invalidator
+        )
+
+    def test_start(self, connect):
+        connection = connect.return_value
+        cursor = connection.cursor.return_value.__enter__.return_value
+
+        self.notifier.start()
+
+        connect.assert_called_once_with('postgresql://db')
+        assert_that(
+            cursor.execute.call_args_list,
+            contains_exactly(call(TRIGGERS_QUERY), call(f'LISTEN {CHANNEL}')),
+        )
+        self.reactor.addReader.assert_called_once_with(self.notifier)
+        self.invalidator.invalidate_all.assert_called_once_with()
+
+    def test_start_when_the_database_is_unavailable(self, connect):
+        connect.side_effect = psycopg2.OperationalError
+
+        self.notifier.start()
+
+        self.reactor.addReader.assert_not_called()
+        self.reactor.callLater.assert_called_once_with(
+            RECONNECT_DELAY, self.notifier.start
+        )
+
+    def test_start_when_the_triggers_are_not_installed(self, connect):
+        connection = connect.return_value
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = None
+
+        self.notifier.start()
+
+        cursor.execute.assert_called_once_with(TRIGGERS_QUERY)
+        connection.close.assert_called_once_with()
+        self.reactor.addReader.assert_not_called()
+        self.invalidator.invalidate_all.assert_not_called()
+        self.reactor.callLater.assert_called_once_with(
+            RECONNECT_DELAY, self.notifier.start
+        )
+
+    def test_stop_cancels_the_reconnection(self, connect):
+        connect.side_effect = psycopg2.OperationalError
+        self.notifier.start()
+
+        self.notifier.stop()
+
+        self.reactor.callLater.return_value.cancel.assert_called_once_with()
+
+    def test_do_read_dispatches_the_notifications(self, connect):
+        connection = connect.return_value
+        self.notifier.start()
+        connection.notifies = [Mock(payload='queuemember'), Mock(payload='queue')]
+
+        self.notifier.doRead()
+
+        connection.poll.assert_called_once_with()
+        self.invalidator.table_changed.assert_has_calls(
+            [call('queuemember'), call('queue')]
+        )
+        assert_that(connection.notifies, equal_to([]))
+
+    def test_do_read_when_the_connection_is_lost(self, connect):
+        connection = connect.return_value
+        self.notifier.start()
+        connection.poll.side_effect = psycopg2.OperationalError
+
+        self.notifier.doRead()
+
+        self.reactor.removeReader.assert_called_once_with(self.notifier)
+        connection.close.assert_called_once_with()
+        self.reactor.callLater.assert_called_once_with(
+            RECONNECT_DELAY, self.notifier.start
+        )
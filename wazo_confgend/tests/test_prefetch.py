@@ -0,0 +1,159 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from hamcrest import assert_that, calling, equal_to, is_not, raises
+from sqlalchemy import Column, ForeignKey, Integer, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship, scoped_session, selectinload, sessionmaker
+from sqlalchemy.orm.exc import DetachedInstanceError
+from sqlalchemy.pool import QueuePool, StaticPool
+
+from ..prefetch import Prefetcher, check_pool_size, fetch_serially
+
+Base = declarative_base()
+
+
+class Parent(Base):
+    __tablename__ = 'parent'
+
+    id = Column(Integer, primary_key=True)
+    children = relationship('Child')
+
+
+class Child(Base):
+    __tablename__ = 'child'
+
+    id = Column(Integer, primary_key=True)
+    parent_id = Column(Integer, ForeignKey('parent.id'))
+
+
+class TestFetchSerially(unittest.TestCase):
+    def test_fetch_serially(self):
+        result = fetch_serially({'a': lambda: 1, 'b': lambda: 2})
+
+        assert_that(result, equal_to({'a': 1, 'b': 2}))
+
+
+@patch('wazo_confgend.prefetch.Session')
+class TestCheckPoolSize(unittest.TestCase):
+    def setUp(self):
+        self.config = {'max_threads': 10, 'prefetch_threads': 5}
+
+    def test_pool_holding_every_connection(self, Session):
+        Session.get_bind.return_value.pool = QueuePool(
+            Mock(), pool_size=5, max_overflow=10
+        )
+
+        check_pool_size(self.config)
+
+    def test_pool_too_small(self, Session):
+        Session.get_bind.return_value.pool = QueuePool(
+            Mock(), pool_size=5, max_overflow=9
+        )
+
+        assert_that(calling(check_pool_size).with_args(self.config), raises(ValueError))
+
+    def test_without_prefetch_threads(self, Session):
+        self.config['prefetch_threads'] = 0
+
+        check_pool_size(self.config)
+
+        Session.get_bind.assert_not_called()
+
+
+@patch('wazo_confgend.prefetch.Session')
+class TestPrefetcher(unittest.TestCase):
+    def test_without_workers_datasets_are_fetched_in_the_calling_thread(self, Session):
+        prefetcher = Prefetcher(0)
+
+        result = prefetcher.fetch({'a': threading.get_ident, 'b': threading.get_ident})
+
+        assert_that(
+            result,
+            equal_to({'a': threading.get_ident(), 'b': threading.get_ident()}),
+        )
+        Session.assert_not_called()
+
+    def test_datasets_are_fetched_in_the_exported_snapshot(self, Session):
+        session = Session.return_value
+        session.execute.return_value.scalar.return_value = 'snapshot-id'
+        prefetcher = Prefetcher(2)
+
+        result = prefetcher.fetch({'a': threading.get_ident, 'b': lambda: 'b'})
+
+        assert_that(result['a'], is_not(equal_to(threading.get_ident())))
+        assert_that(result['b'], equal_to('b'))
+        executed = [
+            (str(call.args[0]), *call.args[1:])
+            for call in session.execute.call_args_list
+        ]
+        assert_that(
+            sorted(executed),
+            equal_to(
+                [
+                    ('SELECT pg_export_snapshot()',),
+                    (
+                        'SET TRANSACTION SNAPSHOT :snapshot_id',
+                        {'snapshot_id': 'snapshot-id'},
+                    ),
+                    (
+                        'SET TRANSACTION SNAPSHOT :snapshot_id',
+                        {'snapshot_id': 'snapshot-id'},
+                    ),
+                ]
+            ),
+        )
+        assert_that(session.expunge_all.call_count, equal_to(2))
+        assert_that(session.rollback.call_count, equal_to(2))
+        assert_that(Session.remove.call_count, equal_to(2))
+
+    def test_errors_are_raised_by_fetch(self, Session):
+        prefetcher = Prefetcher(2)
+
+        def fail():
+            raise RuntimeError()
+
+        assert_that(
+            calling(prefetcher.fetch).with_args({'a': lambda: 1, 'b': fail}),
+            raises(RuntimeError),
+        )
+        assert_that(Session.remove.call_count, equal_to(2))
+
+
+@patch.object(Prefetcher, '_import_snapshot', Mock())
+@patch.object(Prefetcher, '_export_snapshot', Mock(return_value='snapshot-id'))
+class TestPrefetcherDetachedObjects(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine(
+            'sqlite://',
+            poolclass=StaticPool,
+            connect_args={'check_same_thread': False},
+        )
+        Base.metadata.create_all(engine)
+        self.Session = scoped_session(sessionmaker(bind=engine))
+        session = self.Session()
+        session.add(Parent(id=1, children=[Child(id=2)]))
+        session.commit()
+        self.Session.remove()
+
+    def test_eagerly_loaded_relationships_are_usable_once_detached(self):
+        def eager():
+            return self.Session().query(Parent).options(selectinload(Parent.children))
+
+        def lazy():
+            return self.Session().query(Parent).all()
+
+        with patch('wazo_confgend.prefetch.Session', self.Session):
+            result = Prefetcher(1).fetch({'eager': lambda: eager().all(), 'lazy': lazy})
+
+        [parent] = result['eager']
+        assert_that([child.id for child in parent.children], equal_to([2]))
+        [parent] = result['lazy']
+        assert_that(
+            calling(getattr).with_args(parent, 'children'),
+            raises(DetachedInstanceError),
+        )
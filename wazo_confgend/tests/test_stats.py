@@ -0,0 +1,23 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+
+import yaml
+from hamcrest import assert_that, equal_to
+
+from ..stats import Counters, StatsFrontend
+
+
+class TestStatsFrontend(unittest.TestCase):
+    def test_stats_yml(self):
+        counters = Counters()
+        counters.increment('generations')
+        counters.increment('generations')
+        counters.increment('coalesced_requests', 3)
+        frontend = StatsFrontend(counters)
+
+        result = frontend.stats_yml()
+
+        expected = {'counters': {'generations': 2, 'coalesced_requests': 3}}
+        assert_that(yaml.safe_load(result), equal_to(expected))
@@ -0,0 +1,110 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import threading
+import unittest
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from hamcrest import assert_that, equal_to, none
+
+from ..cache import content_digest
+from ..streaming import ChunkedWriter, ContentSpool, TransportStream, streamable
+
+
+class _Generator:
+    @streamable
+    def generate(self, output):
+        output.write('some ')
+        output.write('content')
+
+
+class TestStreamable(unittest.TestCase):
+    def test_without_output_the_content_is_returned(self):
+        result = _Generator().generate()
+
+        assert_that(result, equal_to('some content'))
+
+    def test_with_output_the_content_is_written(self):
+        output = StringIO()
+
+        result = _Generator().generate(output=output)
+
+        assert_that(result, none())
+        assert_that(output.getvalue(), equal_to('some content'))
+
+
+class TestChunkedWriter(unittest.TestCase):
+    def setUp(self):
+        self.sinks = [Mock(), Mock()]
+        self.writer = ChunkedWriter(self.sinks, chunk_size=4)
+
+    def test_small_writes_are_buffered(self):
+        self.writer.write('ab')
+        self.writer.write('c')
+
+        for sink in self.sinks:
+            sink.write.assert_not_called()
+
+    def test_chunks_are_encoded_and_pushed_to_every_sink(self):
+        self.writer.write('ab')
+        self.writer.write('cé')
+        self.writer.write('f')
+        self.writer.flush()
+
+        for sink in self.sinks:
+            assert_that(
+                [call.args[0] for call in sink.write.call_args_list],
+                equal_to(['abcé'.encode('utf-8'), b'f']),
+            )
+        assert_that(self.writer.bytes_written, equal_to(6))
+
+
+class TestContentSpool(unittest.TestCase):
+    def test_content_is_read_back_with_its_digest(self):
+        with ContentSpool(max_memory=4) as spool:
+            spool.write(b'some ')
+            spool.write(b'content')
+
+            assert_that(spool.digest, equal_to(content_digest(b'some content')))
+            assert_that(
+                list(spool.read_chunks(chunk_size=8)),
+                equal_to([b'some con', b'tent']),
+            )
+
+
+@patch('wazo_confgend.streaming.threads')
+class TestTransportStream(unittest.TestCase):
+    def setUp(self):
+        self.transport = Mock()
+        self.reactor = Mock()
+        self.stream = TransportStream(self.transport, self.reactor)
+
+    def test_write_from_the_reactor_thread(self, threads):
+        self.stream.write(b'chunk')
+
+        threads.blockingCallFromThread.assert_called_once_with(
+            self.reactor, self.transport.write, b'chunk'
+        )
+
+    def test_write_waits_while_paused(self, threads):
+        self.stream.pauseProducing()
+        writer = threading.Thread(target=self.stream.write, args=(b'chunk',))
+        writer.start()
+        writer.join(0.05)
+
+        threads.blockingCallFromThread.assert_not_called()
+
+        self.stream.resumeProducing()
+        writer.join(5)
+
+        threads.blockingCallFromThread.assert_called_once_with(
+            self.reactor, self.transport.write, b'chunk'
+        )
+
+    def test_no_write_once_stopped(self, threads):
+        self.stream.stopProducing()
+
+        self.stream.write(b'chunk')
+
+        threads.blockingCallFromThread.assert_not_called()
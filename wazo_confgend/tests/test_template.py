@@ -1,4 +1,4 @@
-# Copyright 2016-2023 The Wazo Authors  (see the AUTHORS file)
+# Copyright 2016-2026 The Wazo Authors  (see the AUTHORS file)
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 
@@ -6,8 +6,8 @@ import os
 from os.path import basename
 from unittest import TestCase
 
-from hamcrest import assert_that, contains_string, equal_to
-from jinja2 import PackageLoader, Template
+from hamcrest import assert_that, contains_string, equal_to, is_
+from jinja2 import FunctionLoader, PackageLoader, Template
 
 from ..template import TemplateHelper
 
@@ -34,6 +34,27 @@ class TestTemplateHelper(TestCase):
 
         assert_that(basename(template._jinja_template.filename), equal_to('foo.jinja'))
 
+    def test_get_customizable_templates(self):
+        templates = self.tpl_helper.get_customizable_templates('foo')
+
+        custom = templates.get('custom')
+        default = templates.get('mrgbl')
+
+        assert_that(
+            basename(custom._jinja_template.filename), equal_to('foo-custom.jinja')
+        )
+        assert_that(basename(default._jinja_template.filename), equal_to('foo.jinja'))
+        assert_that(templates.get(42), is_(default))
+
+    def test_get_customizable_templates_when_the_loader_cannot_list(self):
+        sources = {'foo.jinja': 'foo', 'foo-custom.jinja': 'custom'}
+        tpl_helper = TemplateHelper(FunctionLoader(sources.get))
+
+        templates = tpl_helper.get_customizable_templates('foo')
+
+        assert_that(templates.get('custom').dump({}), equal_to('custom'))
+        assert_that(templates.get('mrgbl').dump({}), equal_to('foo'))
+
     def test_dump_template(self):
         template = self.tpl_helper.get_template('foo')
 
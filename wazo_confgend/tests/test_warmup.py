@@ -0,0 +1,80 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import unittest
+from unittest.mock import Mock, call
+
+from hamcrest import assert_that, contains_exactly, equal_to
+from twisted.internet import defer
+
+from ..stats import Counters
+from ..warmup import WarmUpScheduler
+
+
+class TestWarmUpScheduler(unittest.TestCase):
+    def setUp(self):
+        self.deferreds = []
+        self.generate_deferred = Mock(side_effect=self._new_deferred)
+        self.counters = Counters()
+        self.scheduler = WarmUpScheduler(
+            self.generate_deferred,
+            ['asterisk/extensions.conf', 'asterisk/pjsip.conf', 'invalid'],
+            1,
+            self.counters,
+        )
+
+    def _new_deferred(self, *args):
+        d = defer.Deferred()
+        self.deferreds.append(d)
+        return d
+
+    def test_start_generates_the_files_with_bounded_concurrency(self):
+        self.scheduler.start()
+
+        self.generate_deferred.assert_called_once_with('asterisk', 'extensions.conf')
+
+        self.deferreds[0].callback(None)
+
+        assert_that(
+            self.generate_deferred.call_args_list,
+            contains_exactly(
+                call('asterisk', 'extensions.conf'), call('asterisk', 'pjsip.conf')
+            ),
+        )
+        assert_that(self.counters.snapshot(), equal_to({'warm_ups': 2}))
+
+    def test_schedule_ignores_the_files_not_warmed_up(self):
+        self.scheduler.schedule('asterisk/sccp.conf')
+        self.scheduler.schedule('invalid')
+
+        self.generate_deferred.assert_not_called()
+
+    def test_schedule_a_pattern_generates_the_matching_files(self):
+        self.scheduler.schedule('asterisk/ext*.conf')
+
+        self.generate_deferred.assert_called_once_with('asterisk', 'extensions.conf')
+
+    def test_schedule_a_queued_file_once(self):
+        self.scheduler.schedule('asterisk/extensions.conf')
+        self.scheduler.schedule('asterisk/pjsip.conf')
+        self.scheduler.schedule('asterisk/pjsip.conf')
+
+        self.deferreds[0].callback(None)
+        self.deferreds[1].callback(None)
+
+        assert_that(self.generate_deferred.call_count, equal_to(2))
+
+    def test_schedule_a_file_being_generated(self):
+        self.scheduler.schedule('asterisk/pjsip.conf')
+        self.scheduler.schedule('asterisk/pjsip.conf')
+
+        self.deferreds[0].callback(None)
+
+        assert_that(self.generate_deferred.call_count, equal_to(2))
+
+    def test_a_failed_generation_does_not_stop_the_scheduler(self):
+        self.scheduler.start()
+
+        self.deferreds[0].errback(Exception())
+
+        self.generate_deferred.assert_called_with('asterisk', 'pjsip.conf')
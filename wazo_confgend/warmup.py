@@ -0,0 +1,63 @@
+# Copyright 2026 The Wazo Authors  (see the AUTHORS file)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import fnmatch
+import logging
+
+from twisted.internet import defer
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUpScheduler:
+    """Generate files in the background so they are cached before being requested
+
+    Must be used from the reactor thread. A pattern schedules the files it
+    matches. A file is queued at most once, but can be queued again while it
+    is being generated, since the data may have changed since the generation
+    started.
+    """
+
+    def __init__(self, generate_deferred, cache_keys, max_concurrency, counters):
+        self._generate_deferred = generate_deferred
+        self._cache_keys = []
+        for cache_key in cache_keys:
+            if cache_key.count('/') != 1:
+                logger.warning('ignoring invalid warm up file %s', cache_key)
+                continue
+            self._cache_keys.append(cache_key)
+        self._semaphore = defer.DeferredSemaphore(max_concurrency)
+        self._counters = counters
+        self._queued = set()
+
+    def start(self):
+        for cache_key in self._cache_keys:
+            self.schedule(cache_key)
+
+    def schedule(self, cache_key):
+        if '*' in cache_key:
+            for matching_key in self._cache_keys:
+                if fnmatch.fnmatchcase(matching_key, cache_key):
+                    self.schedule(matching_key)
+            return
+
+        if cache_key not in self._cache_keys or cache_key in self._queued:
+            return
+
+        logger.debug('scheduling warm up of %s', cache_key)
+        self._queued.add(cache_key)
+        d = self._semaphore.run(self._warm_up, cache_key)
+        d.addErrback(self._log_failure, cache_key)
+
+    def _warm_up(self, cache_key):
+        self._queued.discard(cache_key)
+        self._counters.increment('warm_ups')
+        resource, filename = cache_key.split('/')
+        return self._generate_deferred(resource, filename)
+
+    def _log_failure(self, failure, cache_key):
+        logger.error(
+            'unexpected error while warming up %s: %s',
+            cache_key,
+            failure.getTraceback(),
+        )